@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     DashboardWidget, UserDashboard, KPIMetric, MetricValue,
-    ReportTemplate, ScheduledReport, DataExport
+    ReportTemplate, ScheduledReport, DataExport, KPICounter,
+    MetricRollup, DemandForecast
 )
 
 
@@ -65,3 +66,26 @@ class DataExportAdmin(admin.ModelAdmin):
     search_fields = ['name', 'data_source']
     list_editable = ['status']
     readonly_fields = ['created_at', 'completed_at']
+
+
+@admin.register(KPICounter)
+class KPICounterAdmin(admin.ModelAdmin):
+    list_display = ['key', 'value', 'updated_at']
+    search_fields = ['key']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(MetricRollup)
+class MetricRollupAdmin(admin.ModelAdmin):
+    list_display = ['metric', 'bucket', 'period_start', 'count', 'sum', 'min_value', 'max_value']
+    list_filter = ['bucket', 'metric__category']
+    search_fields = ['metric__name']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ['product', 'warehouse', 'method', 'daily_forecast', 'error', 'alpha', 'fitted_at']
+    list_filter = ['method', 'warehouse']
+    search_fields = ['product__sku', 'product__name']
+    readonly_fields = ['fitted_at']
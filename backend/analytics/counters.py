@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import KPICounter
+
+logger = logging.getLogger(__name__)
+
+# Daily order buckets kept around; enough to answer the 30-day window.
+ORDER_DAY_WINDOW = 31
+
+ORDERS_TOTAL = 'orders.total'
+ORDERS_DAY_PREFIX = 'orders.day.'
+INVENTORY_LOW_STOCK = 'inventory.low_stock'
+INVOICES_PAID_TOTAL = 'invoices.paid_total'
+INVOICES_SENT_TOTAL = 'invoices.sent_total'
+
+
+def is_low_stock(quantity, reorder_level):
+    """An inventory row is low on stock at or below its reorder level"""
+    return quantity <= reorder_level
+
+
+def order_day_key(day):
+    return f'{ORDERS_DAY_PREFIX}{day.isoformat()}'
+
+
+def increment(key, delta):
+    """Atomically add delta to a counter, creating it on first use"""
+    if not delta:
+        return
+    updated = KPICounter.objects.filter(key=key).update(value=F('value') + delta)
+    if not updated:
+        KPICounter.objects.bulk_create([KPICounter(key=key)], ignore_conflicts=True)
+        KPICounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def read_counters():
+    """
+    Read every dashboard counter in a single indexed lookup.
+
+    Returns a dict with the totals the dashboard needs. Until the counters
+    are seeded, reads derive the totals from the source tables and queue
+    the reconciliation task that seeds them, so no counter is written on
+    the request path.
+    """
+    today = timezone.localdate()
+    days = [today - timedelta(days=offset) for offset in range(ORDER_DAY_WINDOW)]
+    keys = [ORDERS_TOTAL, INVENTORY_LOW_STOCK, INVOICES_PAID_TOTAL, INVOICES_SENT_TOTAL]
+    keys += [order_day_key(day) for day in days]
+
+    values = dict(KPICounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    if ORDERS_TOTAL not in values:
+        from .tasks import reconcile_kpi_counters
+
+        values, _ = derive_counters()
+        transaction.on_commit(reconcile_kpi_counters.delay)
+
+    def orders_since(offset):
+        return sum(int(values.get(order_day_key(day), 0)) for day in days[:offset + 1])
+
+    return {
+        'total_orders': int(values.get(ORDERS_TOTAL, 0)),
+        'orders_last_30_days': orders_since(30),
+        'orders_last_7_days': orders_since(7),
+        'low_stock_products': int(values.get(INVENTORY_LOW_STOCK, 0)),
+        'total_revenue': values.get(INVOICES_PAID_TOTAL, Decimal('0')),
+        'pending_payments': values.get(INVOICES_SENT_TOTAL, Decimal('0')),
+    }
+
+
+def derive_counters():
+    """Recompute every counter from the source tables"""
+    from inventory.models import Inventory
+    from orders.models import Order
+    from finance.models import Invoice
+
+    today = timezone.localdate()
+    window_start = today - timedelta(days=ORDER_DAY_WINDOW - 1)
+
+    invoices = Invoice.objects.aggregate(
+        paid=Sum('total_amount', filter=Q(status='PAID')),
+        sent=Sum('total_amount', filter=Q(status='SENT')),
+    )
+    actual = {
+        ORDERS_TOTAL: Decimal(Order.objects.count()),
+        INVENTORY_LOW_STOCK: Decimal(
+            Inventory.objects.filter(quantity__lte=F('reorder_level')).count()
+        ),
+        INVOICES_PAID_TOTAL: invoices['paid'] or Decimal('0'),
+        INVOICES_SENT_TOTAL: invoices['sent'] or Decimal('0'),
+    }
+    for offset in range(ORDER_DAY_WINDOW):
+        actual[order_day_key(today - timedelta(days=offset))] = Decimal('0')
+    daily = Order.objects.filter(
+        created_at__date__gte=window_start
+    ).annotate(day=TruncDate('created_at')).values('day').annotate(total=Count('id'))
+    for row in daily:
+        actual[order_day_key(row['day'])] = Decimal(row['total'])
+    return actual, window_start
+
+
+def reconcile_counters(apply=True):
+    """
+    Re-derive the counters from the source tables and report drift.
+
+    Corrections are applied as deltas so increments that land while the
+    reconciliation runs are not overwritten. Returns {key: (stored, actual)}
+    for every counter that drifted.
+    """
+    actual, window_start = derive_counters()
+    stored = dict(KPICounter.objects.filter(key__in=actual).values_list('key', 'value'))
+
+    drift = {}
+    for key, value in actual.items():
+        current = stored.get(key, Decimal('0'))
+        if key in stored and current == value:
+            continue
+        if key in stored or value:
+            drift[key] = (current, value)
+
+    if apply:
+        KPICounter.objects.bulk_create(
+            [KPICounter(key=key) for key in actual if key not in stored], ignore_conflicts=True
+        )
+        if drift:
+            # One statement for every correction, each still applied as a delta
+            KPICounter.objects.filter(key__in=drift).update(value=F('value') + Case(
+                *(When(key=key, then=Value(value - current)) for key, (current, value) in drift.items()),
+                output_field=DecimalField(max_digits=18, decimal_places=2),
+            ))
+        expired = [
+            key for key in KPICounter.objects.filter(
+                key__startswith=ORDERS_DAY_PREFIX
+            ).values_list('key', flat=True)
+            if key[len(ORDERS_DAY_PREFIX):] < window_start.isoformat()
+        ]
+        KPICounter.objects.filter(key__in=expired).delete()
+
+    for key, (current, value) in drift.items():
+        logger.warning('KPI counter %s drifted: stored=%s actual=%s', key, current, value)
+    return drift
@@ -0,0 +1,285 @@
+"""
+Data export engine.
+
+Rows are streamed from the database with iterator(chunk_size=...), which
+uses a server-side cursor on PostgreSQL, and encoded incrementally, so an
+export never holds a whole table in memory. CSV and NDJSON are produced as
+text chunks that can go to a file or straight into a StreamingHttpResponse;
+Excel files are written with XlsxWriter in constant-memory mode.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+
+
+CHUNK_SIZE = 2000
+# Excel worksheets hold at most this many rows (including the header)
+EXCEL_MAX_ROWS = 1048576
+STREAMABLE_FORMATS = {'CSV': 'text/csv', 'JSON': 'application/x-ndjson'}
+EXTENSIONS = {'CSV': 'csv', 'JSON': 'ndjson', 'EXCEL': 'xlsx'}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class ExportSource:
+    """A named table: the columns to export, its date field and the filters it accepts"""
+
+    def __init__(self, model, columns, date_field=None, filters=None):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+        self.filters = filters or {}
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def queryset(self, filters=None):
+        queryset = apps.get_model(self.model).objects.all()
+        filters = filters or {}
+        if self.date_field:
+            if filters.get('date_from'):
+                queryset = queryset.filter(**{f'{self.date_field}__gte': _boundary(filters['date_from'])})
+            if filters.get('date_to'):
+                queryset = queryset.filter(**{f'{self.date_field}__lt': _boundary(filters['date_to'], end=True)})
+        for name, lookup in self.filters.items():
+            value = filters.get(name)
+            if value in (None, '', 'all'):
+                continue
+            if isinstance(value, (list, tuple)):
+                lookup, value = f'{lookup}__in', value
+            try:
+                queryset = queryset.filter(**{lookup: value})
+            except (ValueError, ValidationError):
+                raise ExportError(f'Invalid value for filter "{name}": {value}')
+        # Primary key order walks an index and keeps exports reproducible
+        return queryset.order_by('pk').values_list(*(lookup for _, lookup in self.columns))
+
+
+def _boundary(value, end=False):
+    """A datetime for a date_from/date_to filter; a plain date_to includes that whole day"""
+    # parse_datetime also accepts a plain date (as midnight), so dates are told apart first
+    try:
+        day = parse_date(str(value))
+        if day is not None:
+            moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+        else:
+            moment = parse_datetime(str(value))
+        if moment is not None and timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    except (ValueError, OverflowError):
+        # Well-formed but impossible values, e.g. 2024-02-30, or the day after 9999-12-31
+        moment = None
+    if moment is None:
+        raise ExportError(f'Invalid date: {value}')
+    return moment
+
+
+SOURCES = {
+    'inventory_transactions': ExportSource(
+        'inventory.InventoryTransaction',
+        [('id', 'id'), ('created_at', 'created_at'), ('transaction_type', 'transaction_type'),
+         ('sku', 'product__sku'), ('product', 'product__name'), ('warehouse', 'warehouse__name'),
+         ('quantity', 'quantity'), ('reference', 'reference'), ('created_by', 'created_by__username')],
+        date_field='created_at',
+        filters={'warehouse': 'warehouse_id', 'product': 'product_id', 'transaction_type': 'transaction_type'},
+    ),
+    'inventory': ExportSource(
+        'inventory.Inventory',
+        [('id', 'id'), ('sku', 'product__sku'), ('product', 'product__name'), ('warehouse', 'warehouse__name'),
+         ('quantity', 'quantity'), ('reorder_level', 'reorder_level'), ('last_updated', 'last_updated')],
+        filters={'warehouse': 'warehouse_id', 'product': 'product_id', 'category': 'product__category_id'},
+    ),
+    'orders': ExportSource(
+        'orders.Order',
+        [('id', 'id'), ('order_number', 'order_number'), ('customer', 'customer__name'), ('status', 'status'),
+         ('total_amount', 'total_amount'), ('created_at', 'created_at')],
+        date_field='created_at',
+        filters={'status': 'status', 'customer': 'customer_id'},
+    ),
+    'shipments': ExportSource(
+        'orders.Shipment',
+        [('id', 'id'), ('tracking_number', 'tracking_number'), ('order_number', 'order__order_number'),
+         ('status', 'status'), ('shipped_from', 'shipped_from__name'), ('shipped_date', 'shipped_date'),
+         ('delivered_date', 'delivered_date')],
+        date_field='created_at',
+        filters={'status': 'status', 'warehouse': 'shipped_from_id'},
+    ),
+    'invoices': ExportSource(
+        'finance.Invoice',
+        [('id', 'id'), ('invoice_number', 'invoice_number'), ('order_number', 'order__order_number'),
+         ('customer', 'customer__name'), ('invoice_date', 'invoice_date'), ('due_date', 'due_date'),
+         ('status', 'status'), ('total_amount', 'total_amount')],
+        date_field='created_at',
+        filters={'status': 'status', 'customer': 'customer_id'},
+    ),
+    'routes': ExportSource(
+        'logistics.Route',
+        [('id', 'id'), ('route_number', 'route_number'), ('vehicle', 'vehicle__vehicle_number'),
+         ('driver', 'driver__user__username'), ('status', 'status'), ('planned_start_time', 'planned_start_time'),
+         ('planned_end_time', 'planned_end_time'), ('total_distance', 'total_distance')],
+        date_field='planned_start_time',
+        filters={'status': 'status', 'driver': 'driver_id', 'vehicle': 'vehicle_id'},
+    ),
+    'driver_locations': ExportSource(
+        'tracking.DriverLocation',
+        [('id', 'id'), ('timestamp', 'timestamp'), ('driver', 'driver_id'), ('route', 'route_id'),
+         ('latitude', 'latitude'), ('longitude', 'longitude'), ('speed', 'speed'), ('heading', 'heading')],
+        date_field='timestamp',
+        filters={'driver': 'driver_id', 'route': 'route_id'},
+    ),
+}
+# Names used by the report templates and seeded exports
+SOURCES['inventory_analytics'] = SOURCES['inventory']
+SOURCES['financial_analytics'] = SOURCES['invoices']
+SOURCES['logistics_status'] = SOURCES['routes']
+
+
+def get_source(name):
+    try:
+        return SOURCES[name]
+    except KeyError:
+        raise ExportError(f'Unknown data source "{name}". Choose from: {", ".join(sorted(SOURCES))}')
+
+
+def iter_rows(source, filters=None, chunk_size=CHUNK_SIZE):
+    return source.queryset(filters).iterator(chunk_size=chunk_size)
+
+
+def encode_csv(rows, headers, chunk_size=CHUNK_SIZE):
+    """Yield CSV text a chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(rows, headers, chunk_size=CHUNK_SIZE):
+    """Yield newline-delimited JSON objects, a chunk of rows at a time"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(headers, row))))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+ENCODERS = {'CSV': encode_csv, 'JSON': encode_ndjson}
+
+
+def stream_export(data_source, export_format, filters=None):
+    """Text chunks for a direct download; only CSV and JSON can be streamed"""
+    export_format = export_format.upper()
+    if export_format not in STREAMABLE_FORMATS:
+        raise ExportError(f'Only {" and ".join(STREAMABLE_FORMATS)} exports can be streamed')
+    source = get_source(data_source)
+    # Build the queryset now so bad filters fail before the response starts
+    rows = iter_rows(source, filters)
+    return ENCODERS[export_format](rows, source.headers)
+
+
+def write_excel(path, rows, headers):
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ExportError('Excel exports need the XlsxWriter package')
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'remove_timezone': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    sheet = None
+    row_number = EXCEL_MAX_ROWS
+    for row in rows:
+        if row_number == EXCEL_MAX_ROWS:
+            sheet = workbook.add_worksheet()
+            sheet.write_row(0, 0, headers)
+            row_number = 1
+        for column, value in enumerate(row):
+            if value is None:
+                continue
+            if isinstance(value, (datetime, date)):
+                sheet.write_datetime(row_number, column, value, date_format)
+            elif isinstance(value, Decimal):
+                sheet.write_number(row_number, column, float(value))
+            else:
+                sheet.write(row_number, column, value)
+        row_number += 1
+    if sheet is None:
+        workbook.add_worksheet().write_row(0, 0, headers)
+    workbook.close()
+
+
+def export_path(export):
+    extension = EXTENSIONS.get(export.export_format, 'dat')
+    name = f'{export.id}-{slugify(export.name) or "export"}.{extension}'
+    return os.path.join(settings.EXPORT_ROOT, name)
+
+
+def write_export(export):
+    """Write a DataExport's file. Returns (path, size in bytes)."""
+    if export.export_format not in EXTENSIONS:
+        raise ExportError(f'{export.export_format} exports are not supported')
+    source = get_source(export.data_source)
+    rows = iter_rows(source, export.filters)
+    path = export_path(export)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    try:
+        if export.export_format == 'EXCEL':
+            write_excel(partial, rows, source.headers)
+        else:
+            with open(partial, 'w', newline='', encoding='utf-8') as handle:
+                for chunk in ENCODERS[export.export_format](rows, source.headers):
+                    handle.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path, os.path.getsize(path)
+
+
+def run_export(export_id):
+    """Produce a pending DataExport and record the outcome on it"""
+    from .models import DataExport
+
+    claimed = DataExport.objects.filter(id=export_id, status__in=['PENDING', 'FAILED']).update(
+        status='PROCESSING', error_message=''
+    )
+    if not claimed:
+        return None
+    export = DataExport.objects.get(id=export_id)
+    try:
+        path, size = write_export(export)
+    except Exception as e:
+        DataExport.objects.filter(id=export_id).update(
+            status='FAILED', error_message=str(e), completed_at=timezone.now()
+        )
+        if not isinstance(e, ExportError):
+            raise
+        return None
+    DataExport.objects.filter(id=export_id).update(
+        status='COMPLETED', file_path=path, file_size=size, completed_at=timezone.now()
+    )
+    return path
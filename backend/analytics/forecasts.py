@@ -0,0 +1,158 @@
+"""
+Per-SKU, per-warehouse demand forecasts.
+
+Daily demand for every inventory row is built from order lines over the
+last FORECAST_HISTORY_DAYS (see inventory.replenishment.order_demand) and
+fitted in batches by analytics.smoothing across a process pool. Each row
+gets a KPIMetric, linked through its DemandForecast; a run replaces that
+metric's values from today on with FORECAST_HORIZON_DAYS daily forecasts.
+Rows without any demand in the history get no values. Values for past days
+are kept, so each day holds the last forecast made for it and can be
+compared with the demand that followed.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inventory.models import Inventory, Product, Warehouse
+from inventory.replenishment import order_demand, replenishment_user
+
+from . import smoothing
+from .models import DemandForecast, KPIMetric, MetricValue
+from .rollups import rebuild_rollups_since
+
+
+# Inventory rows per fitted batch; a product's rows are never split across batches
+BATCH_SIZE = 5000
+FORECAST_FIELDS = [
+    'product_id', 'warehouse_id', 'metric_id', 'method', 'alpha', 'daily_forecast', 'error', 'history_days',
+    'fitted_at',
+]
+
+
+def _batches(products, warehouses, start, days):
+    """(row range, demand matrix) per batch of the sorted inventory rows"""
+    first = 0
+    while first < len(products):
+        last = min(first + BATCH_SIZE, len(products))
+        # Unshipped orders are shared between a product's warehouses, so keep them together
+        last = int(np.searchsorted(products, products[last - 1], side='right'))
+        yield (first, last), order_demand(products[first:last], warehouses[first:last], start, days)
+        first = last
+
+
+def _metrics(products, warehouses, user):
+    """KPIMetric id of each row's forecast, creating the missing ones"""
+    existing = dict(
+        ((product_id, warehouse_id), metric_id) for product_id, warehouse_id, metric_id in
+        DemandForecast.objects.filter(product_id__in=np.unique(products).tolist()).values_list(
+            'product_id', 'warehouse_id', 'metric_id'
+        )
+    )
+    keys = list(zip(products.tolist(), warehouses.tolist()))
+    missing = [key for key in keys if key not in existing]
+    if missing:
+        skus = dict(Product.objects.filter(id__in={p for p, _ in missing}).values_list('id', 'sku'))
+        names = dict(Warehouse.objects.filter(id__in={w for _, w in missing}).values_list('id', 'name'))
+        created = KPIMetric.objects.bulk_create([
+            KPIMetric(
+                name=f'Demand forecast {skus[product_id]} at {names[warehouse_id]}'[:200],
+                metric_type='COUNT', category='INVENTORY',
+                description=f'Forecast daily units ordered of product {product_id} from warehouse {warehouse_id}',
+                calculation_logic='Exponential smoothing, or Croston for intermittent demand, of daily order lines',
+                created_by=user,
+            )
+            for product_id, warehouse_id in missing
+        ], batch_size=1000)
+        existing.update(zip(missing, (metric.pk for metric in created)))
+    return [existing[key] for key in keys]
+
+
+def _write_forecasts(forecasts):
+    """Replace the DemandForecast rows of the metrics in forecasts, given as DemandForecast field tuples"""
+    DemandForecast.objects.filter(metric_id__in=[row[2] for row in forecasts]).delete()
+    if connection.vendor == 'postgresql' and forecasts:
+        table = connection.ops.quote_name(DemandForecast._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(FORECAST_FIELDS)}) '
+                f'SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[], %s::varchar[], %s::float8[], '
+                f'%s::float8[], %s::float8[], %s::integer[], %s::timestamptz[])',
+                [list(column) for column in zip(*forecasts)],
+            )
+        return
+    DemandForecast.objects.bulk_create([
+        DemandForecast(**dict(zip(FORECAST_FIELDS, row))) for row in forecasts
+    ], batch_size=1000)
+
+
+def _write_values(metric_ids, forecast_ids, forecasts, first_date, horizon):
+    """
+    Delete the values of the metrics from first_date on, then write horizon
+    days of forecasts for the metrics in forecast_ids
+    """
+    values = [round(float(forecast), 4) for forecast in forecasts]
+    table = connection.ops.quote_name(MetricValue._meta.db_table)
+    with connection.cursor() as cursor:
+        # Deleting through the ORM would fetch every row to send its post_delete signal
+        cursor.execute(
+            f'DELETE FROM {table} WHERE metric_id IN ({", ".join(["%s"] * len(metric_ids))}) AND date >= %s',
+            metric_ids + [first_date],
+        )
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {table} (metric_id, value, date, timestamp, metadata) '
+                f'SELECT m, v, %s::date + d, now(), \'{{}}\'::jsonb '
+                f'FROM unnest(%s::bigint[], %s::numeric[]) AS t(m, v), generate_series(0, %s) AS d',
+                [first_date, forecast_ids, values, horizon - 1],
+            )
+            return
+    MetricValue.objects.bulk_create([
+        MetricValue(metric_id=metric_id, value=Decimal(str(value)), date=first_date + timedelta(days=day), metadata={})
+        for metric_id, value in zip(forecast_ids, values) for day in range(horizon)
+    ], batch_size=1000)
+
+
+def forecast_demand(workers=None, horizon=None, user=None):
+    """
+    Fit and store a demand forecast for every inventory row. Returns the
+    number of rows fitted under each method.
+    """
+    workers = workers or settings.FORECAST_WORKERS or None
+    horizon = horizon or settings.FORECAST_HORIZON_DAYS
+    history = settings.FORECAST_HISTORY_DAYS
+    user = user or replenishment_user()
+    now = timezone.now()
+    today = timezone.localdate(now)
+    start = today - timedelta(days=history)
+
+    rows = np.array(
+        Inventory.objects.order_by('product_id', 'warehouse_id').values_list('product_id', 'warehouse_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    products, warehouses = rows[:, 0], rows[:, 1]
+
+    fitted = dict.fromkeys(smoothing.METHODS.values(), 0)
+    for (first, last), (method, alpha, forecast, error) in smoothing.fit_batches(
+        _batches(products, warehouses, start, history), workers
+    ):
+        batch_products, batch_warehouses = products[first:last], warehouses[first:last]
+        methods = [smoothing.METHODS[code] for code in method.tolist()]
+        with transaction.atomic():
+            metric_ids = _metrics(batch_products, batch_warehouses, user)
+            _write_forecasts(list(zip(
+                batch_products.tolist(), batch_warehouses.tolist(), metric_ids, methods, alpha.tolist(),
+                forecast.tolist(), error.tolist(), [history] * len(methods), [now] * len(methods),
+            )))
+            # Rows without demand keep no future values rather than a run of zeros
+            selling = method != smoothing.NONE
+            _write_values(metric_ids, np.array(metric_ids)[selling].tolist(), forecast[selling], today, horizon)
+            # Bulk writes skip the MetricValue signals that keep rollups current
+            rebuild_rollups_since(metric_ids, today)
+        for name in methods:
+            fitted[name] += 1
+    return fitted
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from analytics.forecasts import forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Fit demand forecasts for every product at every warehouse and store them as metric values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Fitting processes (default: FORECAST_WORKERS)')
+        parser.add_argument('--horizon', type=int, help='Days to forecast (default: FORECAST_HORIZON_DAYS)')
+
+    def handle(self, *args, **options):
+        fitted = forecast_demand(workers=options['workers'], horizon=options['horizon'])
+        summary = ', '.join(f'{count} {method}' for method, count in fitted.items())
+        self.stdout.write(self.style.SUCCESS(f'Forecast {sum(fitted.values())} inventory row(s): {summary}'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from analytics.models import KPIMetric
+from analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly, daily and monthly MetricValue rollups from raw values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', type=int, action='append', help='Only rebuild these metric ids')
+
+    def handle(self, *args, **options):
+        metrics = KPIMetric.objects.all()
+        if options['metric']:
+            metrics = metrics.filter(id__in=options['metric'])
+        for metric_id, name in metrics.values_list('id', 'name'):
+            buckets = rebuild_rollups(metric_id)
+            self.stdout.write(f'{name}: {buckets} rollup buckets')
+        self.stdout.write(self.style.SUCCESS('Metric rollups rebuilt'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from analytics.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Re-derive incrementally maintained KPI counters and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drift without correcting the stored counters',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(apply=not options['dry_run'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('KPI counters are in sync'))
+            return
+        for key, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f'{key}: stored={stored} actual={actual} drift={actual - stored}')
+        verb = 'Found' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.WARNING(f'{verb} drift in {len(drift)} counter(s)'))
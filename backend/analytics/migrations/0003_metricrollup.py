@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_kpicounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('HOUR', 'Hourly'), ('DAY', 'Daily'), ('MONTH', 'Monthly')], max_length=10)),
+                ('period_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('sum', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('min_value', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('max_value', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('metric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='analytics.kpimetric')),
+            ],
+            options={
+                'ordering': ['metric', 'bucket', 'period_start'],
+                'unique_together': {('metric', 'bucket', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_replenishment'),
+        ('analytics', '0003_metricrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('NONE', 'No demand'), ('SES', 'Simple exponential smoothing'), ('CROSTON', 'Croston (intermittent demand)')], max_length=10)),
+                ('alpha', models.FloatField(default=0, help_text='Smoothing constant chosen for the series')),
+                ('daily_forecast', models.FloatField(default=0, help_text='Forecast units per day')),
+                ('error', models.FloatField(default=0, help_text='Root mean squared one-step error over the history')),
+                ('history_days', models.IntegerField()),
+                ('fitted_at', models.DateTimeField()),
+                ('metric', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecast', to='analytics.kpimetric')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='inventory.warehouse')),
+            ],
+            options={
+                'ordering': ['product', 'warehouse'],
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+    ]
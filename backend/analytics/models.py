@@ -209,3 +209,73 @@ class DataExport(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.export_format}) - {self.status}"
+
+
+class KPICounter(models.Model):
+    """Incrementally maintained dashboard counters"""
+    key = models.CharField(max_length=100, unique=True)
+    value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
+
+
+class MetricRollup(models.Model):
+    """Pre-aggregated MetricValue buckets used for trend charts"""
+    BUCKET_CHOICES = [
+        ('HOUR', 'Hourly'),
+        ('DAY', 'Daily'),
+        ('MONTH', 'Monthly'),
+    ]
+
+    metric = models.ForeignKey(KPIMetric, on_delete=models.CASCADE, related_name='rollups')
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    period_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    sum = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    min_value = models.DecimalField(max_digits=15, decimal_places=4)
+    max_value = models.DecimalField(max_digits=15, decimal_places=4)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['metric', 'bucket', 'period_start']
+        unique_together = ['metric', 'bucket', 'period_start']
+
+    def __str__(self):
+        return f"{self.metric.name} {self.bucket} {self.period_start}"
+
+    @property
+    def average(self):
+        if self.count:
+            return self.sum / self.count
+        return None
+
+
+class DemandForecast(models.Model):
+    """Latest demand forecast fitted for a product at a warehouse; daily values live in its metric"""
+    METHOD_CHOICES = [
+        ('NONE', 'No demand'),
+        ('SES', 'Simple exponential smoothing'),
+        ('CROSTON', 'Croston (intermittent demand)'),
+    ]
+
+    product = models.ForeignKey('inventory.Product', on_delete=models.CASCADE, related_name='demand_forecasts')
+    warehouse = models.ForeignKey('inventory.Warehouse', on_delete=models.CASCADE, related_name='demand_forecasts')
+    metric = models.OneToOneField(KPIMetric, on_delete=models.CASCADE, related_name='demand_forecast')
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES)
+    alpha = models.FloatField(default=0, help_text="Smoothing constant chosen for the series")
+    daily_forecast = models.FloatField(default=0, help_text="Forecast units per day")
+    error = models.FloatField(default=0, help_text="Root mean squared one-step error over the history")
+    history_days = models.IntegerField()
+    fitted_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['product', 'warehouse']
+        unique_together = ['product', 'warehouse']
+
+    def __str__(self):
+        return f"{self.product} @ {self.warehouse}: {self.daily_forecast:.2f}/day ({self.method})"
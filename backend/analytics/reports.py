@@ -0,0 +1,390 @@
+"""
+Scheduled report engine.
+
+A report renders the sections listed in its template's template_config;
+each section is a named query that takes a few normalized parameters
+(period, warehouse, category). Results are memoized by (query, parameters)
+for the run and shared through the cache for REPORT_SHARED_QUERY_SECONDS,
+so reports that hit the same query with the same parameters in a run window
+execute it once and fan the result out.
+"""
+import calendar
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .rollups import _day_start, _month_start, _quarter_start, _week_start, _year_start
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'analytics:report-query'
+ROW_LIMIT = 100
+
+
+def _add_months(moment, months):
+    """Moment moved by whole calendar months, keeping its day and time; the day is clamped to the month's end"""
+    year, month = divmod(moment.month - 1 + months, 12)
+    year += moment.year
+    day = min(moment.day, calendar.monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+# Frequency -> (start of the period containing a moment, a moment moved forward by n periods)
+PERIODS = {
+    'DAILY': (_day_start, lambda moment, n: moment + timedelta(days=n)),
+    'WEEKLY': (_week_start, lambda moment, n: moment + timedelta(days=7 * n)),
+    'MONTHLY': (_month_start, lambda moment, n: _add_months(moment, n)),
+    'QUARTERLY': (_quarter_start, lambda moment, n: _add_months(moment, 3 * n)),
+    'YEARLY': (_year_start, lambda moment, n: _add_months(moment, 12 * n)),
+}
+DEFAULT_SECTIONS = {
+    'INVENTORY': ['summary', 'low_stock', 'movements', 'valuations'],
+    'ORDER': ['orders'],
+    'FINANCIAL': ['revenue', 'expenses', 'profitability', 'trends'],
+    'LOGISTICS': ['deliveries'],
+    'PERFORMANCE': ['performance'],
+    'CUSTOMER': ['customers'],
+    'SUPPLIER': ['suppliers'],
+}
+
+QUERIES = {}
+
+
+def report_query(*params):
+    """Register a section query and the normalized parameters it depends on"""
+    def register(function):
+        QUERIES[function.__name__] = (function, params)
+        return function
+    return register
+
+
+def _inventory(warehouse, category):
+    from inventory.models import Inventory
+    queryset = Inventory.objects.all()
+    if warehouse:
+        queryset = queryset.filter(warehouse_id=warehouse)
+    if category:
+        queryset = queryset.filter(product__category_id=category)
+    return queryset
+
+
+@report_query('warehouse', 'category')
+def summary(warehouse, category):
+    return _inventory(warehouse, category).aggregate(
+        products=Count('product', distinct=True),
+        units=Sum('quantity'),
+        value=Sum(F('quantity') * F('product__unit_price')),
+        low_stock=Count('id', filter=Q(quantity__lte=F('reorder_level'))),
+    )
+
+
+@report_query('warehouse', 'category')
+def low_stock(warehouse, category):
+    return list(_inventory(warehouse, category).filter(quantity__lte=F('reorder_level')).order_by(
+        'quantity', 'id'
+    ).values('product__sku', 'product__name', 'warehouse__name', 'quantity', 'reorder_level')[:ROW_LIMIT])
+
+
+@report_query('start', 'end', 'warehouse', 'category')
+def movements(start, end, warehouse, category):
+    from inventory.models import InventoryTransaction
+    queryset = InventoryTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    if warehouse:
+        queryset = queryset.filter(warehouse_id=warehouse)
+    if category:
+        queryset = queryset.filter(product__category_id=category)
+    return list(queryset.values('transaction_type').annotate(
+        transactions=Count('id'), units=Sum('quantity')
+    ).order_by('transaction_type'))
+
+
+@report_query('warehouse', 'category')
+def valuations(warehouse, category):
+    return list(_inventory(warehouse, category).values('warehouse__name').annotate(
+        units=Sum('quantity'), value=Sum(F('quantity') * F('product__unit_price'))
+    ).order_by('-value'))
+
+
+@report_query('start', 'end')
+def revenue(start, end):
+    from finance.models import Invoice
+    return list(Invoice.objects.filter(
+        status='PAID', invoice_date__gte=start.date(), invoice_date__lt=end.date()
+    ).values('invoice_date').annotate(total=Sum('total_amount')).order_by('invoice_date'))
+
+
+@report_query('start', 'end')
+def expenses(start, end):
+    from finance.models import Expense
+    return list(Expense.objects.filter(
+        expense_date__gte=start.date(), expense_date__lt=end.date()
+    ).values('category').annotate(total=Sum('amount')).order_by('-total'))
+
+
+@report_query('start', 'end')
+def profitability(start, end):
+    from finance.models import Expense, Invoice
+    income = Invoice.objects.filter(
+        status='PAID', invoice_date__gte=start.date(), invoice_date__lt=end.date()
+    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+    spent = Expense.objects.filter(
+        expense_date__gte=start.date(), expense_date__lt=end.date()
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    return {'revenue': income, 'expenses': spent, 'profit': income - spent}
+
+
+@report_query('end')
+def trends(end):
+    from finance.models import Invoice
+    first = _month_start(end - timedelta(days=365))
+    return list(Invoice.objects.filter(
+        status='PAID', invoice_date__gte=first.date(), invoice_date__lt=end.date()
+    ).annotate(month=TruncMonth('invoice_date')).values('month').annotate(
+        total=Sum('total_amount')
+    ).order_by('month'))
+
+
+@report_query('start', 'end')
+def orders(start, end):
+    from orders.models import Order
+    return list(Order.objects.filter(created_at__gte=start, created_at__lt=end).values('status').annotate(
+        orders=Count('id'), value=Sum('total_amount')
+    ).order_by('status'))
+
+
+@report_query('start', 'end')
+def deliveries(start, end):
+    from logistics.models import Route
+    return list(Route.objects.filter(
+        planned_start_time__gte=start, planned_start_time__lt=end
+    ).values('status').annotate(routes=Count('id'), miles=Sum('total_distance')).order_by('status'))
+
+
+@report_query('start', 'end')
+def performance(start, end):
+    from optimization.models import PerformanceMetric
+    return list(PerformanceMetric.objects.filter(timestamp__gte=start, timestamp__lt=end).annotate(
+        day=TruncDate('timestamp')
+    ).values('day', 'metric_type').annotate(samples=Count('id'), total=Sum('value')).order_by(
+        'day', 'metric_type'
+    ))
+
+
+@report_query('start', 'end')
+def customers(start, end):
+    from finance.models import Invoice
+    return list(Invoice.objects.filter(
+        invoice_date__gte=start.date(), invoice_date__lt=end.date()
+    ).values('customer__name').annotate(invoices=Count('id'), total=Sum('total_amount')).order_by(
+        '-total'
+    )[:ROW_LIMIT])
+
+
+@report_query()
+def suppliers():
+    from partners.models import Supplier
+    return list(Supplier.objects.values('status', 'supplier_type').annotate(suppliers=Count('id')).order_by(
+        'status', 'supplier_type'
+    ))
+
+
+def report_period(frequency, date_range, moment):
+    """The last complete period before moment, e.g. the previous calendar month for 'monthly'"""
+    key = str(date_range or frequency).upper()
+    start_of, _ = PERIODS.get(key, PERIODS.get(frequency, PERIODS['DAILY']))
+    end = start_of(timezone.localtime(moment))
+    start = start_of(end - timedelta(microseconds=1))
+    return start, end
+
+
+def _choice(value):
+    return None if value in (None, '', 'all') else value
+
+
+def normalize_parameters(report, moment):
+    """Merge template and report parameters into the values the queries accept"""
+    merged = {**(report.report_template.parameters or {}), **(report.parameters or {})}
+    start, end = report_period(report.frequency, merged.get('date_range'), moment)
+    return {
+        'start': start,
+        'end': end,
+        'warehouse': _choice(merged.get('warehouse', merged.get('warehouse_filter'))),
+        'category': _choice(merged.get('category', merged.get('category_filter'))),
+    }
+
+
+class QueryRunner:
+    """Runs section queries once per (query, parameters) and counts what was shared"""
+
+    def __init__(self):
+        self.results = {}
+        self.executed = self.shared = 0
+
+    def run(self, name, parameters):
+        function, names = QUERIES[name]
+        arguments = {key: parameters[key] for key in names}
+        signature = json.dumps([name, arguments], cls=DjangoJSONEncoder, sort_keys=True)
+        key = f'{CACHE_PREFIX}:{hashlib.sha1(signature.encode()).hexdigest()}'
+        if key in self.results:
+            self.shared += 1
+            return self.results[key]
+        result = cache.get(key)
+        if result is None:
+            # Round-trip through JSON so cached and fresh results look the same
+            result = json.loads(json.dumps(function(**arguments), cls=DjangoJSONEncoder))
+            cache.set(key, result, settings.REPORT_SHARED_QUERY_SECONDS)
+            self.executed += 1
+        else:
+            self.shared += 1
+        self.results[key] = result
+        return result
+
+
+def render_report(report, moment, runner):
+    template = report.report_template
+    config = template.template_config or {}
+    parameters = normalize_parameters(report, moment)
+    sections = {}
+    for name in config.get('sections') or DEFAULT_SECTIONS.get(template.report_type, []):
+        if name in QUERIES:
+            sections[name] = runner.run(name, parameters)
+        else:
+            sections[name] = {'error': f'Unknown section "{name}"'}
+    return {
+        'report': report.name,
+        'template': template.name,
+        'report_type': template.report_type,
+        'generated_at': moment,
+        'period': {'start': parameters['start'], 'end': parameters['end']},
+        'parameters': {'warehouse': parameters['warehouse'], 'category': parameters['category']},
+        'options': {key: value for key, value in config.items() if key != 'sections'},
+        'sections': sections,
+    }
+
+
+def next_run_after(frequency, scheduled, moment):
+    """
+    The first run time after moment on the report's cadence. Runs keep the
+    scheduled day and time; counting from scheduled rather than from the
+    previous run keeps a run on the 31st from drifting after a short month.
+    """
+    _, advance = PERIODS.get(frequency, PERIODS['DAILY'])
+    periods = 0
+    run = scheduled
+    while run <= moment:
+        periods += 1
+        run = advance(scheduled, periods)
+    return run
+
+
+def store_output(report, output):
+    folder = os.path.join(settings.REPORT_ROOT, f'{report.id}-{slugify(report.name) or "report"}')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{output['generated_at']:%Y%m%d-%H%M%S}.json")
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(output, handle, cls=DjangoJSONEncoder, indent=2)
+    return path
+
+
+def deliver(report, path):
+    if not settings.REPORT_EMAIL_ENABLED or not report.recipients:
+        return False
+    message = EmailMessage(subject=f'{report.name} ({report.frequency.lower()})', to=report.recipients,
+                           body=f'Attached is the latest "{report.name}" report.')
+    message.attach_file(path, 'application/json')
+    try:
+        message.send()
+    except Exception:
+        logger.exception('Could not email report %s', report.id)
+        return False
+    return True
+
+
+def _claim(report, moment):
+    """Advance next_run so no other worker picks the report up. Returns the scheduled time or None."""
+    from .models import ScheduledReport
+
+    queryset = ScheduledReport.objects.filter(id=report.id)
+    if report.next_run:
+        queryset = queryset.filter(next_run=report.next_run)
+    else:
+        queryset = queryset.filter(next_run__isnull=True)
+    scheduled = report.next_run or moment
+    if not queryset.update(last_run=moment, next_run=next_run_after(report.frequency, scheduled, moment)):
+        return None
+    return scheduled
+
+
+def _metric_value(value):
+    # PerformanceMetric.value holds at most 6 integer digits
+    return Decimal(f'{min(value, 999999):.4f}')
+
+
+def execute(report, moment, runner, scheduled=None):
+    """Render, store and deliver one report; returns (path, metrics)"""
+    from optimization.models import PerformanceMetric
+
+    picked_up = timezone.now()
+    started = time.perf_counter()
+    output = render_report(report, moment, runner)
+    path = store_output(report, output)
+    render_ms = (time.perf_counter() - started) * 1000
+    delivered = deliver(report, path)
+    endpoint = f'scheduled-report:{report.id}'
+    metadata = {'report': report.name, 'path': path, 'delivered': delivered}
+    metrics = [PerformanceMetric(
+        metric_type='RESPONSE_TIME', value=_metric_value(render_ms), unit='ms',
+        endpoint=endpoint, metadata=metadata,
+    )]
+    if scheduled is not None:
+        metrics.append(PerformanceMetric(
+            metric_type='QUEUE_LATENCY', value=_metric_value((picked_up - scheduled).total_seconds()), unit='s',
+            endpoint=endpoint, metadata=metadata,
+        ))
+    return path, metrics
+
+
+def run_due_reports(moment=None):
+    """Run every active report whose next_run has passed. Returns a summary of the run."""
+    from optimization.models import PerformanceMetric
+    from .models import ScheduledReport
+
+    moment = moment or timezone.now()
+    due = ScheduledReport.objects.filter(is_active=True, report_template__is_active=True).filter(
+        Q(next_run__lte=moment) | Q(next_run__isnull=True)
+    ).select_related('report_template').order_by('next_run', 'id')
+    runner = QueryRunner()
+    metrics, completed, failed = [], [], []
+    for report in due:
+        try:
+            scheduled = _claim(report, moment)
+            if scheduled is None:
+                continue
+            _, report_metrics = execute(report, moment, runner, scheduled)
+        except Exception:
+            logger.exception('Scheduled report %s failed', report.id)
+            failed.append(report.id)
+            continue
+        metrics.extend(report_metrics)
+        completed.append(report.id)
+    PerformanceMetric.objects.bulk_create(metrics)
+    return {
+        'completed': completed,
+        'failed': failed,
+        'queries_executed': runner.executed,
+        'queries_shared': runner.shared,
+    }
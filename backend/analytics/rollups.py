@@ -0,0 +1,234 @@
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Sum, Min, Max, F
+from django.db.models.functions import Least, Greatest
+from django.utils import timezone
+
+from .models import MetricValue, MetricRollup
+
+
+ROLLUP_LEVELS = ['HOUR', 'DAY', 'MONTH']
+
+
+def _hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _week_start(moment):
+    day = _day_start(moment)
+    return day - timedelta(days=day.weekday())
+
+
+def _month_start(moment):
+    return _day_start(moment).replace(day=1)
+
+
+def _quarter_start(moment):
+    month = _month_start(moment)
+    return month.replace(month=(month.month - 1) // 3 * 3 + 1)
+
+
+def _year_start(moment):
+    return _month_start(moment).replace(month=1)
+
+
+LEVEL_START = {
+    'HOUR': _hour_start,
+    'DAY': _day_start,
+    'MONTH': _month_start,
+}
+
+# Requested resolution -> (rollup level to read, regrouping applied on top).
+# Each entry uses the coarsest stored level whose buckets nest inside the
+# requested one.
+SERIES_BUCKETS = {
+    'hour': ('HOUR', None),
+    'day': ('DAY', None),
+    'week': ('DAY', _week_start),
+    'month': ('MONTH', None),
+    'quarter': ('MONTH', _quarter_start),
+    'year': ('MONTH', _year_start),
+}
+
+
+def point_time(value_date):
+    """MetricValue rows are daily; their point in time is local midnight"""
+    return timezone.make_aware(datetime.combine(value_date, time.min))
+
+
+def _level_end(level, start):
+    if level == 'HOUR':
+        return start + timedelta(hours=1)
+    if level == 'DAY':
+        return start + timedelta(days=1)
+    return _month_start(start + timedelta(days=32))
+
+
+def _first_midnight_from(moment):
+    if moment == _day_start(moment):
+        return moment.date()
+    return moment.date() + timedelta(days=1)
+
+
+def _dates_in(start, end):
+    """Half-open date range whose midnights fall inside [start, end)"""
+    return _first_midnight_from(start), _first_midnight_from(end)
+
+
+def add_value(metric_id, value_date, value):
+    """Fold a newly inserted value into every rollup level"""
+    moment = point_time(value_date)
+    for level in ROLLUP_LEVELS:
+        start = LEVEL_START[level](moment)
+        lookup = MetricRollup.objects.filter(metric_id=metric_id, bucket=level, period_start=start)
+        changes = {
+            'count': F('count') + 1,
+            'sum': F('sum') + value,
+            'min_value': Least('min_value', value),
+            'max_value': Greatest('max_value', value),
+        }
+        if not lookup.update(**changes):
+            MetricRollup.objects.bulk_create([
+                MetricRollup(
+                    metric_id=metric_id, bucket=level, period_start=start,
+                    min_value=value, max_value=value,
+                )
+            ], ignore_conflicts=True)
+            lookup.update(**changes)
+
+
+def refresh_buckets(metric_id, value_date):
+    """
+    Re-derive every rollup containing value_date from the raw values.
+
+    Used for updates and deletes, where min/max cannot be maintained
+    incrementally. A month bucket spans at most 31 raw rows per metric.
+    """
+    moment = point_time(value_date)
+    for level in ROLLUP_LEVELS:
+        start = LEVEL_START[level](moment)
+        first, last = _dates_in(start, _level_end(level, start))
+        totals = MetricValue.objects.filter(
+            metric_id=metric_id, date__gte=first, date__lt=last
+        ).aggregate(count=Count('id'), sum=Sum('value'), min_value=Min('value'), max_value=Max('value'))
+        lookup = {'metric_id': metric_id, 'bucket': level, 'period_start': start}
+        if totals['count']:
+            MetricRollup.objects.update_or_create(defaults=totals, **lookup)
+        else:
+            MetricRollup.objects.filter(**lookup).delete()
+
+
+def _fold(values):
+    """{(metric_id, level, period_start): [count, sum, min, max]} for (metric_id, date, value) rows"""
+    buckets = {}
+    for metric_id, value_date, value in values:
+        moment = point_time(value_date)
+        for level in ROLLUP_LEVELS:
+            key = (metric_id, level, LEVEL_START[level](moment))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, value, value, value]
+            else:
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+    return buckets
+
+
+def _create_rollups(buckets):
+    MetricRollup.objects.bulk_create([
+        MetricRollup(
+            metric_id=metric_id, bucket=level, period_start=start,
+            count=count, sum=total, min_value=low, max_value=high,
+        )
+        for (metric_id, level, start), (count, total, low, high) in buckets.items()
+    ], batch_size=1000)
+
+
+def rebuild_rollups(metric_id):
+    """Rebuild all rollups of a metric by streaming its raw values once"""
+    values = MetricValue.objects.filter(metric_id=metric_id).values_list('metric_id', 'date', 'value')
+    buckets = _fold(values.iterator(chunk_size=2000))
+    MetricRollup.objects.filter(metric_id=metric_id).delete()
+    _create_rollups(buckets)
+    return len(buckets)
+
+
+def rebuild_rollups_since(metric_ids, first_date):
+    """
+    Rebuild the rollups of many metrics from the month holding first_date
+    on, e.g. after their values were rewritten in bulk, which skips the
+    MetricValue signals.
+    """
+    month = _month_start(point_time(first_date))
+    MetricRollup.objects.filter(metric_id__in=metric_ids, period_start__gte=month).delete()
+    if connection.vendor == 'postgresql':
+        # Daily values map one-to-one onto hour and day buckets; months are grouped in the database
+        values = connection.ops.quote_name(MetricValue._meta.db_table)
+        rollups = connection.ops.quote_name(MetricRollup._meta.db_table)
+        zone = timezone.get_current_timezone_name()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {rollups} (metric_id, bucket, period_start, count, sum, min_value, max_value, '
+                f'updated_at) '
+                f'SELECT metric_id, levels.bucket, date::timestamp AT TIME ZONE %s, 1, value, value, value, now() '
+                f'FROM {values}, (VALUES (%s), (%s)) AS levels(bucket) WHERE metric_id = ANY(%s) AND date >= %s '
+                f'UNION ALL '
+                f'SELECT metric_id, %s, date_trunc(\'month\', date)::timestamp AT TIME ZONE %s, COUNT(*), SUM(value), '
+                f'MIN(value), MAX(value), now() '
+                f'FROM {values} WHERE metric_id = ANY(%s) AND date >= %s GROUP BY metric_id, date_trunc(\'month\', date)',
+                [zone, 'HOUR', 'DAY', list(metric_ids), month.date(), 'MONTH', zone, list(metric_ids), month.date()],
+            )
+        return
+    values = MetricValue.objects.filter(metric_id__in=metric_ids, date__gte=month.date()).values_list(
+        'metric_id', 'date', 'value'
+    )
+    _create_rollups(_fold(values.iterator(chunk_size=2000)))
+
+
+def get_series(metric_id, start, end, bucket):
+    """
+    Return (source_level, points) for a metric between start and end.
+
+    Reads the coarsest stored rollup that still satisfies the requested
+    bucket and regroups it in memory when the bucket is coarser still.
+    """
+    level, regroup = SERIES_BUCKETS[bucket]
+    start = timezone.localtime(start)
+    rollups = MetricRollup.objects.filter(
+        metric_id=metric_id, bucket=level,
+        period_start__gte=LEVEL_START[level](start), period_start__lt=end,
+    ).order_by('period_start').values_list('period_start', 'count', 'sum', 'min_value', 'max_value')
+
+    grouped = OrderedDict()
+    for period_start, count, total, low, high in rollups:
+        key = regroup(timezone.localtime(period_start)) if regroup else period_start
+        bucket_totals = grouped.get(key)
+        if bucket_totals is None:
+            grouped[key] = [count, total, low, high]
+        else:
+            bucket_totals[0] += count
+            bucket_totals[1] += total
+            bucket_totals[2] = min(bucket_totals[2], low)
+            bucket_totals[3] = max(bucket_totals[3], high)
+
+    points = [
+        {
+            'period_start': period_start.isoformat(),
+            'count': count,
+            'sum': float(total),
+            'min': float(low),
+            'max': float(high),
+            'avg': float(Decimal(total) / count) if count else None,
+        }
+        for period_start, (count, total, low, high) in grouped.items()
+    ]
+    return level, points
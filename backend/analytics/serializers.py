@@ -71,4 +71,6 @@ class DataExportSerializer(serializers.ModelSerializer):
     class Meta:
         model = DataExport
         fields = '__all__'
-        read_only_fields = ['created_at', 'completed_at']
+        read_only_fields = [
+            'status', 'file_path', 'file_size', 'error_message', 'created_by', 'created_at', 'completed_at',
+        ]
@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from inventory.models import Inventory
+from orders.models import Order
+from finance.models import Invoice
+from . import counters, rollups
+from .models import MetricValue
+
+
+# Invoice status -> counter that tracks the sum of its total_amount
+INVOICE_STATUS_COUNTERS = {
+    'PAID': counters.INVOICES_PAID_TOTAL,
+    'SENT': counters.INVOICES_SENT_TOTAL,
+}
+
+
+def _is_low_stock(quantity, reorder_level):
+    if not isinstance(quantity, int) or not isinstance(reorder_level, int):
+        return False
+    return counters.is_low_stock(quantity, reorder_level)
+
+
+@receiver(post_init, sender=Inventory)
+def snapshot_inventory(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not fetched on every load
+    instance._kpi_low_stock = _is_low_stock(
+        instance.__dict__.get('quantity'), instance.__dict__.get('reorder_level')
+    )
+
+
+@receiver(post_save, sender=Inventory)
+def inventory_saved(sender, instance, created, **kwargs):
+    if not isinstance(instance.quantity, int) or not isinstance(instance.reorder_level, int):
+        # F() expressions are resolved by the database; leave it to reconciliation
+        return
+    was_low = False if created else instance._kpi_low_stock
+    is_low = _is_low_stock(instance.quantity, instance.reorder_level)
+    counters.increment(counters.INVENTORY_LOW_STOCK, int(is_low) - int(was_low))
+    instance._kpi_low_stock = is_low
+
+
+@receiver(post_delete, sender=Inventory)
+def inventory_deleted(sender, instance, **kwargs):
+    if instance._kpi_low_stock:
+        counters.increment(counters.INVENTORY_LOW_STOCK, -1)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(counters.ORDERS_TOTAL, 1)
+        day = timezone.localdate(instance.created_at)
+        counters.increment(counters.order_day_key(day), 1)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    counters.increment(counters.ORDERS_TOTAL, -1)
+    day = timezone.localdate(instance.created_at)
+    counters.increment(counters.order_day_key(day), -1)
+
+
+@receiver(post_init, sender=Invoice)
+def snapshot_invoice(sender, instance, **kwargs):
+    instance._kpi_state = (
+        instance.__dict__.get('status'),
+        instance.__dict__.get('total_amount'),
+    )
+
+
+def _invoice_contribution(status, total_amount):
+    key = INVOICE_STATUS_COUNTERS.get(status)
+    if key is None or total_amount is None:
+        return None, Decimal('0')
+    return key, Decimal(total_amount)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, created, **kwargs):
+    old_status, old_total = (None, None) if created else instance._kpi_state
+    old_key, old_amount = _invoice_contribution(old_status, old_total)
+    new_key, new_amount = _invoice_contribution(instance.status, instance.total_amount)
+
+    if old_key == new_key:
+        if new_key:
+            counters.increment(new_key, new_amount - old_amount)
+    else:
+        if old_key:
+            counters.increment(old_key, -old_amount)
+        if new_key:
+            counters.increment(new_key, new_amount)
+    instance._kpi_state = (instance.status, instance.total_amount)
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    key, amount = _invoice_contribution(*instance._kpi_state)
+    if key:
+        counters.increment(key, -amount)
+
+
+@receiver(post_init, sender=MetricValue)
+def snapshot_metric_value(sender, instance, **kwargs):
+    instance._rollup_date = instance.__dict__.get('date')
+
+
+@receiver(post_save, sender=MetricValue)
+def metric_value_saved(sender, instance, created, **kwargs):
+    if created:
+        rollups.add_value(instance.metric_id, instance.date, instance.value)
+    else:
+        if instance._rollup_date and instance._rollup_date != instance.date:
+            rollups.refresh_buckets(instance.metric_id, instance._rollup_date)
+        rollups.refresh_buckets(instance.metric_id, instance.date)
+    instance._rollup_date = instance.date
+
+
+@receiver(post_delete, sender=MetricValue)
+def metric_value_deleted(sender, instance, **kwargs):
+    rollups.refresh_buckets(instance.metric_id, instance.date)
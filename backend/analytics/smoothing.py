@@ -0,0 +1,120 @@
+"""
+Demand forecasting models, vectorised across series.
+
+Like logistics/fleet.py this module is free of Django so fits can run in
+worker processes. A batch is a (series, days) array of daily demand, oldest
+day first. Each model is run for every series and every smoothing constant
+in ALPHAS at once, stepping through the days; each series keeps the
+constant with the lowest one-step-ahead squared error.
+
+Series with intermittent demand (an average interval between demands of at
+least INTERMITTENT_INTERVAL days, the Syntetos-Boylan cut-off) use Croston's
+method with the Syntetos-Boylan bias correction; the others use simple
+exponential smoothing. Both forecast a flat rate: expected units per day.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+INTERMITTENT_INTERVAL = 1.32
+# Days averaged for the starting level of exponential smoothing
+WARMUP_DAYS = 7
+
+NONE, SES, CROSTON = 0, 1, 2
+METHODS = {NONE: 'NONE', SES: 'SES', CROSTON: 'CROSTON'}
+
+
+def exponential_smoothing(demand, alphas):
+    """One-step forecasts (alphas, series, days) and the final forecast (alphas, series)"""
+    weights = alphas[:, None]
+    level = np.repeat(demand[:, :WARMUP_DAYS].mean(axis=1)[None, :], len(alphas), axis=0)
+    fitted = np.empty((len(alphas),) + demand.shape)
+    for day in range(demand.shape[1]):
+        fitted[:, :, day] = level
+        level = level + weights * (demand[:, day] - level)
+    return fitted, level
+
+
+def croston(demand, alphas):
+    """
+    One-step forecasts (alphas, series, days) and the final forecast
+    (alphas, series): smoothed demand size over smoothed interval, updated
+    only on days with demand
+    """
+    weights = alphas[:, None]
+    occurs = demand > 0
+    counts = np.maximum(occurs.sum(axis=1), 1)
+    size = np.repeat((demand.sum(axis=1) / counts)[None, :], len(alphas), axis=0)
+    interval = np.repeat((demand.shape[1] / counts)[None, :], len(alphas), axis=0)
+    since = np.ones(len(demand))
+    correction = 1 - weights / 2
+    fitted = np.empty((len(alphas),) + demand.shape)
+    for day in range(demand.shape[1]):
+        fitted[:, :, day] = correction * size / interval
+        hit = occurs[:, day]
+        size = np.where(hit, size + weights * (demand[:, day] - size), size)
+        interval = np.where(hit, interval + weights * (since - interval), interval)
+        since = np.where(hit, 1, since + 1)
+    return fitted, correction * size / interval
+
+
+MODELS = {SES: exponential_smoothing, CROSTON: croston}
+
+
+def fit(demand):
+    """
+    Fit every series of a demand batch. Returns parallel arrays (method code,
+    smoothing constant, daily forecast, one-step RMSE).
+    """
+    demand = np.asarray(demand, dtype=float)
+    count, days = demand.shape
+    occurrences = (demand > 0).sum(axis=1)
+    interval = days / np.maximum(occurrences, 1)
+    method = np.where(occurrences == 0, NONE, np.where(interval >= INTERMITTENT_INTERVAL, CROSTON, SES))
+
+    alpha, forecast, error = np.zeros(count), np.zeros(count), np.zeros(count)
+    for code, model in MODELS.items():
+        rows = method == code
+        if not rows.any():
+            continue
+        fitted, final = model(demand[rows], ALPHAS)
+        errors = ((fitted - demand[rows]) ** 2).mean(axis=2)
+        best = errors.argmin(axis=0)
+        series = np.arange(rows.sum())
+        alpha[rows] = ALPHAS[best]
+        forecast[rows] = final[best, series]
+        error[rows] = np.sqrt(errors[best, series])
+    return method, alpha, forecast, error
+
+
+def fit_batches(batches, workers=None):
+    """
+    Fit an iterable of (key, demand) batches in a process pool, yielding
+    (key, fit results) in order. Batches are submitted as they are produced,
+    so reading the next batch overlaps fitting the previous ones. Inside
+    daemonic processes (e.g. Celery workers), which cannot fork children,
+    batches are fitted in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or multiprocessing.current_process().daemon:
+        for key, demand in batches:
+            yield key, fit(demand)
+        return
+
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = deque()
+        for key, demand in batches:
+            pending.append((key, pool.submit(fit, demand)))
+            # Bound the batches held in memory while keeping every worker busy
+            while len(pending) > 2 * workers:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
@@ -0,0 +1,109 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, F, Q
+from django.utils import timezone
+
+from .counters import read_counters
+
+
+SUMMARY_CACHE_KEY = 'analytics:dashboard-summary'
+SUMMARY_LOCK_KEY = 'analytics:dashboard-summary:lock'
+
+CACHE_HIT = 'HIT'
+CACHE_STALE = 'STALE'
+CACHE_MISS = 'MISS'
+
+
+def compute_dashboard_summary():
+    """
+    Build the dashboard summary.
+
+    Order, low-stock and invoice totals come from the incrementally maintained
+    KPI counters; the remaining metrics use one aggregate query per table.
+    """
+    from inventory.models import Product, Inventory
+    from orders.models import Customer
+    from finance.models import Invoice
+    from logistics.models import Vehicle, Driver
+
+    kpis = read_counters()
+    inventory = Inventory.objects.aggregate(
+        total_inventory_value=Sum(F('quantity') * F('product__unit_price')),
+    )
+    customers = Customer.objects.aggregate(
+        total_customers=Count('id'),
+        active_customers=Count('id', filter=Q(is_active=True)),
+    )
+    drivers = Driver.objects.aggregate(
+        total_drivers=Count('id'),
+        active_routes=Count('id', filter=Q(is_active=True)),
+    )
+
+    return {
+        'inventory': {
+            'total_products': Product.objects.count(),
+            'low_stock_products': kpis['low_stock_products'],
+            'total_inventory_value': float(inventory['total_inventory_value'] or 0),
+        },
+        'orders': {
+            'total_orders': kpis['total_orders'],
+            'orders_last_30_days': kpis['orders_last_30_days'],
+            'orders_last_7_days': kpis['orders_last_7_days'],
+        },
+        'customers': customers,
+        'finance': {
+            'total_invoices': Invoice.objects.count(),
+            'total_revenue': float(kpis['total_revenue']),
+            'pending_payments': float(kpis['pending_payments']),
+        },
+        'logistics': {
+            'total_vehicles': Vehicle.objects.count(),
+            'total_drivers': drivers['total_drivers'],
+            'active_routes': drivers['active_routes'],
+        },
+        'last_updated': timezone.now().isoformat(),
+    }
+
+
+def _recompute():
+    started = time.perf_counter()
+    summary = compute_dashboard_summary()
+    compute_ms = (time.perf_counter() - started) * 1000
+    entry = {
+        'summary': summary,
+        'compute_ms': compute_ms,
+        'fresh_until': time.time() + settings.DASHBOARD_SUMMARY_TTL,
+    }
+    # Keep the entry well past its freshness window so pollers can be served
+    # stale data while a single worker refreshes it.
+    cache.set(SUMMARY_CACHE_KEY, entry, settings.DASHBOARD_SUMMARY_STALE_TTL)
+    return entry
+
+
+def get_dashboard_summary():
+    """
+    Return (summary, cache_status, compute_ms).
+
+    Fresh entries are served as HIT. Once an entry expires, the first caller to
+    take the refresh lock recomputes it while everyone else gets the stale copy.
+    """
+    entry = cache.get(SUMMARY_CACHE_KEY)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry['summary'], CACHE_HIT, entry['compute_ms']
+
+    if cache.add(SUMMARY_LOCK_KEY, 1, settings.DASHBOARD_SUMMARY_LOCK_TIMEOUT):
+        try:
+            entry = _recompute()
+        finally:
+            cache.delete(SUMMARY_LOCK_KEY)
+        return entry['summary'], CACHE_MISS, entry['compute_ms']
+
+    if entry is not None:
+        return entry['summary'], CACHE_STALE, entry['compute_ms']
+
+    # Cold cache and another worker holds the lock: compute without storing.
+    started = time.perf_counter()
+    summary = compute_dashboard_summary()
+    return summary, CACHE_MISS, (time.perf_counter() - started) * 1000
@@ -0,0 +1,31 @@
+from celery import shared_task
+
+from .counters import reconcile_counters
+from .exports import run_export
+from .forecasts import forecast_demand as run_forecasts
+from .reports import run_due_reports
+
+
+@shared_task
+def reconcile_kpi_counters():
+    """Re-derive dashboard counters and report any drift"""
+    drift = reconcile_counters()
+    return {key: [str(stored), str(actual)] for key, (stored, actual) in drift.items()}
+
+
+@shared_task
+def run_data_export(export_id):
+    """Write the file for a DataExport and record its status"""
+    return run_export(export_id)
+
+
+@shared_task
+def run_scheduled_reports():
+    """Render every scheduled report that is due"""
+    return run_due_reports()
+
+
+@shared_task
+def forecast_demand():
+    """Refit demand forecasts for every product at every warehouse"""
+    return run_forecasts()
@@ -4,9 +4,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db import transaction
 from django.db.models import Count, Sum, Avg, Q
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import datetime, timedelta
+from optimization.models import PerformanceMetric
 from .models import (
     DashboardWidget, UserDashboard, KPIMetric, MetricValue,
     ReportTemplate, ScheduledReport, DataExport
@@ -15,6 +19,37 @@ from .serializers import (
     DashboardWidgetSerializer, UserDashboardSerializer, KPIMetricSerializer,
     MetricValueSerializer, ReportTemplateSerializer, ScheduledReportSerializer, DataExportSerializer
 )
+from .exports import STREAMABLE_FORMATS, EXTENSIONS, ExportError, stream_export
+from .reports import QueryRunner, execute
+from .summary import get_dashboard_summary
+from .tasks import run_data_export
+from .rollups import SERIES_BUCKETS, get_series
+
+
+def _parse_moment(value, end_of_day=False):
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime. A
+    plain date is the start of that day, or its end if end_of_day.
+    """
+    if not value:
+        return None
+    # parse_datetime also accepts a plain date (as midnight), so dates are told apart first
+    try:
+        day = parse_date(value)
+        if day is not None:
+            if end_of_day:
+                day += timedelta(days=1)
+            moment = datetime.combine(day, datetime.min.time())
+        else:
+            moment = parse_datetime(value)
+        if moment is not None and timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    except (ValueError, OverflowError):
+        # Well-formed but impossible values, e.g. 2024-02-30, or the day after 9999-12-31
+        moment = None
+    if moment is None:
+        raise ValueError(f'Invalid date: {value}')
+    return moment
 
 
 class DashboardWidgetViewSet(viewsets.ModelViewSet):
@@ -50,6 +85,33 @@ class KPIMetricViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'category', 'created_at']
 
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        """Get a metric's values aggregated into time buckets"""
+        metric = self.get_object()
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in SERIES_BUCKETS:
+            return Response(
+                {'error': f'bucket must be one of: {", ".join(SERIES_BUCKETS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = _parse_moment(request.query_params.get('to'), end_of_day=True) or timezone.now()
+            start = _parse_moment(request.query_params.get('from')) or end - timedelta(days=30)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        source, points = get_series(metric.id, start, end, bucket)
+        return Response({
+            'metric': metric.id,
+            'name': metric.name,
+            'bucket': bucket,
+            'source_rollup': source,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'points': points,
+        })
+
 
 class MetricValueViewSet(viewsets.ModelViewSet):
     queryset = MetricValue.objects.select_related('metric')
@@ -80,6 +142,27 @@ class ScheduledReportViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'report_template__name']
     ordering_fields = ['name', 'frequency', 'next_run']
 
+    @action(detail=True, methods=['post'], url_path='run-now')
+    def run_now(self, request, pk=None):
+        """Render the report immediately without changing its schedule"""
+        report = self.get_object()
+        runner = QueryRunner()
+        try:
+            path, metrics = execute(report, timezone.now(), runner)
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to run report: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        PerformanceMetric.objects.bulk_create(metrics)
+        return Response({
+            'report': report.id,
+            'path': path,
+            'render_ms': float(metrics[0].value),
+            'queries_executed': runner.executed,
+            'queries_shared': runner.shared,
+        })
+
 
 class DataExportViewSet(viewsets.ModelViewSet):
     queryset = DataExport.objects.select_related('created_by')
@@ -94,87 +177,62 @@ class DataExportViewSet(viewsets.ModelViewSet):
         # Users can only see their own exports
         return super().get_queryset().filter(created_by=self.request.user)
 
+    def perform_create(self, serializer):
+        export = serializer.save(created_by=self.request.user)
+        transaction.on_commit(lambda: run_data_export.delay(export.id))
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file of a completed export"""
+        export = self.get_object()
+        if export.status != 'COMPLETED':
+            return Response(
+                {'error': f'Export is {export.status.lower()}', 'status': export.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            handle = open(export.file_path, 'rb')
+        except OSError:
+            return Response({'error': 'Export file is no longer available'}, status=status.HTTP_410_GONE)
+        return FileResponse(handle, as_attachment=True, filename=export.file_path.rsplit('/', 1)[-1])
+
+    @action(detail=False, methods=['get'])
+    def stream(self, request):
+        """
+        Stream an export straight to the client without recording it.
+        ?data_source=...&export_format=CSV|JSON; other parameters are filters.
+        """
+        params = request.query_params
+        export_format = params.get('export_format', 'CSV').upper()
+        filters = {
+            key: values if len(values) > 1 else values[0]
+            for key, values in params.lists() if key not in ('data_source', 'export_format')
+        }
+        try:
+            chunks = stream_export(params.get('data_source', ''), export_format, filters)
+        except ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(chunks, content_type=STREAMABLE_FORMATS[export_format])
+        filename = f"{params['data_source']}-{timezone.now():%Y%m%d-%H%M%S}.{EXTENSIONS[export_format]}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 
 class AnalyticsViewSet(viewsets.ViewSet):
     """Analytics and business intelligence endpoints"""
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
 
-    @action(detail=False, methods=['get'], url_path='dashboard-summary')
+    # Served from cache and polled by wallboards, so only the per-user limit applies
+    @action(detail=False, methods=['get'], url_path='dashboard-summary', throttle_scope=None)
     def dashboard_summary(self, request):
         """Get dashboard summary with key metrics"""
         try:
-            # Import models for analytics
-            from inventory.models import Product, Inventory
-            from orders.models import Order, Customer
-            from finance.models import Invoice, Payment
-            from logistics.models import Vehicle, Driver
-            
-            # Get current date and date ranges
-            today = timezone.now().date()
-            last_30_days = today - timedelta(days=30)
-            last_7_days = today - timedelta(days=7)
-            
-            # Inventory metrics
-            total_products = Product.objects.count()
-            low_stock_products = Inventory.objects.filter(quantity__lte=10).count()
-            # Calculate inventory value using F() expressions
-            from django.db.models import F
-            total_inventory_value = Inventory.objects.aggregate(
-                total=Sum(F('quantity') * F('product__unit_price'))
-            )['total'] or 0
-            
-            # Order metrics
-            total_orders = Order.objects.count()
-            orders_last_30_days = Order.objects.filter(created_at__date__gte=last_30_days).count()
-            orders_last_7_days = Order.objects.filter(created_at__date__gte=last_7_days).count()
-            
-            # Customer metrics
-            total_customers = Customer.objects.count()
-            active_customers = Customer.objects.filter(is_active=True).count()
-            
-            # Financial metrics
-            total_invoices = Invoice.objects.count()
-            total_revenue = Invoice.objects.filter(status='PAID').aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            pending_payments = Invoice.objects.filter(status='SENT').aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            
-            # Logistics metrics
-            total_vehicles = Vehicle.objects.count()
-            total_drivers = Driver.objects.count()
-            active_routes = Driver.objects.filter(is_active=True).count()
-            
-            summary = {
-                'inventory': {
-                    'total_products': total_products,
-                    'low_stock_products': low_stock_products,
-                    'total_inventory_value': float(total_inventory_value),
-                },
-                'orders': {
-                    'total_orders': total_orders,
-                    'orders_last_30_days': orders_last_30_days,
-                    'orders_last_7_days': orders_last_7_days,
-                },
-                'customers': {
-                    'total_customers': total_customers,
-                    'active_customers': active_customers,
-                },
-                'finance': {
-                    'total_invoices': total_invoices,
-                    'total_revenue': float(total_revenue),
-                    'pending_payments': float(pending_payments),
-                },
-                'logistics': {
-                    'total_vehicles': total_vehicles,
-                    'total_drivers': total_drivers,
-                    'active_routes': active_routes,
-                },
-                'last_updated': timezone.now().isoformat(),
-            }
-            
-            return Response(summary)
+            summary, cache_status, compute_ms = get_dashboard_summary()
+            response = Response(summary)
+            response['X-Summary-Cache'] = cache_status
+            response['X-Summary-Compute-Time-Ms'] = f'{compute_ms:.2f}'
+            return response
             
         except Exception as e:
             return Response(
@@ -187,7 +245,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """Get inventory analytics and trends"""
         try:
             from inventory.models import Product, Inventory, InventoryTransaction
-            from django.db.models import Q
+            from django.db.models import F, Q
             
             # Get date range from query params
             days = int(request.query_params.get('days', 30))
@@ -195,14 +253,18 @@ class AnalyticsViewSet(viewsets.ViewSet):
             start_date = end_date - timedelta(days=days)
             
             # Product performance
-            top_products = Product.objects.annotate(
+            top_products = Product.objects.select_related('category').annotate(
                 total_quantity=Sum('inventory__quantity')
             ).order_by('-total_quantity')[:10]
             
-            # Low stock alerts
-            low_stock_items = Inventory.objects.filter(
-                quantity__lte=10
-            ).select_related('product', 'warehouse')
+            # Low stock alerts, one page at a time
+            low_stock_limit = max(min(int(request.query_params.get('low_stock_limit', 50)), 500), 0)
+            low_stock_offset = max(int(request.query_params.get('low_stock_offset', 0)), 0)
+            low_stock = Inventory.objects.filter(quantity__lte=F('reorder_level'))
+            low_stock_total = low_stock.count()
+            low_stock_items = low_stock.select_related(
+                'product__category', 'warehouse'
+            ).order_by('quantity', 'id')[low_stock_offset:low_stock_offset + low_stock_limit]
             
             # Recent transactions
             recent_transactions = InventoryTransaction.objects.filter(
@@ -222,9 +284,15 @@ class AnalyticsViewSet(viewsets.ViewSet):
                         'product': item.product.name,
                         'warehouse': item.warehouse.name,
                         'current_quantity': item.quantity,
+                        'reorder_level': item.reorder_level,
                         'category': item.product.category.name if item.product.category else 'Uncategorized'
                     } for item in low_stock_items
                 ],
+                'low_stock_pagination': {
+                    'total': low_stock_total,
+                    'limit': low_stock_limit,
+                    'offset': low_stock_offset,
+                },
                 'recent_transactions': [
                     {
                         'product': t.product.name,
@@ -287,7 +355,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             analytics = {
                 'revenue_trends': [
                     {
-                        'date': item['payment_date'].isoformat(),
+                        'date': item['invoice_date'].isoformat(),
                         'amount': float(item['daily_total'])
                     } for item in daily_revenue
                 ],
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the data export engine
+Seeds InventoryTransaction rows and measures export throughput and peak memory per format
+"""
+
+import os
+import resource
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from analytics.exports import SOURCES, write_export
+from analytics.models import DataExport
+from inventory.models import Category, InventoryTransaction, Product, Warehouse
+
+BENCH_REFERENCE = 'bench-export'
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows):
+    """Insert rows tagged with BENCH_REFERENCE (generate_series on PostgreSQL, batches elsewhere)"""
+    user, _ = User.objects.get_or_create(username='bench_export')
+    category, _ = Category.objects.get_or_create(name='Bench Export')
+    product, _ = Product.objects.get_or_create(
+        sku='BENCH-EXPORT', defaults={'name': 'Bench Export Widget', 'category': category, 'unit_price': 1}
+    )
+    warehouse = Warehouse.objects.first() or Warehouse.objects.create(
+        name='Bench Export', address='1 Bench St', city='Atlanta', state='GA', country='US',
+        postal_code='30301', capacity=1000,
+    )
+    existing = InventoryTransaction.objects.filter(reference=BENCH_REFERENCE).count()
+    missing = rows - existing
+    started = time.perf_counter()
+    if missing > 0 and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {InventoryTransaction._meta.db_table}
+                    (product_id, warehouse_id, transaction_type, quantity, reference, notes, created_by_id, created_at)
+                SELECT %s, %s, (ARRAY['IN', 'OUT', 'ADJUST', 'TRANSFER'])[1 + n %% 4], n %% 500, %s, '', %s,
+                       now() - (n || ' seconds')::interval
+                FROM generate_series(1, %s) AS n
+                """,
+                [product.id, warehouse.id, BENCH_REFERENCE, user.id, missing],
+            )
+    elif missing > 0:
+        for start in range(0, missing, 10000):
+            InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    product=product, warehouse=warehouse, transaction_type='IN', quantity=n % 500,
+                    reference=BENCH_REFERENCE, created_by=user,
+                )
+                for n in range(start, min(start + 10000, missing))
+            ])
+    if missing > 0:
+        print(f"   Seeded {missing} rows in {time.perf_counter() - started:.1f}s")
+    return user
+
+
+def run(rows=1000000, formats=('CSV', 'JSON', 'EXCEL')):
+    print(f"📦 Export benchmark: {rows} InventoryTransaction rows on {connection.vendor}")
+    user = seed(rows)
+    baseline = peak_rss_mb()
+    print(f"   Peak RSS before exports: {baseline:.0f} MB")
+    for export_format in formats:
+        export = DataExport.objects.create(
+            name=f'bench {export_format}', export_format=export_format, data_source='inventory_transactions',
+            filters={'transaction_type': ['IN', 'OUT', 'ADJUST', 'TRANSFER']}, created_by=user,
+        )
+        started = time.perf_counter()
+        path, size = write_export(export)
+        elapsed = time.perf_counter() - started
+        print(
+            f"   {export_format:<5} {elapsed:7.1f}s | {rows / elapsed:9.0f} rows/s | "
+            f"{size / 1e6:8.1f} MB file | peak RSS {peak_rss_mb():6.0f} MB"
+        )
+        os.remove(path)
+        export.delete()
+    total = InventoryTransaction.objects.count()
+    print(f"   Table holds {total} rows; headers: {', '.join(SOURCES['inventory_transactions'].headers)}")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    chosen = sys.argv[2].upper().split(',') if len(sys.argv) > 2 else ('CSV', 'JSON', 'EXCEL')
+    run(count, chosen)
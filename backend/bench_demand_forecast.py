@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark demand forecasting
+Times fitting alone on synthetic demand with one and several processes, then seeds N SKUs
+stocked in several warehouses with half a year of orders (steady, intermittent and unshipped
+demand) and times the whole pipeline: demand matrices, fitting and metric writes
+"""
+
+import os
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from analytics import smoothing
+from analytics.forecasts import BATCH_SIZE, forecast_demand
+from inventory.models import Category, Inventory, Product, Warehouse
+from orders.models import Customer, Order, OrderItem, Shipment
+
+BENCH_PREFIX = 'BENCH-FCST-'
+
+
+def synthetic(series, days, seed=1):
+    """Poisson demand for three series in four, sparse lumpy demand for the rest"""
+    rng = np.random.default_rng(seed)
+    demand = rng.poisson(rng.uniform(0.5, 20, (series, 1)), (series, days)).astype(float)
+    lumpy = np.arange(series) % 4 == 0
+    demand[lumpy] *= rng.random((lumpy.sum(), days)) < 0.15
+    return demand
+
+
+def time_fits(series, days, workers):
+    demand = synthetic(series, days)
+    batches = ((start, demand[start:start + BATCH_SIZE]) for start in range(0, series, BATCH_SIZE))
+    started = time.perf_counter()
+    fitted = sum(len(result[0]) for _, result in smoothing.fit_batches(batches, workers))
+    return fitted / (time.perf_counter() - started)
+
+
+def seed(products, warehouses, days):
+    user, _ = User.objects.get_or_create(username='bench_forecast')
+    category, _ = Category.objects.get_or_create(name='Bench Forecast')
+    existing = set(Product.objects.filter(sku__startswith=BENCH_PREFIX).values_list('sku', flat=True))
+    Product.objects.bulk_create([
+        Product(sku=f'{BENCH_PREFIX}{n}', name=f'Bench Forecast {n}', category=category, unit_price=1)
+        for n in range(products) if f'{BENCH_PREFIX}{n}' not in existing
+    ], batch_size=5000)
+    product_ids = list(Product.objects.filter(sku__startswith=BENCH_PREFIX).values_list('id', flat=True))
+    warehouse_ids = [
+        Warehouse.objects.get_or_create(
+            name=f'Bench Forecast {n}',
+            defaults={'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                      'postal_code': '30301', 'capacity': 1000000},
+        )[0].id
+        for n in range(warehouses)
+    ]
+    existing = set(Inventory.objects.filter(warehouse_id__in=warehouse_ids).values_list('product_id', 'warehouse_id'))
+    Inventory.objects.bulk_create([
+        Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=100)
+        for product_id in product_ids for warehouse_id in warehouse_ids
+        if (product_id, warehouse_id) not in existing
+    ], batch_size=5000)
+    if Order.objects.filter(order_number__startswith=BENCH_PREFIX).exists():
+        return product_ids, warehouse_ids
+
+    customer, _ = Customer.objects.get_or_create(
+        email='bench-forecast@example.com', defaults={'name': 'Bench Forecast', 'address': '1 Bench St',
+                                                      'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                                                      'postal_code': '30301'},
+    )
+    # One order per warehouse and day, shipped from it, plus one unshipped order per day (slot -1)
+    started = time.perf_counter()
+    now = timezone.now()
+    slots = list(range(warehouses)) + [-1]
+    orders = Order.objects.bulk_create([
+        Order(order_number=f'{BENCH_PREFIX}{slot}-{day}', customer=customer, status='DELIVERED',
+              total_amount=Decimal('0'), shipping_address='1 Bench St', created_by=user)
+        for day in range(1, days + 1) for slot in slots
+    ], batch_size=5000)
+    for order in orders:
+        slot, day = order.order_number[len(BENCH_PREFIX):].rsplit('-', 1)
+        order.slot = int(slot)
+        order.created_at = now - timedelta(days=int(day))
+    Order.objects.bulk_update(orders, ['created_at'], batch_size=5000)
+    Shipment.objects.bulk_create([
+        Shipment(order=order, tracking_number=order.order_number, shipped_from_id=warehouse_ids[order.slot])
+        for order in orders if order.slot >= 0
+    ], batch_size=5000)
+
+    order_ids = [order.id for order in orders if order.slot >= 0]
+    unshipped = [order.id for order in orders if order.slot < 0]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # Three products in four sell six days in seven, the rest about one day in nine
+            cursor.execute(
+                f"""
+                INSERT INTO {OrderItem._meta.db_table} (order_id, product_id, quantity, unit_price, total_price)
+                SELECT o, p, 1 + (p * 31 + o * 7) %% 9, 1, 1 + (p * 31 + o * 7) %% 9
+                FROM unnest(%s::bigint[]) AS o, unnest(%s::bigint[]) AS p
+                WHERE CASE WHEN p %% 4 = 0 THEN (p * 13 + o * 5) %% 9 = 0 ELSE (p + o) %% 7 <> 0 END
+                UNION ALL
+                SELECT o, p, 2, 1, 2 FROM unnest(%s::bigint[]) AS o, unnest(%s::bigint[]) AS p
+                WHERE (p * 7 + o) %% 11 = 0
+                """,
+                [order_ids, product_ids, unshipped, product_ids],
+            )
+    else:
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=o, product_id=p, quantity=1 + (p * 31 + o * 7) % 9, unit_price=1,
+                      total_price=1 + (p * 31 + o * 7) % 9)
+            for o in order_ids for p in product_ids
+            if ((p * 13 + o * 5) % 9 == 0 if p % 4 == 0 else (p + o) % 7 != 0)
+        ] + [
+            OrderItem(order_id=o, product_id=p, quantity=2, unit_price=1, total_price=2)
+            for o in unshipped for p in product_ids if (p * 7 + o) % 11 == 0
+        ], batch_size=5000)
+    print(f"   Seeded {OrderItem.objects.filter(order__order_number__startswith=BENCH_PREFIX).count()} order lines "
+          f"in {time.perf_counter() - started:.1f}s")
+    return product_ids, warehouse_ids
+
+
+def run(products=10000, warehouses=3, workers=None):
+    days = settings.FORECAST_HISTORY_DAYS
+    workers = workers or os.cpu_count() or 1
+    print(f"📈 Demand forecast benchmark on {connection.vendor}: {products} SKUs x {warehouses} warehouses, "
+          f"{days} days of history, {os.cpu_count()} CPU(s)")
+
+    series = products * warehouses
+    for count in sorted({1, workers, 2 * workers}):
+        print(f"   Fitting only, {count} process(es): {time_fits(series, days, count):.0f} SKUs/s")
+
+    seed(products, warehouses, days)
+    rows = Inventory.objects.count()
+    started = time.perf_counter()
+    fitted = forecast_demand(workers=workers)
+    elapsed = time.perf_counter() - started
+    summary = ', '.join(f'{count} {method}' for method, count in fitted.items())
+    print(f"   Pipeline: {sum(fitted.values())} SKU-warehouse rows in {elapsed:.2f}s "
+          f"({sum(fitted.values()) / elapsed:.0f} SKUs/s): {summary}")
+    return sum(fitted.values()) == rows
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sys.exit(0 if run(count) else 1)
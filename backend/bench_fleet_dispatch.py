@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the multi-vehicle dispatch solver
+Solves synthetic 1k-10k order instances and reports solution cost against wall time
+"""
+
+import os
+import random
+import sys
+import time
+
+from logistics.fleet import FleetProblem, search
+
+DEPOTS = [(33.749, -84.388), (33.950, -84.550), (33.600, -84.200)]
+
+
+def build_problem(orders, seed=7):
+    """Orders clustered around Atlanta; ~100 orders per vehicle with 10% spare capacity"""
+    rng = random.Random(seed)
+    centres = [(33.749 + rng.gauss(0, 0.25), -84.388 + rng.gauss(0, 0.25)) for _ in range(12)]
+    points = []
+    for _ in range(orders):
+        lat, lng = rng.choice(centres)
+        points.append((lat + rng.gauss(0, 0.05), lng + rng.gauss(0, 0.05)))
+    demands = [rng.randint(1, 12) for _ in range(orders)]
+    vehicle_count = max(3, orders // 100)
+    capacity = sum(demands) * 1.1 / vehicle_count
+    vehicles = [(index % len(DEPOTS), capacity) for index in range(vehicle_count)]
+    return FleetProblem(DEPOTS, vehicles, points, demands)
+
+
+def run(sizes, time_limits, workers):
+    print(f"🚚 Fleet dispatch benchmark ({workers} worker(s), {os.cpu_count()} CPU(s))")
+    for size in sizes:
+        started = time.perf_counter()
+        problem = build_problem(size)
+        setup = time.perf_counter() - started
+        print(f"\n   {size} orders, {len(problem.vehicles)} vehicles (setup {setup:.2f}s)")
+        for limit in time_limits:
+            started = time.perf_counter()
+            trajectory = []
+            for event in search(problem, limit, workers=workers):
+                if event['event'] == 'progress':
+                    trajectory.append((event['elapsed'], event.get('best_cost', event['cost'])))
+                else:
+                    result = event
+            wall = time.perf_counter() - started
+            first = trajectory[0][1] if trajectory else result['distance']
+            print(
+                f"   limit {limit:>5.1f}s | wall {wall:6.2f}s | first {first:10.1f} mi "
+                f"| final {result['distance']:10.1f} mi | unassigned {len(result['unassigned'])} "
+                f"| rounds {result['rounds']}"
+            )
+            # Best cost at roughly each quarter of the run
+            marks = [limit * share for share in (0.25, 0.5, 0.75)]
+            points = []
+            for mark in marks:
+                reached = [cost for elapsed, cost in trajectory if elapsed <= mark]
+                if reached:
+                    points.append(f"{mark:.1f}s: {min(reached):.1f}")
+            if points:
+                print(f"      trajectory {' | '.join(points)}")
+
+if __name__ == '__main__':
+    sizes = [int(value) for value in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 2000, 5000, 10000]
+    limits = [float(value) for value in sys.argv[2].split(',')] if len(sys.argv) > 2 else [5, 15, 30]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    run(sizes, limits, workers)
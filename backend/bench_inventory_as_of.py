@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark point-in-time inventory queries
+Seeds years of InventoryTransaction history, backfills snapshot checkpoints and times
+as-of queries for a warehouse at random dates against replaying the whole ledger
+"""
+
+import os
+import random
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from inventory.models import Category, Inventory, InventoryTransaction, Product, Warehouse
+from inventory.snapshots import as_of, take_snapshots
+
+BENCH_REFERENCE = 'bench-as-of'
+
+
+def seed(rows, products, years):
+    """Ledger rows tagged with BENCH_REFERENCE spread over the past years, plus matching Inventory rows"""
+    user, _ = User.objects.get_or_create(username='bench_as_of')
+    category, _ = Category.objects.get_or_create(name='Bench As Of')
+    existing = set(Product.objects.filter(sku__startswith='BENCH-ASOF-').values_list('sku', flat=True))
+    Product.objects.bulk_create([
+        Product(sku=f'BENCH-ASOF-{n}', name=f'Bench As Of {n}', category=category, unit_price=1)
+        for n in range(products) if f'BENCH-ASOF-{n}' not in existing
+    ])
+    product_ids = list(Product.objects.filter(sku__startswith='BENCH-ASOF-').values_list('id', flat=True))
+    warehouse, _ = Warehouse.objects.get_or_create(
+        name='Bench As Of', defaults={'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                                      'postal_code': '30301', 'capacity': 1000000},
+    )
+    missing = rows - InventoryTransaction.objects.filter(reference=BENCH_REFERENCE).count()
+    seconds = int(years * 365 * 86400)
+    started = time.perf_counter()
+    if missing > 0 and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {InventoryTransaction._meta.db_table}
+                    (product_id, warehouse_id, transaction_type, quantity, reference, notes, created_by_id, created_at)
+                SELECT (%s::integer[])[1 + n %% %s], %s, 'IN', (n %% 21) - 8, %s, '', %s,
+                       now() - interval '1 hour' - ((n::bigint * 7919) %% %s || ' seconds')::interval
+                FROM generate_series(1, %s) AS n
+                """,
+                [product_ids, len(product_ids), warehouse.id, BENCH_REFERENCE, user.id, seconds, missing],
+            )
+    elif missing > 0:
+        rng = random.Random(1)
+        now = timezone.now()
+        for start in range(0, missing, 10000):
+            batch = InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    product_id=product_ids[n % len(product_ids)], warehouse=warehouse, transaction_type='IN',
+                    quantity=(n % 21) - 8, reference=BENCH_REFERENCE, created_by=user,
+                )
+                for n in range(start, min(start + 10000, missing))
+            ])
+            for entry in batch:
+                InventoryTransaction.objects.filter(pk=entry.pk).update(
+                    created_at=now - timedelta(hours=1, seconds=rng.randint(0, seconds))
+                )
+    totals = dict(
+        InventoryTransaction.objects.filter(warehouse=warehouse).values('product_id').annotate(
+            total=Sum('quantity')
+        ).values_list('product_id', 'total')
+    )
+    existing = set(Inventory.objects.filter(warehouse=warehouse).values_list('product_id', flat=True))
+    Inventory.objects.bulk_create([
+        Inventory(product_id=product_id, warehouse=warehouse, quantity=totals.get(product_id, 0))
+        for product_id in product_ids if product_id not in existing
+    ])
+    if missing > 0:
+        print(f"   Seeded {missing} ledger rows in {time.perf_counter() - started:.1f}s")
+    return warehouse
+
+
+def run(rows=2000000, products=2000, years=3, queries=20):
+    print(f"📦 As-of benchmark on {connection.vendor}: {rows} ledger rows, {products} products, {years} years")
+    warehouse = seed(rows, products, years)
+
+    started = time.perf_counter()
+    written = take_snapshots()
+    print(f"   Backfilled {len(written)} checkpoints in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    now = timezone.now()
+    moments = [now - timedelta(seconds=rng.randint(0, int(years * 365 * 86400))) for _ in range(queries)]
+    timings = []
+    for moment in moments:
+        started = time.perf_counter()
+        checkpoint, replayed, results = as_of(moment, warehouse=warehouse.id)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"   as-of for {len(results)} products: median {timings[len(timings) // 2]:.1f} ms, "
+          f"max {timings[-1]:.1f} ms, last replayed {replayed} rows")
+
+    moment = moments[0]
+    started = time.perf_counter()
+    full = dict(
+        InventoryTransaction.objects.filter(warehouse=warehouse, created_at__lt=moment).values('product_id').annotate(
+            total=Sum('quantity')
+        ).values_list('product_id', 'total')
+    )
+    print(f"   Full ledger replay for one date: {(time.perf_counter() - started) * 1000:.1f} ms")
+    _, _, results = as_of(moment, warehouse=warehouse.id)
+    agrees = all(row['quantity'] == full.get(row['product'], 0) for row in results)
+    print(f"   {'✅' if agrees else '❌'} Checkpointed answer {'matches' if agrees else 'differs from'} the replay")
+    return agrees
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    sys.exit(0 if run(count) else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark the replenishment engine
+Seeds N SKUs stocked in several warehouses with 90 days of OUT history and a supplier
+each, then times a full run (every SKU) and an incremental run after a few SKUs move
+"""
+
+import os
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from finance.models import PurchaseOrder, PurchaseOrderItem
+from inventory.models import Category, Inventory, InventoryTransaction, Product, Warehouse
+from inventory.replenishment import run_replenishment
+from inventory.stock import move_stock
+from partners.models import Supplier
+
+BENCH_REFERENCE = 'bench-replenishment'
+
+
+def seed(products, warehouses, days):
+    user, _ = User.objects.get_or_create(username='bench_replenishment')
+    category, _ = Category.objects.get_or_create(name='Bench Replenishment')
+    existing = set(Product.objects.filter(sku__startswith='BENCH-REPL-').values_list('sku', flat=True))
+    Product.objects.bulk_create([
+        Product(sku=f'BENCH-REPL-{n}', name=f'Bench Replenishment {n}', category=category, unit_price=1)
+        for n in range(products) if f'BENCH-REPL-{n}' not in existing
+    ], batch_size=5000)
+    product_ids = list(Product.objects.filter(sku__startswith='BENCH-REPL-').values_list('id', flat=True))
+    warehouse_ids = [
+        Warehouse.objects.get_or_create(
+            name=f'Bench Replenishment {n}',
+            defaults={'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                      'postal_code': '30301', 'capacity': 1000000},
+        )[0].id
+        for n in range(warehouses)
+    ]
+    existing = set(Inventory.objects.filter(warehouse_id__in=warehouse_ids).values_list('product_id', 'warehouse_id'))
+    Inventory.objects.bulk_create([
+        Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=(product_id * 7) % 400)
+        for product_id in product_ids for warehouse_id in warehouse_ids
+        if (product_id, warehouse_id) not in existing
+    ], batch_size=5000)
+
+    supplier, _ = Supplier.objects.get_or_create(
+        name='Bench Replenishment', defaults={'email': 'bench@example.com', 'phone': '+14045550100',
+                                              'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA',
+                                              'postal_code': '30301', 'status': 'ACTIVE', 'lead_time_days': 10,
+                                              'minimum_order': Decimal('500'), 'created_by': user},
+    )
+    if not PurchaseOrder.objects.filter(po_number='BENCH-REPL').exists():
+        today = timezone.localdate()
+        order = PurchaseOrder.objects.create(
+            po_number='BENCH-REPL', supplier=supplier, order_date=today - timedelta(days=days),
+            expected_delivery=today, status='COMPLETED', subtotal=Decimal('0'), tax_amount=Decimal('0'),
+            shipping_amount=Decimal('0'), created_by=user,
+        )
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(purchase_order=order, product_id=product_id, quantity=1, unit_cost=Decimal('2.50'),
+                              total_cost=Decimal('2.50'))
+            for product_id in product_ids
+        ], batch_size=5000)
+
+    if not InventoryTransaction.objects.filter(reference=BENCH_REFERENCE).exists():
+        started = time.perf_counter()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Roughly every other day per row, 1-12 units
+                cursor.execute(
+                    f"""
+                    INSERT INTO {InventoryTransaction._meta.db_table}
+                        (product_id, warehouse_id, transaction_type, quantity, reference, notes, created_by_id,
+                         created_at)
+                    SELECT p, w, 'OUT', -(1 + (p * 31 + w * 17 + d * 7) %% 12), %s, '', %s,
+                           now() - (d || ' days')::interval
+                    FROM unnest(%s::integer[]) AS p, unnest(%s::integer[]) AS w, generate_series(1, %s) AS d
+                    WHERE (p + w + d) %% 2 = 0
+                    """,
+                    [BENCH_REFERENCE, user.id, product_ids, warehouse_ids, days],
+                )
+        else:
+            now = timezone.now()
+            entries = [
+                InventoryTransaction(
+                    product_id=p, warehouse_id=w, transaction_type='OUT', quantity=-(1 + (p * 31 + w * 17 + d * 7) % 12),
+                    reference=BENCH_REFERENCE, created_by=user,
+                )
+                for p in product_ids for w in warehouse_ids for d in range(days) if (p + w + d) % 2 == 0
+            ]
+            InventoryTransaction.objects.bulk_create(entries, batch_size=5000)
+            InventoryTransaction.objects.filter(reference=BENCH_REFERENCE).update(created_at=now - timedelta(days=1))
+        print(f"   Seeded {InventoryTransaction.objects.filter(reference=BENCH_REFERENCE).count()} ledger rows "
+              f"in {time.perf_counter() - started:.1f}s")
+    return user, product_ids, warehouse_ids
+
+
+def run(products=10000, warehouses=3, days=90, moved=50):
+    print(f"📦 Replenishment benchmark on {connection.vendor}: {products} SKUs x {warehouses} warehouses, "
+          f"{days} days of history")
+    user, product_ids, warehouse_ids = seed(products, warehouses, days)
+
+    started = time.perf_counter()
+    full = run_replenishment(full=True, user=user)
+    elapsed = time.perf_counter() - started
+    print(f"   Full run: {full.rows} rows in {elapsed:.2f}s ({full.rows / elapsed:.0f} rows/s), "
+          f"{full.purchase_orders} suggested purchase order(s)")
+
+    for product_id in product_ids[:moved]:
+        move_stock(product_id, warehouse_ids[0], 'IN', 5, user, reference=BENCH_REFERENCE)
+    started = time.perf_counter()
+    incremental = run_replenishment(user=user)
+    elapsed = time.perf_counter() - started
+    print(f"   Incremental run after {moved} SKUs moved: {incremental.rows} rows in {elapsed:.2f}s")
+    return full.rows >= products * warehouses
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sys.exit(0 if run(count) else 1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the request timing middleware
+Times a trivial view with and without RequestTimingMiddleware, and a cheap query with and without the execute wrapper
+"""
+
+import os
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from optimization.instrumentation import time_query
+from optimization.middleware import RequestTimingMiddleware, request_stats
+
+PATHS = ['/api/orders/12/', '/api/products/', '/api/routes/3/reoptimize/', '/api/vehicles/7/']
+
+
+def view(request):
+    return HttpResponse('ok')
+
+
+def build_requests(count):
+    factory = RequestFactory()
+    requests = []
+    for n in range(count):
+        request = factory.get(PATHS[n % len(PATHS)])
+        request.resolver_match = resolve(request.path_info)
+        requests.append(request)
+    return requests
+
+
+def best_of(repeats, func):
+    return min(func() for _ in range(repeats))
+
+
+def time_calls(handler, requests):
+    started = time.perf_counter()
+    for request in requests:
+        handler(request)
+    return (time.perf_counter() - started) / len(requests)
+
+
+def time_queries(count):
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        for _ in range(count):
+            cursor.execute('SELECT 1')
+        return (time.perf_counter() - started) / count
+
+
+def run(count=20000, repeats=5):
+    print(f"⏱️  Request timing overhead: {count} requests x best of {repeats}")
+    requests = build_requests(count)
+    middleware = RequestTimingMiddleware(view)
+    # Keep the benchmark from flushing rows into the database
+    request_stats.flushing = True
+
+    bare = best_of(repeats, lambda: time_calls(view, requests))
+    timed = best_of(repeats, lambda: time_calls(middleware, requests))
+    overhead = (timed - bare) * 1e6
+    print(f"   Bare view:        {bare * 1e6:7.2f} µs/request")
+    print(f"   With middleware:  {timed * 1e6:7.2f} µs/request")
+    print(f"   Overhead:         {overhead:7.2f} µs/request {'✅' if overhead < 50 else '❌'} (budget 50 µs)")
+    endpoints, _ = request_stats.take()
+    print(f"   Aggregated into {len(endpoints)} endpoints: {', '.join(sorted(endpoints))}")
+
+    connection.ensure_connection()
+    wrappers, connection.execute_wrappers = connection.execute_wrappers, []
+    plain = best_of(repeats, lambda: time_queries(count))
+    connection.execute_wrappers = [time_query]
+    wrapped = best_of(repeats, lambda: time_queries(count))
+    connection.execute_wrappers = wrappers
+    print(f"   SELECT 1:         {plain * 1e6:7.2f} µs/query, {wrapped * 1e6:7.2f} µs/query with the timer "
+          f"(+{(wrapped - plain) * 1e6:.2f} µs)")
+    request_stats.flushing = False
+    return overhead
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sys.exit(0 if run(count) < 50 else 1)
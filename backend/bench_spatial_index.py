@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory driver spatial index
+Builds an index of synthetic drivers and times k-nearest queries against brute force
+"""
+
+import os
+import random
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from tracking.spatial import DriverSpatialIndex, haversine_miles
+
+
+def build_index(drivers, seed=42):
+    """Scatter drivers around a handful of metro areas"""
+    rng = random.Random(seed)
+    metros = [(40.71, -74.00), (34.05, -118.24), (41.88, -87.63), (29.76, -95.37), (33.45, -112.07)]
+    index = DriverSpatialIndex()
+    for driver_id in range(drivers):
+        lat, lng = rng.choice(metros)
+        index.move(driver_id, lat + rng.gauss(0, 0.4), lng + rng.gauss(0, 0.4))
+    return index, rng
+
+
+def brute_force(index, lat, lng, k):
+    distances = sorted(
+        (haversine_miles(lat, lng, e.latitude, e.longitude), e.driver_id) for e in index.entries.values()
+    )
+    return [driver_id for _, driver_id in distances[:k]]
+
+
+def run(drivers=10000, queries=2000, k=10):
+    print(f"📍 Building index with {drivers} drivers...")
+    started = time.perf_counter()
+    index, rng = build_index(drivers)
+    print(f"   built in {(time.perf_counter() - started) * 1000:.1f} ms, {len(index.cells)} occupied cells")
+
+    points = [(rng.uniform(29, 42), rng.uniform(-119, -73)) for _ in range(queries)]
+    metro_points = [(40.71 + rng.gauss(0, 0.3), -74.0 + rng.gauss(0, 0.3)) for _ in range(queries)]
+
+    for label, sample in [('metro', metro_points), ('anywhere', points)]:
+        timings = []
+        for lat, lng in sample:
+            started = time.perf_counter()
+            index.nearest(lat, lng, k=k)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1e6
+        p99 = timings[int(len(timings) * 0.99)] * 1e6
+        print(f"   k={k} {label:>8}: p50 {p50:.0f} µs, p99 {p99:.0f} µs")
+
+    mismatches = 0
+    for lat, lng in metro_points[:50] + points[:50]:
+        found = [entry.driver_id for _, entry in index.nearest(lat, lng, k=k)]
+        if found != brute_force(index, lat, lng, k):
+            mismatches += 1
+    print(f"   correctness vs brute force: {100 - mismatches}/100 queries identical")
+
+    started = time.perf_counter()
+    for driver_id in range(drivers):
+        entry = index.entries[driver_id]
+        index.move(driver_id, entry.latitude + 0.001, entry.longitude + 0.001)
+    print(f"   {drivers} incremental moves in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    drivers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(drivers=drivers)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch stock movements
+Posts a truck receipt of N lines (by SKU, spread over several warehouses) to
+/api/inventory/move-batch/ and reports end-to-end request time, then the same for a
+batch of picks taking the stock out again
+"""
+
+import os
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APIClient
+
+from inventory.models import Category, Product, Warehouse
+
+BENCH_REFERENCE = 'bench-batch'
+
+
+def seed(products, warehouses):
+    user, _ = User.objects.get_or_create(username='bench_batch')
+    category, _ = Category.objects.get_or_create(name='Bench Batch')
+    existing = set(Product.objects.filter(sku__startswith='BENCH-BATCH-').values_list('sku', flat=True))
+    Product.objects.bulk_create([
+        Product(sku=f'BENCH-BATCH-{n}', name=f'Bench Batch {n}', category=category, unit_price=1)
+        for n in range(products) if f'BENCH-BATCH-{n}' not in existing
+    ])
+    warehouse_ids = [
+        Warehouse.objects.get_or_create(
+            name=f'Bench Batch {n}',
+            defaults={'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                      'postal_code': '30301', 'capacity': 100000},
+        )[0].id
+        for n in range(warehouses)
+    ]
+    return user, warehouse_ids
+
+
+def post(client, lines, mode):
+    started = time.perf_counter()
+    response = client.post(
+        '/api/inventory/move-batch/', {'lines': lines, 'mode': mode, 'reference': BENCH_REFERENCE}, format='json'
+    )
+    elapsed = time.perf_counter() - started
+    body = response.json()
+    print(f"   {len(lines)} lines ({mode}): HTTP {response.status_code} {body.get('counts')} in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+
+def run(lines=5000, products=1000, warehouses=4):
+    print(f"📦 Batch stock movement benchmark on {connection.vendor}: {lines} lines, "
+          f"{products} SKUs x {warehouses} warehouses")
+    user, warehouse_ids = seed(products, warehouses)
+    # Keep the per-IP limiter out of the measurement
+    settings.RATE_LIMIT_ENABLED = False
+    client = APIClient()
+    client.force_authenticate(user)
+
+    receipt = [
+        {'sku': f'BENCH-BATCH-{n % products}', 'warehouse': warehouse_ids[n % warehouses],
+         'transaction_type': 'IN', 'quantity': 1 + n % 12}
+        for n in range(lines)
+    ]
+    picks = [dict(line, transaction_type='OUT') for line in receipt]
+    timings = [post(client, receipt, 'all_or_nothing'), post(client, picks, 'best_effort')]
+    return max(timings) < 1
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    sys.exit(0 if run(count) else 1)
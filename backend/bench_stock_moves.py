@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for stock movements
+Runs random IN/OUT/ADJUST/TRANSFER movements from many processes over a small set of
+hot inventory rows, then checks that no update was lost: every row's quantity must
+equal its starting quantity plus its ledger entries, and none may be negative
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+import django
+
+# Set Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supplychain.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max, Sum
+
+from inventory.models import Category, Inventory, InventoryTransaction, Product, Warehouse
+from inventory.stock import StockMovementError, move_stock
+
+BENCH_REFERENCE = 'bench-stock'
+STARTING_QUANTITY = 500
+
+
+def seed(products, warehouses):
+    user, _ = User.objects.get_or_create(username='bench_stock')
+    category, _ = Category.objects.get_or_create(name='Bench Stock')
+    product_ids = [
+        Product.objects.get_or_create(
+            sku=f'BENCH-STOCK-{n}', defaults={'name': f'Bench Stock {n}', 'category': category, 'unit_price': 1}
+        )[0].id
+        for n in range(products)
+    ]
+    warehouse_ids = [
+        Warehouse.objects.get_or_create(
+            name=f'Bench Stock {n}',
+            defaults={'address': '1 Bench St', 'city': 'Atlanta', 'state': 'GA', 'country': 'US',
+                      'postal_code': '30301', 'capacity': 100000},
+        )[0].id
+        for n in range(warehouses)
+    ]
+    for product_id in product_ids:
+        for warehouse_id in warehouse_ids:
+            current = Inventory.objects.filter(product_id=product_id, warehouse_id=warehouse_id).values_list(
+                'quantity', flat=True
+            ).first() or 0
+            if current != STARTING_QUANTITY:
+                move_stock(product_id, warehouse_id, 'ADJUST', STARTING_QUANTITY - current, user,
+                           reference=BENCH_REFERENCE)
+    return user, product_ids, warehouse_ids
+
+
+def worker(user, product_ids, warehouse_ids, movements, seed_value):
+    rng = random.Random(seed_value)
+    done = rejected = failed = 0
+    try:
+        for _ in range(movements):
+            product_id = rng.choice(product_ids)
+            warehouse_id, to_warehouse_id = rng.sample(warehouse_ids, 2)
+            transaction_type = rng.choice(['IN', 'OUT', 'OUT', 'ADJUST', 'TRANSFER', 'TRANSFER'])
+            quantity = rng.randint(1, 20) * (rng.choice([-1, 1]) if transaction_type == 'ADJUST' else 1)
+            try:
+                move_stock(product_id, warehouse_id, transaction_type, quantity, user,
+                           to_warehouse_id=to_warehouse_id, reference=BENCH_REFERENCE)
+                done += 1
+            except StockMovementError:
+                rejected += 1
+            except Exception as e:
+                # Deadlocks or serialization failures would land here
+                failed += 1
+                print(f"   ❌ {type(e).__name__}: {e}")
+    finally:
+        connection.close()
+    return done, rejected, failed
+
+
+def run(processes=16, movements=500, products=4, warehouses=3):
+    print(f"📦 Stock movement stress test on {connection.vendor}: {processes} processes x {movements} movements, "
+          f"{products} products x {warehouses} warehouses")
+    if connection.vendor == 'sqlite':
+        print("   ⚠️  SQLite serialises writers; run against PostgreSQL for meaningful concurrency numbers")
+    user, product_ids, warehouse_ids = seed(products, warehouses)
+    keys = [(p, w) for p in product_ids for w in warehouse_ids]
+    first_id = (InventoryTransaction.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    # Forked workers must not share this process's connection
+    connection.close()
+
+    started = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        results = pool.starmap(
+            worker, [(user, product_ids, warehouse_ids, movements, n) for n in range(processes)]
+        )
+    elapsed = time.perf_counter() - started
+
+    done, rejected, failed = (sum(column) for column in zip(*results))
+    print(f"   {done} applied, {rejected} rejected (insufficient stock), {failed} failed in {elapsed:.2f}s")
+    print(f"   {(done + rejected) / elapsed:.0f} movements/s")
+
+    ledger = {
+        (row['product_id'], row['warehouse_id']): row['total']
+        for row in InventoryTransaction.objects.filter(id__gte=first_id, reference=BENCH_REFERENCE).values(
+            'product_id', 'warehouse_id'
+        ).annotate(total=Sum('quantity'))
+    }
+    quantities = {
+        (row.product_id, row.warehouse_id): row.quantity
+        for row in Inventory.objects.filter(product_id__in=product_ids, warehouse_id__in=warehouse_ids)
+    }
+    lost = [key for key in keys if quantities[key] != STARTING_QUANTITY + ledger.get(key, 0)]
+    negative = [key for key in keys if quantities[key] < 0]
+    if lost or negative or failed:
+        print(f"   ❌ {len(lost)} rows disagree with the ledger, {len(negative)} negative, {failed} failures")
+        return False
+    print(f"   ✅ All {len(keys)} rows match the ledger; none negative")
+    return True
+
+
+if __name__ == '__main__':
+    process_count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_process = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    sys.exit(0 if run(process_count, per_process) else 1)
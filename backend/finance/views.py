@@ -10,7 +10,7 @@ from .serializers import (
 
 
 class InvoiceViewSet(viewsets.ModelViewSet):
-    queryset = Invoice.objects.select_related('customer', 'order', 'created_by').prefetch_related('items')
+    queryset = Invoice.objects.select_related('customer', 'order', 'created_by').prefetch_related('items__product')
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -30,7 +30,7 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
-    queryset = Payment.objects.select_related('invoice', 'created_by')
+    queryset = Payment.objects.select_related('invoice__customer', 'created_by')
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -40,7 +40,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
 
 class PurchaseOrderViewSet(viewsets.ModelViewSet):
-    queryset = PurchaseOrder.objects.select_related('supplier', 'created_by').prefetch_related('items')
+    queryset = PurchaseOrder.objects.select_related('supplier', 'created_by').prefetch_related('items__product')
     serializer_class = PurchaseOrderSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
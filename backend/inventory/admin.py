@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Product, Warehouse, Inventory, InventoryTransaction
+from .models import (
+    Category, Product, Warehouse, Inventory, InventoryTransaction, InventoryCheckpoint, InventorySnapshot,
+    ReorderPoint, ReplenishmentRun
+)
 
 
 @admin.register(Category)
@@ -30,7 +33,21 @@ class InventoryAdmin(admin.ModelAdmin):
     list_display = ['product', 'warehouse', 'quantity', 'reorder_level', 'last_updated']
     list_filter = ['warehouse', 'last_updated']
     search_fields = ['product__name', 'warehouse__name']
-    list_editable = ['quantity', 'reorder_level']
+    list_editable = ['reorder_level']
+    readonly_fields = ['quantity']
+
+    # Stock only changes through inventory.stock, so a row keeps its product and warehouse and is never deleted
+    def get_readonly_fields(self, request, obj=None):
+        return ['quantity', 'product', 'warehouse'] if obj else ['quantity']
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=['reorder_level', 'last_updated'])
+        else:
+            obj.save()
 
 
 @admin.register(InventoryTransaction)
@@ -39,3 +56,51 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
     list_filter = ['transaction_type', 'warehouse', 'created_at']
     search_fields = ['product__name', 'warehouse__name', 'reference']
     readonly_fields = ['created_at']
+
+    # Ledger rows are append-only and written with their stock change
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InventoryCheckpoint)
+class InventoryCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['taken_at', 'transactions', 'snapshots', 'created_at']
+    readonly_fields = ['taken_at', 'transactions', 'snapshots', 'created_at']
+
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ['product', 'warehouse', 'taken_at', 'quantity']
+    list_filter = ['warehouse', 'taken_at']
+    search_fields = ['product__sku', 'product__name']
+    raw_id_fields = ['product']
+    readonly_fields = ['product', 'warehouse', 'taken_at', 'quantity']
+
+
+@admin.register(ReorderPoint)
+class ReorderPointAdmin(admin.ModelAdmin):
+    list_display = ['inventory', 'supplier', 'demand_source', 'daily_demand', 'lead_time_days',
+                    'reorder_point', 'order_up_to', 'computed_at']
+    list_filter = ['demand_source', 'supplier']
+    search_fields = ['inventory__product__sku', 'inventory__product__name']
+    raw_id_fields = ['inventory']
+
+    # Written by the replenishment engine; set Inventory.reorder_level for rows without demand
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ReplenishmentRun)
+class ReplenishmentRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'full', 'rows', 'purchase_orders']
+    list_filter = ['full']
+    readonly_fields = ['started_at', 'finished_at', 'full', 'rows', 'purchase_orders']
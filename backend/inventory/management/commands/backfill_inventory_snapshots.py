@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from inventory.models import InventoryCheckpoint, InventorySnapshot
+from inventory.snapshots import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Write inventory snapshot checkpoints over the existing ledger, one period per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Stop at this ISO datetime instead of now')
+        parser.add_argument('--limit', type=int, help='Write at most this many checkpoints')
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Delete existing checkpoints and snapshots first',
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            until = parse_datetime(options['until'])
+            if until is None:
+                raise CommandError('--until must be an ISO datetime')
+        if options['rebuild']:
+            InventorySnapshot.objects.all().delete()
+            InventoryCheckpoint.objects.all().delete()
+
+        def report(checkpoint):
+            if options['verbosity'] > 1 or checkpoint.snapshots:
+                self.stdout.write(
+                    f'{checkpoint.taken_at:%Y-%m-%d %H:%M}: {checkpoint.transactions} movements, '
+                    f'{checkpoint.snapshots} snapshots'
+                )
+
+        written = take_snapshots(until=until, limit=options['limit'], report=report)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(written)} checkpoint(s)'))
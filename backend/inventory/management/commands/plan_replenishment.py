@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from inventory.replenishment import run_replenishment
+
+
+class Command(BaseCommand):
+    help = 'Recompute reorder points from demand history and rewrite suggested purchase orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every product, not only those that moved since the last run',
+        )
+
+    def handle(self, *args, **options):
+        run = run_replenishment(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {run.rows} inventory row(s); {run.purchase_orders} suggested purchase order(s)'
+        ))
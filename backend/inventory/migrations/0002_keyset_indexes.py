@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_i_created_af6880_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_warehouse_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(help_text='Covers ledger rows created before this instant', unique=True)),
+                ('transactions', models.IntegerField(default=0, help_text='Ledger rows folded in since the previous checkpoint')),
+                ('snapshots', models.IntegerField(default=0, help_text='Snapshot rows written at this checkpoint')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+                'unique_together': {('product', 'warehouse', 'taken_at')},
+            },
+        ),
+    ]
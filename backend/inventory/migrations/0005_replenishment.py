@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0001_initial'),
+        ('inventory', '0004_inventory_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplenishmentRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False, help_text='Recomputed every row, not only rows that moved')),
+                ('rows', models.IntegerField(default=0, help_text='Inventory rows recomputed')),
+                ('purchase_orders', models.IntegerField(default=0, help_text='Suggested purchase orders written')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReorderPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('demand_source', models.CharField(choices=[('NONE', 'No demand'), ('LEDGER', 'Stock movements'), ('ORDERS', 'Customer orders')], default='NONE', max_length=10)),
+                ('daily_demand', models.FloatField(default=0)),
+                ('demand_deviation', models.FloatField(default=0, help_text='Standard deviation of daily demand')),
+                ('lead_time_days', models.IntegerField(default=0)),
+                ('reorder_point', models.IntegerField(default=0)),
+                ('order_up_to', models.IntegerField(default=0, help_text='Stock level a suggested purchase order restores')),
+                ('computed_at', models.DateTimeField()),
+                ('inventory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_point', to='inventory.inventory')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='partners.supplier')),
+            ],
+            options={
+                'ordering': ['inventory'],
+            },
+        ),
+    ]
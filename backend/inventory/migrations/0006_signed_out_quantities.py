@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:40
+
+from django.db import migrations
+from django.db.models import F
+
+
+def negate_out_quantities(apps, schema_editor):
+    """
+    Ledger quantities are signed changes; rows written by the old writable
+    ledger API stored OUT movements as positive quantities
+    """
+    InventoryTransaction = apps.get_model('inventory', 'InventoryTransaction')
+    InventoryCheckpoint = apps.get_model('inventory', 'InventoryCheckpoint')
+    InventorySnapshot = apps.get_model('inventory', 'InventorySnapshot')
+    if InventoryTransaction.objects.filter(transaction_type='OUT', quantity__gt=0).update(quantity=-F('quantity')):
+        # Opening balances were derived from the unsigned ledger; take_snapshots rebuilds them
+        InventorySnapshot.objects.all().delete()
+        InventoryCheckpoint.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_replenishment'),
+    ]
+
+    operations = [
+        migrations.RunPython(negate_out_quantities, migrations.RunPython.noop),
+    ]
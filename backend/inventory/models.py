@@ -46,6 +46,8 @@ class Warehouse(models.Model):
     country = models.CharField(max_length=100)
     postal_code = models.CharField(max_length=20)
     capacity = models.IntegerField(help_text="Total capacity in units")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -92,6 +94,83 @@ class InventoryTransaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} {self.quantity} {self.product.name} at {self.warehouse.name}"
+
+
+class InventoryCheckpoint(models.Model):
+    """A point up to which every ledger movement is folded into InventorySnapshot rows"""
+    taken_at = models.DateTimeField(unique=True, help_text="Covers ledger rows created before this instant")
+    transactions = models.IntegerField(default=0, help_text="Ledger rows folded in since the previous checkpoint")
+    snapshots = models.IntegerField(default=0, help_text="Snapshot rows written at this checkpoint")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-taken_at']
+
+    def __str__(self):
+        return f"Checkpoint {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+class InventorySnapshot(models.Model):
+    """
+    Quantity of a product at a warehouse as of a checkpoint. Written only for
+    rows that moved since the previous checkpoint, so the latest snapshot at
+    or before a checkpoint holds the quantity at that checkpoint.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        unique_together = ['product', 'warehouse', 'taken_at']
+        ordering = ['-taken_at']
+
+    def __str__(self):
+        return f"{self.product_id}@{self.warehouse_id} {self.taken_at:%Y-%m-%d}: {self.quantity}"
+
+
+class ReorderPoint(models.Model):
+    """Demand and reorder point computed for an inventory row by the replenishment engine"""
+    DEMAND_SOURCES = [
+        ('NONE', 'No demand'),
+        ('LEDGER', 'Stock movements'),
+        ('ORDERS', 'Customer orders'),
+    ]
+
+    inventory = models.OneToOneField(Inventory, on_delete=models.CASCADE, related_name='reorder_point')
+    supplier = models.ForeignKey('partners.Supplier', on_delete=models.SET_NULL, null=True, blank=True)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    demand_source = models.CharField(max_length=10, choices=DEMAND_SOURCES, default='NONE')
+    daily_demand = models.FloatField(default=0)
+    demand_deviation = models.FloatField(default=0, help_text="Standard deviation of daily demand")
+    lead_time_days = models.IntegerField(default=0)
+    reorder_point = models.IntegerField(default=0)
+    order_up_to = models.IntegerField(default=0, help_text="Stock level a suggested purchase order restores")
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['inventory']
+
+    def __str__(self):
+        return f"{self.inventory_id}: reorder at {self.reorder_point}, up to {self.order_up_to}"
+
+
+class ReplenishmentRun(models.Model):
+    """One pass of the replenishment engine"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False, help_text="Recomputed every row, not only rows that moved")
+    rows = models.IntegerField(default=0, help_text="Inventory rows recomputed")
+    purchase_orders = models.IntegerField(default=0, help_text="Suggested purchase orders written")
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Replenishment {self.started_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,430 @@
+"""
+Replenishment: reorder points and suggested purchase orders.
+
+Demand is the daily outflow of each inventory row over the last
+REPLENISHMENT_DEMAND_DAYS, taken from whichever source records more of it:
+OUT movements in the ledger, or customer order lines (placed against the
+warehouse their order ships from, or split evenly over the product's
+warehouses until it ships). Taking the larger source rather than the sum
+avoids counting stock twice when it is both ordered and picked.
+
+With daily mean d, standard deviation s and supplier lead time L days:
+
+    reorder point = ceil(d * L + z * s * sqrt(L))
+    order up to   = reorder point + ceil(d * REPLENISHMENT_REVIEW_DAYS)
+
+The reorder point is written to Inventory.reorder_level; rows without demand
+keep their configured level. A product's supplier and unit cost come from
+its latest purchase order, so products never bought get reorder points but
+no suggestions.
+
+A run recomputes only products that moved (ledger rows, orders or
+shipments) since the previous run, BATCH_SIZE products at a time with one
+demand matrix per batch, then rewrites the suggested purchase orders: one
+DRAFT per supplier, numbered with SUGGESTED_PREFIX, covering every row at or
+below its reorder level less what is already on order.
+"""
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Inventory, InventoryTransaction, Product, ReorderPoint, ReplenishmentRun
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Movements committed this long after their created_at are still picked up by the next run
+CHANGE_LAG = timedelta(minutes=5)
+# Lead time for products without a supplier (the Supplier.lead_time_days default)
+DEFAULT_LEAD_TIME_DAYS = 7
+SUGGESTED_PREFIX = 'AUTO-'
+# (product, warehouse) pairs are matched as product * WAREHOUSE_SPAN + warehouse
+WAREHOUSE_SPAN = 2 ** 31
+POINT_FIELDS = [
+    'inventory_id', 'supplier_id', 'unit_cost', 'demand_source', 'daily_demand', 'demand_deviation',
+    'lead_time_days', 'reorder_point', 'order_up_to', 'computed_at',
+]
+OPEN_PO_STATUSES = ['DRAFT', 'SENT', 'CONFIRMED', 'PARTIAL']
+
+
+def replenishment_user():
+    """The user suggested purchase orders are created by when no one asked for them"""
+    user, _ = User.objects.get_or_create(
+        username=settings.REPLENISHMENT_USERNAME, defaults={'is_active': False}
+    )
+    return user
+
+
+def changed_products(since):
+    """Ids of products with ledger rows, orders or shipments since since, or without reorder points yet"""
+    from orders.models import OrderItem
+
+    products = set(
+        InventoryTransaction.objects.filter(created_at__gte=since).order_by().values_list('product_id', flat=True)
+        .distinct()
+    )
+    products.update(
+        OrderItem.objects.filter(
+            Q(order__updated_at__gte=since) | Q(order__shipment__created_at__gte=since)
+        ).order_by().values_list('product_id', flat=True).distinct()
+    )
+    products.update(
+        Inventory.objects.filter(reorder_point__isnull=True).order_by().values_list('product_id', flat=True)
+        .distinct()
+    )
+    return products
+
+
+def _suppliers(product_ids):
+    """{product_id: (supplier_id, lead_time_days, unit_cost)} from each product's latest purchase order"""
+    from finance.models import PurchaseOrderItem
+
+    purchases = PurchaseOrderItem.objects.exclude(purchase_order__status='CANCELLED').exclude(
+        purchase_order__supplier__status='INACTIVE'
+    ).exclude(purchase_order__status='DRAFT', purchase_order__po_number__startswith=SUGGESTED_PREFIX)
+    latest = Product.objects.filter(id__in=product_ids).annotate(
+        purchase=Subquery(
+            purchases.filter(product_id=OuterRef('pk')).order_by(
+                '-purchase_order__order_date', '-purchase_order_id', '-id'
+            ).values('id')[:1]
+        )
+    ).exclude(purchase=None).values_list('purchase', flat=True)
+    return {
+        product_id: (supplier_id, lead_time_days, unit_cost)
+        for product_id, supplier_id, lead_time_days, unit_cost in PurchaseOrderItem.objects.filter(
+            id__in=list(latest)
+        ).values_list(
+            'product_id', 'purchase_order__supplier_id', 'purchase_order__supplier__lead_time_days', 'unit_cost'
+        )
+    }
+
+
+def _columns(queryset, names):
+    """
+    The named columns of a values() queryset as arrays, read straight from the
+    cursor: skipping per-value converters matters at hundreds of thousands of rows
+    """
+    query = queryset.query
+    selected = [*query.extra_select, *query.values_select, *query.annotation_select]
+    sql, params = query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = dict(zip(selected, zip(*cursor.fetchall())))
+    return [np.array(columns.get(name, ())) for name in names]
+
+
+def _day_columns(days, start):
+    """Column of each day counted from start"""
+    if days.dtype.kind in 'US':
+        # SQLite returns ISO strings
+        return (days.astype('datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+    # Much faster than converting date objects with numpy
+    return np.array([day.toordinal() for day in days.tolist()], dtype=int) - start.toordinal()
+
+
+def _positions(keys, product_column, warehouse_column):
+    """Position in the sorted row keys of each (product, warehouse) pair, or -1"""
+    wanted = product_column.astype(np.int64) * WAREHOUSE_SPAN + warehouse_column.astype(np.int64)
+    found = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    return np.where(keys[found] == wanted, found, -1)
+
+
+def _matrix(count, days, position, column, amount):
+    keep = (position >= 0) & (column >= 0) & (column < days)
+    return np.bincount(
+        position[keep] * days + column[keep], weights=amount[keep], minlength=count * days
+    ).reshape(count, days)
+
+
+def _row_keys(products, warehouses):
+    return products.astype(np.int64) * WAREHOUSE_SPAN + warehouses
+
+
+def order_demand(products, warehouses, start, days):
+    """
+    Daily units ordered over days days from the date start, as a (rows, days)
+    array for the inventory rows given as parallel arrays sorted by (product,
+    warehouse). Lines count on their order's date at the warehouse it ships
+    from; unshipped orders (or ones shipped from a warehouse without the
+    product) are split evenly over the product's warehouses.
+    """
+    from orders.models import OrderItem, Shipment
+
+    count = len(products)
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    shipped_from = Shipment.objects.filter(order_id=OuterRef('order_id')).order_by('id').values('shipped_from_id')[:1]
+    product_column, warehouse_column, day_column, total_column = _columns(OrderItem.objects.filter(
+        product_id__in=np.unique(products).tolist(), order__created_at__gte=since
+    ).exclude(order__status='CANCELLED').annotate(
+        day=TruncDate('order__created_at'), warehouse=Subquery(shipped_from)
+    ).order_by().values('product_id', 'warehouse', 'day').annotate(total=Sum('quantity')), [
+        'product_id', 'warehouse', 'day', 'total'
+    ])
+    warehouse_column = np.array([-1 if w is None else w for w in warehouse_column], dtype=np.int64)
+    day_column = _day_columns(day_column, start)
+    total_column = total_column.astype(float)
+    position = _positions(_row_keys(products, warehouses), product_column, warehouse_column)
+    ordered = _matrix(count, days, position, day_column, total_column)
+    split = position < 0
+    first = np.searchsorted(products, product_column[split], side='left')
+    shares = np.searchsorted(products, product_column[split], side='right') - first
+    offsets = np.arange(shares.sum()) - np.repeat(np.cumsum(shares) - shares, shares)
+    return ordered + _matrix(
+        count, days, np.repeat(first, shares) + offsets, np.repeat(day_column[split], shares),
+        np.repeat(total_column[split] / np.maximum(shares, 1), shares),
+    )
+
+
+def demand_matrix(products, warehouses, start, days):
+    """
+    Daily demand over days days from the date start for the inventory rows
+    given as parallel arrays sorted by (product, warehouse). Returns a
+    (rows, days) array and each row's demand source.
+    """
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    product_column, warehouse_column, day_column, total_column = _columns(InventoryTransaction.objects.filter(
+        product_id__in=np.unique(products).tolist(), transaction_type='OUT', created_at__gte=since
+    ).annotate(day=TruncDate('created_at')).order_by().values('product_id', 'warehouse_id', 'day').annotate(
+        total=Sum('quantity')
+    ), ['product_id', 'warehouse_id', 'day', 'total'])
+    # OUT rows carry negative quantities
+    ledger = _matrix(
+        len(products), days, _positions(_row_keys(products, warehouses), product_column, warehouse_column),
+        _day_columns(day_column, start), -total_column.astype(float),
+    )
+    ordered = order_demand(products, warehouses, start, days)
+
+    from_orders = ordered.sum(axis=1) > ledger.sum(axis=1)
+    demand = np.where(from_orders[:, None], ordered, ledger)
+    sources = np.where(from_orders, 'ORDERS', np.where(demand.any(axis=1), 'LEDGER', 'NONE'))
+    return demand, sources
+
+
+def reorder_points(demand, lead_times, configured):
+    """
+    (daily mean, deviation, reorder points, order-up-to levels) for a demand
+    matrix; rows without demand keep their configured reorder level
+    """
+    days = demand.shape[1]
+    mean = demand.mean(axis=1)
+    deviation = demand.std(axis=1, ddof=1) if days > 1 else np.zeros(len(demand))
+    # Rounded first so float noise does not push an exact result up by one
+    reorder = np.ceil(np.round(
+        mean * lead_times + settings.REPLENISHMENT_SERVICE_Z * deviation * np.sqrt(lead_times), 6
+    ))
+    order_up_to = reorder + np.ceil(np.round(mean * settings.REPLENISHMENT_REVIEW_DAYS, 6))
+    has_demand = demand.any(axis=1)
+    return (
+        mean, deviation,
+        np.where(has_demand, reorder, configured).astype(int),
+        np.where(has_demand, order_up_to, configured).astype(int),
+    )
+
+
+def set_reorder_levels(levels):
+    """Write {inventory id: reorder level} as set-based updates"""
+    if not levels:
+        return
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(Inventory._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET reorder_level = levels.level '
+                f'FROM unnest(%s::integer[], %s::integer[]) AS levels(id, level) WHERE {table}.id = levels.id',
+                [list(levels), list(levels.values())],
+            )
+        return
+    # One statement per distinct level: reorder points repeat far more than rows do
+    by_level = {}
+    for pk, level in levels.items():
+        by_level.setdefault(level, []).append(pk)
+    for level, pks in by_level.items():
+        for offset in range(0, len(pks), BATCH_SIZE):
+            Inventory.objects.filter(id__in=pks[offset:offset + BATCH_SIZE]).update(reorder_level=level)
+
+
+def write_reorder_points(points):
+    """Replace the ReorderPoint rows of the inventory rows in points, given as ReorderPoint field tuples"""
+    ReorderPoint.objects.filter(inventory_id__in=[point[0] for point in points]).delete()
+    if connection.vendor == 'postgresql' and points:
+        # Arrays instead of one parameter per value keep statement building out of the hot path
+        table = connection.ops.quote_name(ReorderPoint._meta.db_table)
+        columns = [list(column) for column in zip(*points)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(POINT_FIELDS)}) '
+                f'SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::numeric[], %s::varchar[], '
+                f'%s::float8[], %s::float8[], %s::integer[], %s::integer[], %s::integer[], %s::timestamptz[])',
+                columns,
+            )
+        return
+    ReorderPoint.objects.bulk_create([
+        ReorderPoint(**dict(zip(POINT_FIELDS, point))) for point in points
+    ], batch_size=BATCH_SIZE)
+
+
+def plan_products(product_ids, now=None):
+    """Recompute reorder points for every inventory row of product_ids. Returns the rows recomputed."""
+    from analytics import counters
+
+    now = now or timezone.now()
+    days = settings.REPLENISHMENT_DEMAND_DAYS
+    start = timezone.localdate(now) - timedelta(days=days - 1)
+    inventory = list(Inventory.objects.filter(product_id__in=product_ids).order_by(
+        'product_id', 'warehouse_id'
+    ).values_list('id', 'product_id', 'warehouse_id', 'reorder_level'))
+    if not inventory:
+        return 0
+    ids, products, warehouses, levels = (np.array(column) for column in zip(*inventory))
+
+    suppliers = _suppliers(np.unique(products).tolist())
+    supplier_column = [suppliers.get(product_id, (None, DEFAULT_LEAD_TIME_DAYS, 0)) for product_id in products.tolist()]
+    lead_times = np.array([lead_time for _, lead_time, _ in supplier_column], dtype=float)
+    demand, sources = demand_matrix(products, warehouses, start, days)
+    mean, deviation, reorder, order_up_to = reorder_points(demand, lead_times, levels)
+
+    with transaction.atomic():
+        # Locked in the same order as stock movements take them, so the low-stock counter stays exact
+        current = {
+            pk: (quantity, reorder_level)
+            for pk, quantity, reorder_level in Inventory.objects.select_for_update().filter(
+                id__in=ids.tolist()
+            ).order_by('product_id', 'warehouse_id').values_list('id', 'quantity', 'reorder_level')
+        }
+        changed = {}
+        low_stock_delta = 0
+        for pk, level in zip(ids.tolist(), reorder.tolist()):
+            if pk not in current or current[pk][1] == level:
+                continue
+            quantity, previous = current[pk]
+            changed[pk] = level
+            low_stock_delta += int(counters.is_low_stock(quantity, level)) - int(counters.is_low_stock(quantity, previous))
+        set_reorder_levels(changed)
+        counters.increment(counters.INVENTORY_LOW_STOCK, low_stock_delta)
+
+        write_reorder_points([
+            (pk, supplier_id, unit_cost, source, daily, spread, int(lead_time), point, level, now)
+            for pk, (supplier_id, _, unit_cost), source, daily, spread, lead_time, point, level in zip(
+                ids.tolist(), supplier_column, sources.tolist(), mean.tolist(), deviation.tolist(),
+                lead_times.tolist(), reorder.tolist(), order_up_to.tolist(),
+            )
+            if pk in current
+        ])
+    return len(current)
+
+
+def suggest_purchase_orders(user):
+    """
+    Rewrite the suggested DRAFT purchase orders from the current reorder
+    points. Quantities are scaled up to each supplier's minimum_order.
+    Returns the purchase orders written.
+    """
+    from finance.models import PurchaseOrder, PurchaseOrderItem
+    from partners.models import Supplier
+
+    below = list(ReorderPoint.objects.filter(
+        supplier__isnull=False, inventory__quantity__lte=F('inventory__reorder_level')
+    ).order_by('supplier_id', 'inventory__product_id').values_list(
+        'supplier_id', 'inventory__product_id', 'unit_cost', 'order_up_to', 'inventory__quantity'
+    ))
+    on_order = dict(
+        PurchaseOrderItem.objects.filter(purchase_order__status__in=OPEN_PO_STATUSES).exclude(
+            purchase_order__status='DRAFT', purchase_order__po_number__startswith=SUGGESTED_PREFIX
+        ).order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+
+    lines = []
+    if below:
+        supplier_column, product_column, costs, targets, quantities = zip(*below)
+        products, product_index = np.unique(np.array(product_column), return_inverse=True)
+        need = np.bincount(
+            product_index, weights=np.maximum(np.array(targets) - np.array(quantities), 0), minlength=len(products)
+        )
+        need = np.maximum(need - np.array([on_order.get(int(p), 0) for p in products]), 0)
+        # Every row of a product shares its supplier and cost; take the first
+        first = np.unique(product_index, return_index=True)[1]
+        supplier_of = np.array(supplier_column)[first]
+        cost_of = np.array([float(costs[i]) for i in first])
+        suppliers, supplier_index = np.unique(supplier_of, return_inverse=True)
+        subtotal = np.bincount(supplier_index, weights=need * cost_of, minlength=len(suppliers))
+        minimums = dict(Supplier.objects.filter(id__in=suppliers.tolist()).values_list('id', 'minimum_order'))
+        minimum = np.array([float(minimums[int(s)]) for s in suppliers])
+        scale = np.where((subtotal > 0) & (subtotal < minimum), minimum / np.where(subtotal > 0, subtotal, 1), 1)
+        need = np.ceil(np.round(need * scale[supplier_index], 6)).astype(int)
+        lines = [
+            (int(supplier_of[i]), int(products[i]), int(need[i]), costs[first[i]])
+            for i in range(len(products)) if need[i] > 0
+        ]
+
+    by_supplier = {}
+    for supplier_id, product_id, quantity, unit_cost in lines:
+        by_supplier.setdefault(supplier_id, []).append((product_id, quantity, unit_cost))
+    lead_times = dict(Supplier.objects.filter(id__in=list(by_supplier)).values_list('id', 'lead_time_days'))
+    now = timezone.now()
+    today = timezone.localdate(now)
+    written = []
+    with transaction.atomic():
+        drafts = {
+            order.supplier_id: order
+            for order in PurchaseOrder.objects.select_for_update().filter(
+                status='DRAFT', po_number__startswith=SUGGESTED_PREFIX
+            ).order_by('id')
+        }
+        PurchaseOrder.objects.filter(
+            id__in=[order.id for supplier_id, order in drafts.items() if supplier_id not in by_supplier]
+        ).delete()
+        for supplier_id, items in by_supplier.items():
+            order = drafts.get(supplier_id) or PurchaseOrder(
+                po_number=f'{SUGGESTED_PREFIX}{now:%Y%m%d%H%M%S}-{supplier_id}', supplier_id=supplier_id,
+                tax_amount=Decimal('0'), shipping_amount=Decimal('0'), created_by=user,
+            )
+            order.order_date = today
+            order.expected_delivery = today + timedelta(days=lead_times[supplier_id])
+            order.subtotal = sum((Decimal(quantity) * unit_cost for _, quantity, unit_cost in items), Decimal('0'))
+            order.notes = 'Suggested by the replenishment engine'
+            order.save()
+            order.items.all().delete()
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(
+                    purchase_order=order, product_id=product_id, quantity=quantity, unit_cost=unit_cost,
+                    total_cost=Decimal(quantity) * unit_cost,
+                )
+                for product_id, quantity, unit_cost in items
+            ])
+            written.append(order)
+    return written
+
+
+def run_replenishment(full=False, user=None):
+    """
+    Recompute reorder points for products that moved since the previous run
+    (every product if full, or on the first run) and rewrite the suggested
+    purchase orders. Returns the ReplenishmentRun.
+    """
+    started = timezone.now()
+    previous = ReplenishmentRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    full = full or previous is None
+    run = ReplenishmentRun.objects.create(started_at=started, full=full)
+    if full:
+        products = set(Inventory.objects.order_by().values_list('product_id', flat=True).distinct())
+    else:
+        products = changed_products(previous.started_at - CHANGE_LAG)
+
+    products = sorted(products)
+    for offset in range(0, len(products), BATCH_SIZE):
+        run.rows += plan_products(products[offset:offset + BATCH_SIZE], now=started)
+    run.purchase_orders = len(suggest_purchase_orders(user or replenishment_user()))
+    run.finished_at = timezone.now()
+    run.save(update_fields=['rows', 'purchase_orders', 'finished_at'])
+    logger.info('Replenishment recomputed %s rows for %s products, %s suggested purchase orders',
+                run.rows, len(products), run.purchase_orders)
+    return run
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Category, Product, Warehouse, Inventory, InventoryTransaction
+from .stock import BATCH_MODES, MAX_BATCH_LINES, MOVEMENT_TYPES
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -29,6 +31,26 @@ class InventorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Inventory
         fields = '__all__'
+        # Stock only changes through /api/inventory/move/ so every change is in the ledger
+        read_only_fields = ['quantity']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # Moving a row to another product or warehouse would move its stock without a ledger row
+            fields['product'].read_only = fields['warehouse'].read_only = True
+        return fields
+
+    def update(self, instance, validated_data):
+        """
+        Only reorder_level is written; the row is locked and re-read so a
+        movement committed since the request loaded it is not overwritten
+        """
+        with transaction.atomic():
+            current = Inventory.objects.select_for_update().get(pk=instance.pk)
+            current.reorder_level = validated_data.get('reorder_level', current.reorder_level)
+            current.save(update_fields=['reorder_level', 'last_updated'])
+        return current
 
 
 class InventoryTransactionSerializer(serializers.ModelSerializer):
@@ -40,3 +62,21 @@ class InventoryTransactionSerializer(serializers.ModelSerializer):
         model = InventoryTransaction
         fields = '__all__'
         read_only_fields = ['created_at']
+
+
+class StockMovementSerializer(serializers.Serializer):
+    """Input for one stock movement; ids are checked by the movement itself, not looked up here"""
+    product = serializers.IntegerField(min_value=1)
+    warehouse = serializers.IntegerField(min_value=1)
+    transaction_type = serializers.ChoiceField(choices=MOVEMENT_TYPES)
+    quantity = serializers.IntegerField()
+    to_warehouse = serializers.IntegerField(min_value=1, required=False)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class StockBatchSerializer(serializers.Serializer):
+    """Input for a batch of stock movements; the lines themselves are validated by the batch in one pass"""
+    lines = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_BATCH_LINES)
+    mode = serializers.ChoiceField(choices=BATCH_MODES, default='all_or_nothing')
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
@@ -0,0 +1,192 @@
+"""
+Point-in-time inventory.
+
+Checkpoints fall every INVENTORY_SNAPSHOT_HOURS on boundaries aligned to
+the epoch. At each checkpoint an InventorySnapshot is written for every
+(product, warehouse) whose stock moved since the previous checkpoint,
+holding its quantity at that instant. Checkpoints are contiguous, so the
+latest snapshot of a row at or before a checkpoint is its quantity there,
+and the stock at any instant is that snapshot plus the ledger rows since the
+checkpoint: at most one period of replay, however long the history.
+
+The first checkpoint sits at the start of the period holding the oldest
+ledger row and records opening balances: stock that predates the ledger
+(Inventory.quantity minus the ledger total).
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Inventory, InventoryCheckpoint, InventorySnapshot, InventoryTransaction
+
+
+logger = logging.getLogger(__name__)
+
+# Ledger rows are checkpointed once they are this old, so in-flight movements are not missed
+SNAPSHOT_LAG = timedelta(minutes=5)
+BATCH_SIZE = 5000
+
+
+def period():
+    return timedelta(hours=settings.INVENTORY_SNAPSHOT_HOURS)
+
+
+def boundary(moment):
+    """The checkpoint boundary at or before moment"""
+    seconds = int(period().total_seconds())
+    return datetime.fromtimestamp(int(moment.timestamp()) // seconds * seconds, tz=dt_timezone.utc)
+
+
+def _snapshot_before(at):
+    """Subquery: quantity of the outer row's latest snapshot at or before at"""
+    return Subquery(
+        InventorySnapshot.objects.filter(
+            product_id=OuterRef('product_id'), warehouse_id=OuterRef('warehouse_id'), taken_at__lte=at
+        ).order_by('-taken_at').values('quantity')[:1],
+        output_field=IntegerField(),
+    )
+
+
+def _open(end):
+    """Create the first checkpoint, holding opening balances"""
+    first = InventoryTransaction.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    origin = min(boundary(first), end) if first is not None else end
+    # One statement, so the quantities and ledger totals are read from the same database snapshot;
+    # a join against the grouped ledger rather than a per-row subquery keeps it one pass
+    inventory = Inventory._meta.db_table
+    ledger = InventoryTransaction._meta.db_table
+    sql = f"""
+        SELECT i.product_id, i.warehouse_id, i.quantity - COALESCE(l.total, 0)
+        FROM {inventory} i
+        LEFT JOIN (
+            SELECT product_id, warehouse_id, SUM(quantity) AS total FROM {ledger} GROUP BY product_id, warehouse_id
+        ) l ON l.product_id = i.product_id AND l.warehouse_id = i.warehouse_id
+        WHERE i.quantity <> COALESCE(l.total, 0)
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            openings = cursor.fetchall()
+        snapshots = InventorySnapshot.objects.bulk_create(
+            [
+                InventorySnapshot(product_id=product_id, warehouse_id=warehouse_id, taken_at=origin, quantity=quantity)
+                for product_id, warehouse_id, quantity in openings
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return InventoryCheckpoint.objects.create(taken_at=origin, snapshots=len(snapshots))
+
+
+def take_snapshots(until=None, limit=None, report=None):
+    """
+    Write every checkpoint due up to until (at most now), oldest first, one
+    transaction per checkpoint so an interrupted run resumes where it
+    stopped. limit caps the number of checkpoints written; report, if
+    given, is called with each new checkpoint. Returns the checkpoints
+    written.
+    """
+    now = timezone.now()
+    # A checkpoint must never be ahead of the ledger it summarises
+    end = boundary(min(until or now, now) - SNAPSHOT_LAG)
+    latest = InventoryCheckpoint.objects.order_by('-taken_at').first()
+    written = []
+    if latest is None:
+        try:
+            latest = _open(end)
+        except IntegrityError:
+            logger.info('Opening inventory checkpoint already taken')
+            return written
+        written.append(latest)
+        if report:
+            report(latest)
+
+    step = period()
+    start = latest.taken_at
+    while start + step <= end and (limit is None or len(written) < limit):
+        taken_at = start + step
+        # Rows that moved in [start, taken_at), with their quantity at start
+        moved = InventoryTransaction.objects.filter(created_at__gte=start, created_at__lt=taken_at).order_by().values(
+            'product_id', 'warehouse_id'
+        ).annotate(change=Sum('quantity'), count=Count('id'), previous=_snapshot_before(start))
+        try:
+            with transaction.atomic():
+                transactions = count = 0
+                snapshots = []
+                for row in moved.iterator(chunk_size=BATCH_SIZE):
+                    transactions += row['count']
+                    snapshots.append(InventorySnapshot(
+                        product_id=row['product_id'], warehouse_id=row['warehouse_id'], taken_at=taken_at,
+                        quantity=(row['previous'] or 0) + row['change'],
+                    ))
+                    if len(snapshots) >= BATCH_SIZE:
+                        count += len(InventorySnapshot.objects.bulk_create(snapshots))
+                        snapshots = []
+                count += len(InventorySnapshot.objects.bulk_create(snapshots))
+                checkpoint = InventoryCheckpoint.objects.create(
+                    taken_at=taken_at, transactions=transactions, snapshots=count
+                )
+        except IntegrityError:
+            # Another run wrote this checkpoint first
+            logger.info('Inventory checkpoint %s already taken', taken_at.isoformat())
+            break
+        written.append(checkpoint)
+        if report:
+            report(checkpoint)
+        start = taken_at
+    return written
+
+
+def as_of(at, warehouse=None, product=None):
+    """
+    Stock at the instant at, i.e. after every ledger row created before it.
+    Returns (checkpoint time or None, ledger rows replayed, [row dicts]).
+
+    Before the first checkpoint the opening balances held there are the
+    starting point and the ledger rows between at and it are undone.
+    """
+    filters = {}
+    if warehouse is not None:
+        filters['warehouse_id'] = warehouse
+    if product is not None:
+        filters['product_id'] = product
+    checkpoint = InventoryCheckpoint.objects.filter(taken_at__lte=at).order_by('-taken_at').values_list(
+        'taken_at', flat=True
+    ).first()
+    backwards = False
+    if checkpoint is None:
+        checkpoint = InventoryCheckpoint.objects.order_by('taken_at').values_list('taken_at', flat=True).first()
+        backwards = checkpoint is not None
+
+    inventory = Inventory.objects.filter(**filters)
+    fields = ['product_id', 'warehouse_id', 'product__sku']
+    if checkpoint is not None:
+        inventory = inventory.annotate(snapshot=_snapshot_before(checkpoint))
+        fields.append('snapshot')
+    rows = {}
+    for row in inventory.order_by('product_id', 'warehouse_id').values(*fields):
+        rows[(row['product_id'], row['warehouse_id'])] = {
+            'product': row['product_id'], 'sku': row['product__sku'], 'warehouse': row['warehouse_id'],
+            'quantity': row.get('snapshot') or 0,
+        }
+
+    # Without any checkpoint the whole ledger up to at is replayed
+    if backwards:
+        replay = InventoryTransaction.objects.filter(created_at__gte=at, created_at__lt=checkpoint, **filters)
+    else:
+        replay = InventoryTransaction.objects.filter(created_at__lt=at, **filters)
+        if checkpoint is not None:
+            replay = replay.filter(created_at__gte=checkpoint)
+    sign = -1 if backwards else 1
+    replayed = 0
+    for row in replay.order_by().values('product_id', 'warehouse_id').annotate(
+        change=Sum('quantity'), count=Count('id')
+    ):
+        key = (row['product_id'], row['warehouse_id'])
+        entry = rows.setdefault(key, {'product': key[0], 'sku': None, 'warehouse': key[1], 'quantity': 0})
+        entry['quantity'] += sign * row['change']
+        replayed += row['count']
+    return checkpoint, replayed, list(rows.values())
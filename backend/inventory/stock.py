@@ -0,0 +1,391 @@
+"""
+Stock movements.
+
+Inventory.quantity is only changed here, and every change is written to the
+InventoryTransaction ledger in the same database transaction. A ledger row's
+quantity is the signed change to stock at its warehouse: IN is positive, OUT
+negative, ADJUST either, and a TRANSFER is a negative row at the source plus
+a positive row at the destination sharing one reference.
+
+The Inventory rows a movement touches are locked with one SELECT ... FOR
+UPDATE ordered by (product, warehouse), so concurrent movements over
+overlapping rows always lock in the same order and cannot deadlock. The new
+quantity is then written as an F() expression.
+
+move_stock_batch() applies thousands of movements the same way with a
+fixed number of queries: ids are checked against prefetched product and
+warehouse maps, every row is locked at once, the lines are applied in
+order in memory, and the result is written with one bulk update and one
+bulk insert.
+"""
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Inventory, InventoryTransaction, Product, Warehouse
+
+
+MOVEMENT_TYPES = ['IN', 'OUT', 'ADJUST', 'TRANSFER']
+# all_or_nothing applies a batch only if every line can be applied;
+# best_effort applies the lines that can be and reports the rest
+BATCH_MODES = ['all_or_nothing', 'best_effort']
+MAX_BATCH_LINES = 10000
+BATCH_SIZE = 1000
+
+
+class StockMovementError(ValueError):
+    pass
+
+
+def _transfer_reference():
+    return f'TRF-{uuid.uuid4().hex[:12].upper()}'
+
+
+def _changes(transaction_type, warehouse_id, quantity, to_warehouse_id=None):
+    """[(warehouse_id, signed change)] for one movement"""
+    if transaction_type not in MOVEMENT_TYPES:
+        raise StockMovementError(f'Unknown transaction type "{transaction_type}"')
+    if transaction_type == 'ADJUST':
+        if not quantity:
+            raise StockMovementError('An adjustment must change the quantity')
+        return [(warehouse_id, quantity)]
+    if quantity <= 0:
+        raise StockMovementError('Quantity must be positive')
+    if transaction_type == 'IN':
+        return [(warehouse_id, quantity)]
+    if transaction_type == 'OUT':
+        return [(warehouse_id, -quantity)]
+    if to_warehouse_id is None:
+        raise StockMovementError('A transfer needs a destination warehouse')
+    if to_warehouse_id == warehouse_id:
+        raise StockMovementError('A transfer needs two different warehouses')
+    return [(warehouse_id, -quantity), (to_warehouse_id, quantity)]
+
+
+def _keys_condition(keys):
+    # One branch per warehouse: there are far fewer warehouses than products
+    products = {}
+    for product_id, warehouse_id in keys:
+        products.setdefault(warehouse_id, []).append(product_id)
+    condition = Q()
+    for warehouse_id, product_ids in products.items():
+        condition |= Q(warehouse_id=warehouse_id, product_id__in=product_ids)
+    return condition
+
+
+def lock_inventory(keys):
+    """
+    {(product_id, warehouse_id): [inventory id, quantity, reorder level]} for
+    the existing rows among keys, locked in key order
+    """
+    rows = Inventory.objects.select_for_update().filter(_keys_condition(keys)).order_by(
+        'product_id', 'warehouse_id'
+    ).values_list('product_id', 'warehouse_id', 'id', 'quantity', 'reorder_level')
+    return {(product_id, warehouse_id): [pk, quantity, reorder_level]
+            for product_id, warehouse_id, pk, quantity, reorder_level in rows}
+
+
+def create_inventory(keys):
+    """
+    Create empty Inventory rows for keys that do not have one yet. Runs in its
+    own transaction, before any rows are locked, so creation never holds
+    locks out of order.
+    """
+    from analytics import counters
+
+    with transaction.atomic():
+        existing = set(Inventory.objects.filter(_keys_condition(keys)).values_list('product_id', 'warehouse_id'))
+        missing = [key for key in keys if key not in existing]
+        Inventory.objects.bulk_create([
+            Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=0)
+            for product_id, warehouse_id in missing
+        ], ignore_conflicts=True)
+        # New rows start at zero, i.e. at or below their reorder level. A row created concurrently by
+        # another movement is counted twice until the next counter reconciliation.
+        counters.increment(counters.INVENTORY_LOW_STOCK, len(missing))
+
+
+def apply_changes(rows, changes):
+    """
+    Apply {(product_id, warehouse_id): change} to locked rows and keep the
+    low-stock counter in step. Returns {key: new quantity}.
+    """
+    from analytics import counters
+
+    now = timezone.now()
+    quantities = {}
+    low_stock_delta = 0
+    for key, change in sorted(changes.items()):
+        row = rows[key]
+        pk, current, reorder_level = row
+        quantity = current + change
+        if quantity < 0:
+            raise StockMovementError(
+                f'Insufficient stock for product {key[0]} at warehouse {key[1]}: '
+                f'{current} available, {-change} requested'
+            )
+        Inventory.objects.filter(pk=pk).update(quantity=F('quantity') + change, last_updated=now)
+        low_stock_delta += (
+            int(counters.is_low_stock(quantity, reorder_level)) - int(counters.is_low_stock(current, reorder_level))
+        )
+        row[1] = quantities[key] = quantity
+    counters.increment(counters.INVENTORY_LOW_STOCK, low_stock_delta)
+    return quantities
+
+
+def move_stock(product_id, warehouse_id, transaction_type, quantity, user,
+               to_warehouse_id=None, reference='', notes=''):
+    """
+    Apply one movement and record it in the ledger.
+
+    Returns (ledger rows, {(product_id, warehouse_id): new quantity}). Raises
+    StockMovementError, with nothing written, if the movement is invalid or
+    would take any stock below zero.
+    """
+    changes = {
+        (product_id, target): change
+        for target, change in _changes(transaction_type, warehouse_id, quantity, to_warehouse_id)
+    }
+    if transaction_type == 'TRANSFER' and not reference:
+        reference = _transfer_reference()
+
+    for attempt in range(2):
+        with transaction.atomic():
+            rows = lock_inventory(changes)
+            missing = [key for key in changes if key not in rows]
+            if not missing:
+                quantities = apply_changes(rows, changes)
+                ledger = InventoryTransaction.objects.bulk_create([
+                    InventoryTransaction(
+                        product_id=key[0], warehouse_id=key[1], transaction_type=transaction_type,
+                        quantity=change, reference=reference, notes=notes, created_by=user,
+                    )
+                    for key, change in changes.items()
+                ])
+                return ledger, quantities
+        if attempt or any(change < 0 for key, change in changes.items() if key in missing):
+            raise StockMovementError(f'No stock of product {product_id} at warehouse {missing[0][1]}')
+        if not Product.objects.filter(id=product_id).exists():
+            raise StockMovementError('Unknown product')
+        if Warehouse.objects.filter(id__in={key[1] for key in missing}).count() != len(missing):
+            raise StockMovementError('Unknown warehouse')
+        create_inventory(missing)
+
+
+def _integer(line, field, required=True):
+    value = line.get(field)
+    if value is None or value == '':
+        if required:
+            raise StockMovementError(f'{field} is required')
+        return None
+    # int() would truncate 1.9 to 1; whole floats such as 2.0 are accepted, as by the serializer for /move/
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise StockMovementError(f'{field} must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise StockMovementError(f'{field} must be an integer')
+
+
+def _parse_batch(lines, reference):
+    """
+    Validate every line against product and warehouse maps fetched once.
+    Returns ([(line, changes, transaction_type, reference, notes)], {line: error}).
+    """
+    product_ids, skus, warehouse_ids = set(), set(), set()
+    for line in lines:
+        if not isinstance(line, dict):
+            continue
+        if line.get('sku'):
+            skus.add(str(line['sku']))
+        for field, ids in (('product', product_ids), ('warehouse', warehouse_ids), ('to_warehouse', warehouse_ids)):
+            try:
+                ids.add(int(line[field]))
+            except (KeyError, TypeError, ValueError):
+                pass
+    products = Product.objects.filter(Q(id__in=product_ids) | Q(sku__in=skus)).values_list('id', 'sku')
+    known_products = {product_id for product_id, _ in products}
+    product_by_sku = {sku: product_id for product_id, sku in products}
+    known_warehouses = set(Warehouse.objects.filter(id__in=warehouse_ids).values_list('id', flat=True))
+
+    movements, errors = [], {}
+    for index, line in enumerate(lines):
+        try:
+            if not isinstance(line, dict):
+                raise StockMovementError('Each line must be an object')
+            if line.get('sku') and line.get('product') is None:
+                product_id = product_by_sku.get(str(line['sku']))
+                if product_id is None:
+                    raise StockMovementError(f'Unknown SKU "{line["sku"]}"')
+            else:
+                product_id = _integer(line, 'product')
+                if product_id not in known_products:
+                    raise StockMovementError(f'Unknown product {product_id}')
+            warehouse_id = _integer(line, 'warehouse')
+            to_warehouse_id = _integer(line, 'to_warehouse', required=False)
+            for target in (warehouse_id, to_warehouse_id):
+                if target is not None and target not in known_warehouses:
+                    raise StockMovementError(f'Unknown warehouse {target}')
+            transaction_type = line.get('transaction_type')
+            changes = _changes(transaction_type, warehouse_id, _integer(line, 'quantity'), to_warehouse_id)
+            line_reference = str(line.get('reference') or reference)[:100]
+            if transaction_type == 'TRANSFER' and not line_reference:
+                line_reference = _transfer_reference()
+            movements.append((
+                index, [((product_id, target), change) for target, change in changes],
+                transaction_type, line_reference, str(line.get('notes') or ''),
+            ))
+        except StockMovementError as e:
+            errors[index] = str(e)
+    return movements, errors
+
+
+def add_quantities(deltas, now):
+    """Add {inventory id: change} to locked rows as set-based updates"""
+    if connection.vendor == 'postgresql':
+        # One statement joining the rows to their changes
+        table = connection.ops.quote_name(Inventory._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET quantity = {table}.quantity + changes.change, last_updated = %s '
+                f'FROM unnest(%s::integer[], %s::integer[]) AS changes(id, change) WHERE {table}.id = changes.id',
+                [now, list(deltas), list(deltas.values())],
+            )
+        return
+    by_change = {}
+    for pk, change in deltas.items():
+        by_change.setdefault(change, []).append(pk)
+    for change, pks in by_change.items():
+        for start in range(0, len(pks), BATCH_SIZE):
+            Inventory.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).update(
+                quantity=F('quantity') + change, last_updated=now
+            )
+
+
+def insert_ledger(entries, user, now):
+    """
+    Write (product_id, warehouse_id, transaction_type, change, reference,
+    notes) entries to the ledger and return their ids, in order
+    """
+    if connection.vendor == 'postgresql' and entries:
+        # Arrays instead of one parameter per value keep statement building out of the hot path
+        table = connection.ops.quote_name(InventoryTransaction._meta.db_table)
+        columns = [list(column) for column in zip(*entries)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (product_id, warehouse_id, transaction_type, quantity, reference, notes, '
+                f'created_by_id, created_at) '
+                f'SELECT product_id, warehouse_id, transaction_type, quantity, reference, notes, %s, %s '
+                f'FROM unnest(%s::integer[], %s::integer[], %s::varchar[], %s::integer[], %s::varchar[], %s::text[]) '
+                f'AS entries(product_id, warehouse_id, transaction_type, quantity, reference, notes) RETURNING id',
+                [user.pk, now] + columns,
+            )
+            return [row[0] for row in cursor.fetchall()]
+    ledger = InventoryTransaction.objects.bulk_create([
+        InventoryTransaction(
+            product_id=product_id, warehouse_id=warehouse_id, transaction_type=transaction_type,
+            quantity=change, reference=reference, notes=notes, created_by=user,
+        )
+        for product_id, warehouse_id, transaction_type, change, reference, notes in entries
+    ], batch_size=BATCH_SIZE)
+    return [entry.pk for entry in ledger]
+
+
+def move_stock_batch(lines, user, mode='all_or_nothing', reference=''):
+    """
+    Apply many movements, in line order, with a fixed number of queries.
+
+    Lines have the fields of a single movement; a line may name its product
+    by ``sku`` instead of ``product``, and ``reference`` is the default for
+    lines without their own. Returns (applied, per-line results, {key: final
+    quantity}). In all_or_nothing mode nothing is written unless every line
+    applies.
+    """
+    from analytics import counters
+
+    if mode not in BATCH_MODES:
+        raise StockMovementError(f'Unknown mode "{mode}"')
+    if len(lines) > MAX_BATCH_LINES:
+        raise StockMovementError(f'A batch holds at most {MAX_BATCH_LINES} lines')
+    movements, errors = _parse_batch(lines, reference)
+    results = [None] * len(lines)
+    for index, error in errors.items():
+        results[index] = {'line': index, 'status': 'invalid', 'error': error}
+
+    def finish(applied, quantities):
+        for movement in movements:
+            index = movement[0]
+            if results[index] is None or not applied and results[index]['status'] == 'applied':
+                results[index] = {'line': index, 'status': 'not_applied'}
+        return applied, results, quantities
+
+    if errors and mode == 'all_or_nothing' or not movements:
+        return finish(False, {})
+
+    # Rows any line brings stock into start at zero if they do not exist yet; they are only created
+    # once the batch is accepted
+    receiving = {key for movement in movements for key, change in movement[1] if change > 0}
+    keys = sorted({key for movement in movements for key, _ in movement[1]})
+    with transaction.atomic():
+        rows = lock_inventory(keys)
+        quantities = {key: row[1] for key, row in rows.items()}
+        quantities.update({key: 0 for key in receiving if key not in rows})
+        starting = dict(quantities)
+        ledger, owners = [], []
+        for index, changes, transaction_type, line_reference, notes in movements:
+            error = None
+            for key, change in changes:
+                if key not in quantities:
+                    error = f'No stock of product {key[0]} at warehouse {key[1]}'
+                elif quantities[key] + change < 0:
+                    error = (
+                        f'Insufficient stock for product {key[0]} at warehouse {key[1]}: '
+                        f'{quantities[key]} available, {-change} requested'
+                    )
+                if error:
+                    break
+            if error:
+                results[index] = {'line': index, 'status': 'rejected', 'error': error}
+                continue
+            for key, change in changes:
+                quantities[key] += change
+                ledger.append((key[0], key[1], transaction_type, change, line_reference, notes))
+                owners.append(index)
+            results[index] = {'line': index, 'status': 'applied', 'transactions': []}
+
+        rejected = any(result and result['status'] == 'rejected' for result in results)
+        if not ledger or rejected and mode == 'all_or_nothing':
+            return finish(False, {})
+
+        changed = [key for key in keys if key in quantities and quantities[key] != starting[key]]
+        new = [key for key in changed if key not in rows]
+        if new:
+            # Every row the batch needs is already locked, so inserting here cannot lock out of order.
+            # A row created concurrently by another movement keeps its stock: changes are added to it.
+            Inventory.objects.bulk_create([
+                Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=0)
+                for product_id, warehouse_id in new
+            ], ignore_conflicts=True)
+            rows.update(lock_inventory(new))
+            # As in create_inventory, a row created concurrently is counted twice until reconciliation
+            counters.increment(counters.INVENTORY_LOW_STOCK, len(new))
+        deltas, final = {}, {}
+        low_stock_delta = 0
+        for key in changed:
+            pk, before, reorder_level = rows[key]
+            deltas[pk] = quantities[key] - starting[key]
+            final[key] = before + deltas[pk]
+            low_stock_delta += (
+                int(counters.is_low_stock(final[key], reorder_level))
+                - int(counters.is_low_stock(before, reorder_level))
+            )
+        now = timezone.now()
+        add_quantities(deltas, now)
+        ids = insert_ledger(ledger, user, now)
+        counters.increment(counters.INVENTORY_LOW_STOCK, low_stock_delta)
+
+    for pk, index in zip(ids, owners):
+        results[index]['transactions'].append(pk)
+    return finish(True, final)
@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.contrib.auth.models import User
+
+from .replenishment import run_replenishment
+from .snapshots import take_snapshots
+
+
+@shared_task
+def take_inventory_snapshots():
+    """Write any inventory checkpoints that have come due"""
+    return [checkpoint.taken_at.isoformat() for checkpoint in take_snapshots()]
+
+
+@shared_task
+def plan_replenishment(full=False, user_id=None):
+    """Recompute reorder points for products that moved and rewrite suggested purchase orders"""
+    user = User.objects.filter(id=user_id).first() if user_id else None
+    run = run_replenishment(full=full, user=user)
+    return {'rows': run.rows, 'purchase_orders': run.purchase_orders}
@@ -1,12 +1,23 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from supplychain.pagination import OptionalKeysetPagination
 from .models import Category, Product, Warehouse, Inventory, InventoryTransaction
 from .serializers import (
     CategorySerializer, ProductSerializer, WarehouseSerializer,
-    InventorySerializer, InventoryTransactionSerializer
+    InventorySerializer, InventoryTransactionSerializer, StockBatchSerializer, StockMovementSerializer
 )
+from . import snapshots
+from .stock import StockMovementError, move_stock, move_stock_batch
+from .tasks import plan_replenishment
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -42,16 +53,116 @@ class WarehouseViewSet(viewsets.ModelViewSet):
 class InventoryViewSet(viewsets.ModelViewSet):
     queryset = Inventory.objects.select_related('product', 'warehouse')
     serializer_class = InventorySerializer
+    # Deleting a row would drop its stock without a ledger row; empty it with an ADJUST instead
+    http_method_names = ['get', 'post', 'put', 'patch', 'head', 'options']
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['warehouse', 'product']
     search_fields = ['product__name', 'warehouse__name']
     ordering_fields = ['quantity', 'last_updated']
 
+    @action(detail=False, methods=['post'])
+    def move(self, request):
+        """Apply an IN, OUT, ADJUST or TRANSFER movement and record it in the ledger"""
+        serializer = StockMovementSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            ledger, quantities = move_stock(
+                data['product'], data['warehouse'], data['transaction_type'], data['quantity'], request.user,
+                to_warehouse_id=data.get('to_warehouse'), reference=data['reference'], notes=data['notes'],
+            )
+        except StockMovementError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'transaction_type': data['transaction_type'],
+            'reference': ledger[0].reference,
+            'transactions': [entry.pk for entry in ledger],
+            'inventory': [
+                {'product': product_id, 'warehouse': warehouse_id, 'quantity': quantity}
+                for (product_id, warehouse_id), quantity in quantities.items()
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='as-of')
+    def as_of(self, request):
+        """Stock per product and warehouse at a past instant (?at=, optionally ?warehouse= and ?product=)"""
+        at = request.query_params.get('at')
+        moment = _as_of_moment(at) if at else timezone.now()
+        if moment is None:
+            return Response({'error': 'at must be an ISO date or datetime'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            warehouse = int(request.query_params['warehouse']) if request.query_params.get('warehouse') else None
+            product = int(request.query_params['product']) if request.query_params.get('product') else None
+        except ValueError:
+            return Response({'error': 'warehouse and product must be ids'}, status=status.HTTP_400_BAD_REQUEST)
+        checkpoint, replayed, rows = snapshots.as_of(moment, warehouse=warehouse, product=product)
+        return Response({
+            'as_of': moment.isoformat(),
+            'checkpoint': checkpoint.isoformat() if checkpoint else None,
+            'replayed_transactions': replayed,
+            'results': rows,
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def replenish(self, request):
+        """Queue a reorder point and suggested purchase order run now ({"full": true} for every product)"""
+        full = str(request.data.get('full', '')).lower() in ('1', 'true', 'yes')
+        user_id = request.user.id
+        transaction.on_commit(lambda: plan_replenishment.delay(full=full, user_id=user_id))
+        return Response({'full': full, 'status': 'QUEUED'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'], url_path='move-batch')
+    def move_batch(self, request):
+        """Apply up to MAX_BATCH_LINES movements at once, e.g. a whole receipt"""
+        serializer = StockBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            applied, results, quantities = move_stock_batch(
+                data['lines'], request.user, mode=data['mode'], reference=data['reference'],
+            )
+        except StockMovementError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        return Response({
+            'mode': data['mode'],
+            'applied': applied,
+            'counts': counts,
+            'lines': results,
+            'inventory': [
+                {'product': product_id, 'warehouse': warehouse_id, 'quantity': quantity}
+                for (product_id, warehouse_id), quantity in quantities.items()
+            ],
+        }, status=status.HTTP_201_CREATED if applied else status.HTTP_400_BAD_REQUEST)
+
+
+def _as_of_moment(value):
+    """An instant for the as-of endpoint; a plain date means the end of that day"""
+    # parse_datetime also accepts a plain date (as midnight), so dates are told apart first
+    try:
+        day = parse_date(value)
+        if day is not None:
+            moment = datetime.combine(day + timedelta(days=1), time.min)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                return None
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    except (ValueError, OverflowError):
+        # Well-formed but impossible values, e.g. 2024-02-30, or the day after 9999-12-31
+        return None
+    return moment
+
 
-class InventoryTransactionViewSet(viewsets.ModelViewSet):
+class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    """The stock ledger; entries are only written by stock movements"""
     queryset = InventoryTransaction.objects.select_related('product', 'warehouse', 'created_by')
     serializer_class = InventoryTransactionSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['transaction_type', 'warehouse', 'product']
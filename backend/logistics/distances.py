@@ -0,0 +1,130 @@
+"""
+Distance and travel-time matrices between warehouses and delivery addresses.
+
+A location is (key, latitude, longitude) where the key names the site, e.g.
+'warehouse:3' or 'order:17'. Matrices are assembled from cached tiles: the
+sorted locations are cut into content-defined groups (a group ends after a
+location whose digest is divisible by GROUP_TARGET), and each pair of groups
+is one tile. Adding or removing a few stops therefore only changes the
+groups containing them, and every other tile is reused from the cache.
+"""
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .routing import EARTH_RADIUS_MILES, ROAD_FACTOR
+
+
+CACHE_PREFIX = 'logistics:distance-tile'
+GROUP_TARGET = 64
+GROUP_MAX = 4 * GROUP_TARGET
+TILE_DTYPE = np.float32
+
+
+def haversine_matrix(origins, destinations):
+    """Great-circle miles between every origin and destination ((n, 2) arrays of degrees)"""
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+    lat1, lng1 = origins[:, 0:1], origins[:, 1:2]
+    lat2, lng2 = destinations[:, 0], destinations[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def road_matrix(origins, destinations, road_factor=ROAD_FACTOR):
+    return haversine_matrix(origins, destinations) * road_factor
+
+
+def location_token(key, latitude, longitude):
+    # Coordinates are part of the token so a geocoding fix invalidates the site's tiles
+    return f'{key}@{float(latitude):.6f},{float(longitude):.6f}'
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def group_locations(tokens):
+    """Cut sorted tokens into content-defined groups. Returns [(digest, start, stop)]."""
+    groups = []
+    start = 0
+    for index, token in enumerate(tokens):
+        size = index + 1 - start
+        if int(_digest(token), 16) % GROUP_TARGET == 0 or size == GROUP_MAX or index == len(tokens) - 1:
+            groups.append((_digest('|'.join(tokens[start:index + 1])), start, index + 1))
+            start = index + 1
+    return groups
+
+
+class DistanceMatrix:
+    """Road-factor miles between a set of locations, with travel times at the planning speed"""
+
+    def __init__(self, keys, miles, stats=None):
+        self.keys = keys
+        self.miles = miles
+        self.stats = stats or {}
+        self.index = {key: position for position, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def minutes(self, speed=None):
+        return self.miles / (speed or settings.ROUTING_AVERAGE_SPEED_MPH) * 60
+
+    def submatrix(self, keys):
+        """Rows and columns for keys, in that order (keys may repeat)"""
+        positions = [self.index[key] for key in keys]
+        return self.miles[np.ix_(positions, positions)]
+
+
+def build_matrix(locations, road_factor=ROAD_FACTOR, use_cache=True):
+    """DistanceMatrix over (key, latitude, longitude) locations, reusing cached tiles"""
+    sites = {}
+    for key, latitude, longitude in locations:
+        sites[key] = (location_token(key, latitude, longitude), float(latitude), float(longitude))
+    ordered = sorted(sites.items(), key=lambda item: item[1][0])
+    keys = [key for key, _ in ordered]
+    tokens = [token for _, (token, _, _) in ordered]
+    points = np.array([point for _, (_, *point) in ordered], dtype=float).reshape(-1, 2)
+    groups = group_locations(tokens)
+
+    tiles = {}
+    for first, (digest_a, start_a, stop_a) in enumerate(groups):
+        for digest_b, start_b, stop_b in groups[first:]:
+            # Tiles are stored once per unordered pair, rows from the smaller digest
+            flipped = digest_b < digest_a
+            name = f'{CACHE_PREFIX}:{road_factor}:' + (
+                f'{digest_b}:{digest_a}' if flipped else f'{digest_a}:{digest_b}'
+            )
+            tiles[name] = (start_a, stop_a, start_b, stop_b, flipped)
+
+    cached = cache.get_many(list(tiles)) if use_cache else {}
+    miles = np.empty((len(keys), len(keys)), dtype=TILE_DTYPE)
+    computed = {}
+    for name, (start_a, stop_a, start_b, stop_b, flipped) in tiles.items():
+        data = cached.get(name)
+        if data is not None:
+            tile = np.frombuffer(data, dtype=TILE_DTYPE)
+            tile = tile.reshape(stop_b - start_b, stop_a - start_a).T if flipped else \
+                tile.reshape(stop_a - start_a, stop_b - start_b)
+        else:
+            tile = road_matrix(points[start_a:stop_a], points[start_b:stop_b], road_factor).astype(TILE_DTYPE)
+            computed[name] = (tile.T if flipped else tile).tobytes()
+        miles[start_a:stop_a, start_b:stop_b] = tile
+        miles[start_b:stop_b, start_a:stop_a] = tile.T
+    if computed and use_cache:
+        cache.set_many(computed, settings.DISTANCE_MATRIX_TTL)
+
+    return DistanceMatrix(keys, miles, {
+        'locations': len(keys), 'groups': len(groups),
+        'tiles': len(tiles), 'tiles_cached': len(tiles) - len(computed),
+    })
+
+
+def matrix_for(locations, road_factor=ROAD_FACTOR):
+    """Square list-of-lists matrix in the order of locations, for the pure-Python solvers"""
+    locations = list(locations)
+    matrix = build_matrix(locations, road_factor)
+    return matrix.submatrix([key for key, _, _ in locations]).astype(float).tolist()
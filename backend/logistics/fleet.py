@@ -0,0 +1,496 @@
+"""
+Capacitated multi-vehicle dispatch.
+
+Like routing.py this module is free of Django so searches can run in worker
+processes. Coordinates are projected once onto a local plane in miles, so a
+distance is a single hypot(); across a metro area that is within a fraction
+of a percent of haversine and far cheaper at fleet scale.
+
+Nodes 0..n-1 are orders and n.. are depots. A solution holds one list of
+order nodes per vehicle, in visiting order; every route starts and ends at
+its vehicle's depot.
+"""
+import math
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import routing
+
+
+NEIGHBOUR_COUNT = 12
+# Cost charged per order left off every route, so coverage always wins over distance
+UNASSIGNED_PENALTY = 10000.0
+# Orders removed and reinserted per ruin-and-recreate perturbation
+RUIN_SIZE = 30
+PROGRESS_SECONDS = 0.5
+# Extra time allowed for workers to hand back their result after the deadline
+RESULT_GRACE_SECONDS = 2.0
+EPSILON = 1e-9
+
+
+class FleetProblem:
+
+    def __init__(self, depots, vehicles, orders, demands, road_factor=routing.ROAD_FACTOR):
+        self.size = len(orders)
+        self.vehicles = vehicles
+        self.demands = list(demands)
+        self.capacities = [capacity for _, capacity in vehicles]
+        self.depot_nodes = [self.size + depot for depot, _ in vehicles]
+
+        points = list(orders) + list(depots)
+        reference = math.radians(sum(lat for lat, _ in points) / len(points))
+        scale_x = routing.EARTH_RADIUS_MILES * math.cos(reference) * math.pi / 180 * road_factor
+        scale_y = routing.EARTH_RADIUS_MILES * math.pi / 180 * road_factor
+        self.xs = [lng * scale_x for _, lng in points]
+        self.ys = [lat * scale_y for lat, _ in points]
+        self.neighbours = self._neighbour_lists()
+
+    def distance(self, a, b):
+        return math.hypot(self.xs[a] - self.xs[b], self.ys[a] - self.ys[b])
+
+    def _neighbour_lists(self, count=NEIGHBOUR_COUNT):
+        """Approximate nearest orders of each order from a uniform grid"""
+        if self.size < 2:
+            return [[] for _ in range(self.size)]
+        xs, ys = self.xs[:self.size], self.ys[:self.size]
+        min_x, min_y = min(xs), min(ys)
+        span = max(max(xs) - min_x, max(ys) - min_y, 1e-6)
+        side = max(1, int(math.sqrt(self.size / 4)))
+        cell = span / side + 1e-9
+        grid = {}
+        for node in range(self.size):
+            key = (int((xs[node] - min_x) / cell), int((ys[node] - min_y) / cell))
+            grid.setdefault(key, []).append(node)
+
+        neighbours = []
+        for node in range(self.size):
+            cx, cy = int((xs[node] - min_x) / cell), int((ys[node] - min_y) / cell)
+            candidates, ring = [], 0
+            # One extra ring once enough candidates are found keeps the cut-off honest
+            while ring <= side:
+                for gx in range(cx - ring, cx + ring + 1):
+                    for gy in range(cy - ring, cy + ring + 1):
+                        if max(abs(gx - cx), abs(gy - cy)) == ring:
+                            candidates.extend(grid.get((gx, gy), ()))
+                if len(candidates) > count and ring > 0:
+                    break
+                ring += 1
+            candidates = [other for other in candidates if other != node]
+            candidates.sort(key=lambda other: self.distance(node, other))
+            neighbours.append(candidates[:count])
+        return neighbours
+
+    def route_cost(self, vehicle, route):
+        if not route:
+            return 0.0
+        depot = self.depot_nodes[vehicle]
+        cost = self.distance(depot, route[0]) + self.distance(route[-1], depot)
+        for a, b in zip(route, route[1:]):
+            cost += self.distance(a, b)
+        return cost
+
+    def cost(self, routes, unassigned):
+        return sum(self.route_cost(vehicle, route) for vehicle, route in enumerate(routes)) + \
+            UNASSIGNED_PENALTY * len(unassigned)
+
+
+class Solution:
+    """Routes plus the bookkeeping needed for O(1) move evaluation"""
+
+    def __init__(self, problem, routes, unassigned):
+        self.problem = problem
+        self.routes = routes
+        self.unassigned = set(unassigned)
+        self.loads = [sum(problem.demands[node] for node in route) for route in routes]
+        self.route_of = [-1] * problem.size
+        self.position = [0] * problem.size
+        for vehicle in range(len(routes)):
+            self.reindex(vehicle)
+
+    def reindex(self, vehicle):
+        for index, node in enumerate(self.routes[vehicle]):
+            self.route_of[node] = vehicle
+            self.position[node] = index
+
+    def around(self, node):
+        """(predecessor, successor) of an assigned order, depots included"""
+        vehicle = self.route_of[node]
+        route, index = self.routes[vehicle], self.position[node]
+        depot = self.problem.depot_nodes[vehicle]
+        before = route[index - 1] if index > 0 else depot
+        after = route[index + 1] if index + 1 < len(route) else depot
+        return before, after
+
+    def copy(self):
+        return Solution(self.problem, [list(route) for route in self.routes], self.unassigned)
+
+    def cost(self):
+        return self.problem.cost(self.routes, self.unassigned)
+
+
+def construct(problem, rng, deadline):
+    """
+    Sweep construction: orders go to their nearest depot, are sorted by angle
+    around it from a random starting bearing and are cut into vehicle loads.
+    Overflow is inserted wherever capacity remains.
+    """
+    by_depot = {}
+    for vehicle, depot in enumerate(problem.depot_nodes):
+        by_depot.setdefault(depot, []).append(vehicle)
+    depots = list(by_depot)
+
+    members = {depot: [] for depot in depots}
+    for node in range(problem.size):
+        nearest = min(depots, key=lambda depot: problem.distance(node, depot))
+        members[nearest].append(node)
+
+    routes = [[] for _ in problem.vehicles]
+    loads = [0.0] * len(problem.vehicles)
+    overflow = []
+    for depot, nodes in members.items():
+        offset = rng.uniform(-math.pi, math.pi)
+        dx, dy = problem.xs[depot], problem.ys[depot]
+        nodes.sort(key=lambda node: (math.atan2(problem.ys[node] - dy, problem.xs[node] - dx) - offset) % (2 * math.pi))
+        vehicles = iter(by_depot[depot])
+        vehicle = next(vehicles, None)
+        for node in nodes:
+            demand = problem.demands[node]
+            while vehicle is not None and loads[vehicle] + demand > problem.capacities[vehicle]:
+                vehicle = next(vehicles, None)
+            if vehicle is None:
+                overflow.append(node)
+                continue
+            routes[vehicle].append(node)
+            loads[vehicle] += demand
+
+    solution = Solution(problem, routes, ())
+    for vehicle in range(len(routes)):
+        polish(solution, vehicle, deadline)
+    for node in overflow:
+        if not insert_cheapest(solution, node, range(len(routes))):
+            solution.unassigned.add(node)
+    return solution
+
+
+class _DistanceRow:
+    """Row of a lazily evaluated distance matrix, as routing.py indexes it"""
+    __slots__ = ('x', 'y', 'xs', 'ys')
+
+    def __init__(self, x, y, xs, ys):
+        self.x, self.y, self.xs, self.ys = x, y, xs, ys
+
+    def __getitem__(self, other):
+        return math.hypot(self.x - self.xs[other], self.y - self.ys[other])
+
+
+def polish(solution, vehicle, deadline):
+    """
+    Re-sequence one route with the single-vehicle 2-opt/Or-opt search.
+
+    Distances are computed on demand and neighbour lists come from the
+    problem's, so long routes cost O(stops) to set up rather than O(stops^2).
+    """
+    problem = solution.problem
+    route = solution.routes[vehicle]
+    if len(route) < 3:
+        return
+    depot = problem.depot_nodes[vehicle]
+    nodes = [depot, depot] + route
+    xs = [problem.xs[node] for node in nodes]
+    ys = [problem.ys[node] for node in nodes]
+    matrix = [_DistanceRow(x, y, xs, ys) for x, y in zip(xs, ys)]
+    index_of = {node: index for index, node in enumerate(nodes) if index >= 2}
+    neighbours = {
+        index_of[node]: [index_of[other] for other in problem.neighbours[node] if other in index_of]
+        for node in route
+    }
+    tour = [routing.START] + list(range(2, len(nodes))) + [routing.END]
+    while time.perf_counter() < deadline:
+        routing.two_opt(tour, matrix, neighbours, deadline)
+        if not routing.or_opt(tour, matrix, neighbours, deadline):
+            break
+    solution.routes[vehicle] = [nodes[index] for index in tour[1:-1]]
+    solution.reindex(vehicle)
+
+
+def insert_cheapest(solution, node, vehicles):
+    """Insert node at its cheapest feasible position among vehicles; False if none fits"""
+    problem = solution.problem
+    demand = problem.demands[node]
+    best = None
+    for vehicle in vehicles:
+        if solution.loads[vehicle] + demand > problem.capacities[vehicle]:
+            continue
+        route = solution.routes[vehicle]
+        depot = problem.depot_nodes[vehicle]
+        stops = [depot] + route + [depot]
+        for index in range(len(stops) - 1):
+            a, b = stops[index], stops[index + 1]
+            delta = problem.distance(a, node) + problem.distance(node, b) - problem.distance(a, b)
+            if best is None or delta < best[0]:
+                best = (delta, vehicle, index)
+    if best is None:
+        return False
+    _, vehicle, index = best
+    solution.routes[vehicle].insert(index, node)
+    solution.loads[vehicle] += demand
+    solution.unassigned.discard(node)
+    solution.reindex(vehicle)
+    return True
+
+
+def _best_relocate(solution, node):
+    problem = solution.problem
+    distance = problem.distance
+    before, after = solution.around(node)
+    gain = distance(before, node) + distance(node, after) - distance(before, after)
+    source, demand = solution.route_of[node], problem.demands[node]
+    best = None
+    for other in problem.neighbours[node]:
+        target = solution.route_of[other]
+        if target < 0:
+            continue
+        if target != source and solution.loads[target] + demand > problem.capacities[target]:
+            continue
+        other_before, other_after = solution.around(other)
+        for a, b in ((other_before, other), (other, other_after)):
+            if a == node or b == node:
+                continue
+            delta = distance(a, node) + distance(node, b) - distance(a, b) - gain
+            if delta < -EPSILON and (best is None or delta < best[0]):
+                best = (delta, 'relocate', other, a == other)
+    return best
+
+
+def _best_swap(solution, node):
+    problem = solution.problem
+    distance = problem.distance
+    source = solution.route_of[node]
+    before, after = solution.around(node)
+    best = None
+    for other in problem.neighbours[node]:
+        target = solution.route_of[other]
+        if target < 0 or target == source:
+            continue
+        shift = problem.demands[other] - problem.demands[node]
+        if solution.loads[source] + shift > problem.capacities[source] or \
+                solution.loads[target] - shift > problem.capacities[target]:
+            continue
+        other_before, other_after = solution.around(other)
+        delta = (
+            distance(before, other) + distance(other, after) - distance(before, node) - distance(node, after)
+            + distance(other_before, node) + distance(node, other_after)
+            - distance(other_before, other) - distance(other, other_after)
+        )
+        if delta < -EPSILON and (best is None or delta < best[0]):
+            best = (delta, 'swap', other, None)
+    return best
+
+
+def _apply(solution, node, move):
+    _, kind, other, after_other = move
+    problem = solution.problem
+    source, target = solution.route_of[node], solution.route_of[other]
+    if kind == 'swap':
+        solution.routes[source][solution.position[node]] = other
+        solution.routes[target][solution.position[other]] = node
+        shift = problem.demands[other] - problem.demands[node]
+        solution.loads[source] += shift
+        solution.loads[target] -= shift
+    else:
+        solution.routes[source].pop(solution.position[node])
+        solution.reindex(source)
+        index = solution.position[other] + (1 if after_other else 0)
+        solution.routes[target].insert(index, node)
+        solution.loads[source] -= problem.demands[node]
+        solution.loads[target] += problem.demands[node]
+    solution.reindex(source)
+    if target != source:
+        solution.reindex(target)
+    return {source, target}
+
+
+def local_search(solution, rng, deadline, nodes=None):
+    """
+    Relocate and swap orders between (and within) routes using neighbour
+    lists until no improving move remains, starting from nodes (default: all
+    orders). Returns the vehicles touched.
+    """
+    problem = solution.problem
+    nodes = range(problem.size) if nodes is None else nodes
+    pending = [node for node in nodes if solution.route_of[node] >= 0]
+    rng.shuffle(pending)
+    queued = set(pending)
+    touched = set()
+    checks = 0
+    while pending:
+        checks += 1
+        if checks & 127 == 0 and time.perf_counter() > deadline:
+            break
+        node = pending.pop()
+        queued.discard(node)
+        if solution.route_of[node] < 0:
+            continue
+        candidates = [move for move in (_best_relocate(solution, node), _best_swap(solution, node)) if move]
+        if not candidates:
+            continue
+        move = min(candidates, key=lambda candidate: candidate[0])
+        touched |= _apply(solution, node, move)
+        for changed in [node, move[2]] + problem.neighbours[node]:
+            if changed not in queued:
+                pending.append(changed)
+                queued.add(changed)
+    return touched
+
+
+def ruin_and_recreate(solution, rng):
+    """
+    Pull a cluster of nearby orders out of their routes and greedily
+    reinsert them. Returns (vehicles touched, cluster).
+    """
+    problem = solution.problem
+    assigned = [node for node in range(problem.size) if solution.route_of[node] >= 0]
+    if not assigned:
+        return set(), []
+    seed = rng.choice(assigned)
+    cluster = [seed] + [node for node in problem.neighbours[seed] if solution.route_of[node] >= 0]
+    cluster = cluster[:RUIN_SIZE]
+    for extra in problem.neighbours[cluster[-1]]:
+        if len(cluster) >= RUIN_SIZE:
+            break
+        if extra not in cluster and solution.route_of[extra] >= 0:
+            cluster.append(extra)
+
+    touched = set()
+    for node in cluster:
+        vehicle = solution.route_of[node]
+        solution.routes[vehicle].remove(node)
+        solution.loads[vehicle] -= problem.demands[node]
+        solution.route_of[node] = -1
+        solution.reindex(vehicle)
+        touched.add(vehicle)
+
+    rng.shuffle(cluster)
+    for node in cluster + sorted(solution.unassigned):
+        nearby = {solution.route_of[other] for other in problem.neighbours[node]} - {-1}
+        if not insert_cheapest(solution, node, nearby | touched):
+            if not insert_cheapest(solution, node, range(len(solution.routes))):
+                solution.unassigned.add(node)
+                continue
+        touched.add(solution.route_of[node])
+    return touched, cluster
+
+
+def run_search(problem, seed, deadline, report=None):
+    """
+    One independent search: sweep construction, then rounds of inter-route
+    local search, route polishing and ruin-and-recreate perturbation, keeping
+    the best solution seen. deadline is a time.time() value.
+    """
+    rng = random.Random(seed)
+    started = time.time()
+    # Convert the shared wall-clock deadline to this process's perf counter
+    local_deadline = time.perf_counter() + (deadline - started)
+    solution = construct(problem, rng, local_deadline)
+    best, best_cost = solution.copy(), solution.cost()
+    rounds = 0
+    last_report = 0.0
+    perturbed, focus = set(), None
+    if report:
+        report({'phase': 'constructed', 'cost': best_cost, 'elapsed': time.time() - started})
+
+    while time.perf_counter() < local_deadline:
+        rounds += 1
+        touched = local_search(solution, rng, local_deadline, focus) | perturbed
+        for vehicle in touched:
+            polish(solution, vehicle, local_deadline)
+        cost = solution.cost()
+        if cost < best_cost - EPSILON:
+            best, best_cost = solution.copy(), cost
+        else:
+            solution = best.copy()
+        if report and time.time() - last_report >= PROGRESS_SECONDS:
+            last_report = time.time()
+            report({'phase': 'improving', 'cost': best_cost, 'round': rounds, 'elapsed': last_report - started})
+        if problem.size < 2:
+            break
+        perturbed, cluster = ruin_and_recreate(solution, rng)
+        focus = set(cluster)
+        for node in cluster:
+            focus.update(problem.neighbours[node])
+
+    return {
+        'seed': seed,
+        'cost': best_cost,
+        'distance': best_cost - UNASSIGNED_PENALTY * len(best.unassigned),
+        'routes': best.routes,
+        'unassigned': sorted(best.unassigned),
+        'rounds': rounds,
+        'elapsed': time.time() - started,
+    }
+
+
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _worker(problem, seed, deadline):
+    def report(event):
+        event['worker'] = seed
+        _progress_queue.put(event)
+    return run_search(problem, seed, deadline, report)
+
+
+def search(problem, time_limit, workers=None, seed=0):
+    """
+    Run independent searches in a process pool and keep the best.
+
+    A generator: yields {'event': 'progress', ...} while workers run and
+    finally {'event': 'result', ...} with the best solution. Inside daemonic
+    processes (e.g. Celery workers), which cannot fork children, a single
+    search runs in-process instead.
+    """
+    workers = workers or os.cpu_count() or 1
+    deadline = time.time() + time_limit
+    started = time.time()
+
+    if workers == 1 or multiprocessing.current_process().daemon:
+        events = []
+        result = run_search(problem, seed, deadline, lambda event: events.append(dict(event, worker=seed)))
+        for event in events:
+            yield dict(event, event='progress')
+        yield dict(result, event='result', workers=1, candidates=[result['cost']])
+        return
+
+    context = multiprocessing.get_context('fork')
+    progress = context.Queue()
+    best_cost = None
+    pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(progress,))
+    futures = []
+    try:
+        futures = [pool.submit(_worker, problem, seed + offset, deadline) for offset in range(workers)]
+        while not all(future.done() for future in futures) and time.time() < deadline + RESULT_GRACE_SECONDS:
+            try:
+                event = progress.get(timeout=0.1)
+            except queue_module.Empty:
+                continue
+            if best_cost is None or event['cost'] < best_cost:
+                best_cost = event['cost']
+            yield dict(event, event='progress', best_cost=best_cost, elapsed=time.time() - started)
+        results = [future.result() for future in futures if future.done() and not future.exception()]
+    finally:
+        # Stragglers past the deadline are abandoned rather than waited for
+        finished = all(future.done() for future in futures)
+        pool.shutdown(wait=finished, cancel_futures=True)
+    if not results:
+        raise RuntimeError('No dispatch search finished before the deadline')
+    best = min(results, key=lambda result: result['cost'])
+    yield dict(best, event='result', workers=workers, candidates=sorted(result['cost'] for result in results))
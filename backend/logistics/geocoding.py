@@ -0,0 +1,112 @@
+"""
+Address geocoding for warehouses and delivery addresses.
+
+The backend is pluggable through settings.GEOCODER_BACKEND (a dotted path)
+and settings.GEOCODER_OPTIONS (its keyword arguments). Coordinates are
+written to the model fields once, so each address is only geocoded the
+first time it is routed.
+"""
+import csv
+import json
+import re
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+COORDINATE_PLACES = Decimal('0.000001')
+
+
+def normalize_address(address):
+    """Lowercase, drop punctuation and collapse whitespace so lookups are forgiving"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', address or '').lower().split())
+
+
+def warehouse_address(warehouse):
+    parts = [warehouse.address, warehouse.city, warehouse.state, warehouse.postal_code, warehouse.country]
+    return ', '.join(part for part in parts if part)
+
+
+class Geocoder:
+    """Resolves free-text addresses to (latitude, longitude)"""
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+    def geocode_many(self, addresses):
+        """Map each address to (latitude, longitude), or None when unknown"""
+        return {address: self.geocode(address) for address in addresses}
+
+
+class FileGeocoder(Geocoder):
+    """
+    Local stand-in that looks addresses up in a file instead of calling a
+    geocoding service: a CSV with address, latitude and longitude columns,
+    or a JSON object mapping address to [latitude, longitude].
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.points = self.load(self.path) if self.path and self.path.exists() else {}
+
+    @staticmethod
+    def load(path):
+        points = {}
+        if path.suffix.lower() == '.json':
+            with path.open() as handle:
+                rows = json.load(handle).items()
+        else:
+            with path.open(newline='') as handle:
+                rows = [(row['address'], (row['latitude'], row['longitude'])) for row in csv.DictReader(handle)]
+        for address, (latitude, longitude) in rows:
+            points[normalize_address(address)] = (float(latitude), float(longitude))
+        return points
+
+    def geocode(self, address):
+        return self.points.get(normalize_address(address))
+
+
+@lru_cache(maxsize=None)
+def get_geocoder():
+    return import_string(settings.GEOCODER_BACKEND)(**settings.GEOCODER_OPTIONS)
+
+
+def _as_decimal(value):
+    return Decimal(str(value)).quantize(COORDINATE_PLACES)
+
+
+def geocode_warehouses(warehouses, geocoder=None):
+    """Fill in coordinates for warehouses that have none. Returns the number updated."""
+    geocoder = geocoder or get_geocoder()
+    missing = [warehouse for warehouse in warehouses if warehouse.latitude is None or warehouse.longitude is None]
+    if not missing:
+        return 0
+    points = geocoder.geocode_many({warehouse_address(warehouse) for warehouse in missing})
+    updated = []
+    for warehouse in missing:
+        point = points.get(warehouse_address(warehouse))
+        if point:
+            warehouse.latitude, warehouse.longitude = (_as_decimal(value) for value in point)
+            updated.append(warehouse)
+    type(missing[0]).objects.bulk_update(updated, ['latitude', 'longitude'])
+    return len(updated)
+
+
+def geocode_orders(orders, geocoder=None):
+    """Fill in shipping coordinates for orders that have none. Returns the number updated."""
+    geocoder = geocoder or get_geocoder()
+    missing = [order for order in orders if order.shipping_latitude is None or order.shipping_longitude is None]
+    if not missing:
+        return 0
+    points = geocoder.geocode_many({order.shipping_address for order in missing})
+    updated = []
+    for order in missing:
+        point = points.get(order.shipping_address)
+        if point:
+            order.shipping_latitude, order.shipping_longitude = (_as_decimal(value) for value in point)
+            updated.append(order)
+    type(missing[0]).objects.bulk_update(updated, ['shipping_latitude', 'shipping_longitude'], batch_size=1000)
+    return len(updated)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from logistics.planning import RoutePlanningError, dispatch_fleet
+
+
+class Command(BaseCommand):
+    help = "Split confirmed orders across available vehicles and create one optimized route per vehicle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Only orders created on this date (YYYY-MM-DD)')
+        parser.add_argument('--time-limit', type=float, default=10, help='Search deadline in seconds')
+        parser.add_argument('--workers', type=int, help='Parallel searches (defaults to the CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Solve and report without creating routes')
+        parser.add_argument('--user', help='Username recorded as the routes\' creator (defaults to DISPATCH_USERNAME)')
+
+    def handle(self, *args, **options):
+        date = None
+        if options['date']:
+            date = parse_date(options['date'])
+            if date is None:
+                raise CommandError('--date must be YYYY-MM-DD')
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Unknown user {options['user']}")
+        events = dispatch_fleet(
+            date=date, time_limit=options['time_limit'], workers=options['workers'],
+            created_by=user, save=not options['dry_run'],
+        )
+        try:
+            for event in events:
+                if event['event'] == 'started':
+                    self.stdout.write(
+                        f"Dispatching {event['orders']} order(s) across {event['vehicles']} vehicle(s); "
+                        f"skipped {len(event['skipped_orders'])} order(s) without coordinates"
+                    )
+                elif event['event'] == 'progress':
+                    self.stdout.write(
+                        f"  [{event['elapsed']:6.1f}s] worker {event['worker']} {event['phase']}: "
+                        f"cost {event['cost']:.1f}"
+                    )
+                else:
+                    for route in event['routes']:
+                        self.stdout.write(
+                            f"  {route.get('route_number', 'vehicle %s' % route['vehicle'])}: "
+                            f"{route['stops']} stops, {route['distance']} mi, load {route['load']}/{route['capacity']}"
+                        )
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Total {event['total_distance']} mi over {len(event['routes'])} route(s); "
+                        f"{len(event['unassigned_orders'])} order(s) unassigned"
+                    ))
+        except RoutePlanningError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from inventory.models import Warehouse
+from logistics.geocoding import geocode_orders, geocode_warehouses
+from orders.models import Order
+
+
+OPEN_ORDER_STATUSES = ['PENDING', 'CONFIRMED', 'PROCESSING']
+
+
+class Command(BaseCommand):
+    help = "Geocode warehouses and open orders that have no coordinates yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        warehouses = Warehouse.objects.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True))
+        updated = geocode_warehouses(list(warehouses))
+        self.stdout.write(f"Geocoded {updated} of {len(warehouses)} warehouse(s)")
+
+        orders = Order.objects.filter(status__in=OPEN_ORDER_STATUSES).filter(
+            Q(shipping_latitude__isnull=True) | Q(shipping_longitude__isnull=True)
+        ).order_by('id').only('id', 'shipping_address', 'shipping_latitude', 'shipping_longitude')
+        total = updated = 0
+        batch = []
+        for order in orders.iterator(chunk_size=options['batch_size']):
+            batch.append(order)
+            if len(batch) == options['batch_size']:
+                updated += geocode_orders(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            updated += geocode_orders(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {updated} of {total} open order(s)"))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_planned_arrival(apps, schema_editor):
+    RouteStop = apps.get_model('logistics', 'RouteStop')
+    RouteStop.objects.filter(planned_arrival__isnull=True).update(planned_arrival=F('estimated_arrival'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routestop',
+            name='planned_arrival',
+            field=models.DateTimeField(blank=True, help_text='Arrival as originally planned; estimated_arrival is revised from live tracking', null=True),
+        ),
+        migrations.RunPython(backfill_planned_arrival, migrations.RunPython.noop),
+    ]
@@ -103,6 +103,7 @@ class RouteStop(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     sequence = models.IntegerField(help_text="Stop sequence number")
     estimated_arrival = models.DateTimeField()
+    planned_arrival = models.DateTimeField(null=True, blank=True, help_text="Arrival as originally planned; estimated_arrival is revised from live tracking")
     actual_arrival = models.DateTimeField(null=True, blank=True)
     estimated_departure = models.DateTimeField()
     actual_departure = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,303 @@
+import re
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from . import distances, fleet, geocoding, routing
+from .models import Driver, Route, RouteStop, Vehicle
+
+
+# Product.dimensions is free text such as "14x10x1 inches"
+DIMENSIONS_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*[x×*]\s*(\d+(?:\.\d+)?)\s*[x×*]\s*(\d+(?:\.\d+)?)\s*([a-z]*)', re.IGNORECASE
+)
+CUBIC_FEET_PER_UNIT = {
+    '': 1 / 1728, 'in': 1 / 1728, 'inch': 1 / 1728, 'inches': 1 / 1728,
+    'ft': 1.0, 'feet': 1.0, 'foot': 1.0,
+    'cm': 1 / 28316.8, 'm': 35.3147,
+}
+# Volume assumed for a unit whose product has no parseable dimensions
+DEFAULT_UNIT_VOLUME = 1.0
+MAX_TIME_BUDGET = 30
+MAX_DISPATCH_SECONDS = 300
+# Routes in these states still own their orders, vehicle and driver
+ACTIVE_ROUTE_STATUSES = ['PLANNED', 'IN_PROGRESS']
+TWO_PLACES = Decimal('0.01')
+
+
+class RoutePlanningError(ValueError):
+    pass
+
+
+def unit_volume(dimensions):
+    """Cubic feet of one unit described by a Product.dimensions string"""
+    match = DIMENSIONS_PATTERN.search(dimensions or '')
+    if not match:
+        return DEFAULT_UNIT_VOLUME
+    factor = CUBIC_FEET_PER_UNIT.get(match.group(4).lower())
+    if factor is None:
+        return DEFAULT_UNIT_VOLUME
+    width, depth, height = (float(value) for value in match.groups()[:3])
+    return width * depth * height * factor
+
+
+def order_volumes(order_ids):
+    """Cubic feet occupied by each order, from its items in one query"""
+    volumes = dict.fromkeys(order_ids, 0.0)
+    per_unit = {}
+    items = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        'order_id', 'quantity', 'product__dimensions'
+    )
+    for order_id, quantity, dimensions in items:
+        if dimensions not in per_unit:
+            per_unit[dimensions] = unit_volume(dimensions)
+        volumes[order_id] += quantity * per_unit[dimensions]
+    return volumes
+
+
+def warehouse_point(warehouse):
+    if warehouse.latitude is None or warehouse.longitude is None:
+        raise RoutePlanningError(f'Warehouse "{warehouse.name}" has no coordinates')
+    return float(warehouse.latitude), float(warehouse.longitude)
+
+
+def order_points(orders):
+    missing = [order.order_number for order in orders if order.shipping_latitude is None
+               or order.shipping_longitude is None]
+    if missing:
+        raise RoutePlanningError(f'Orders without shipping coordinates: {", ".join(missing[:20])}')
+    return [(float(order.shipping_latitude), float(order.shipping_longitude)) for order in orders]
+
+
+def schedule(legs, start_time):
+    """
+    Walk a route's legs (miles, depot to depot) at the planning speed.
+    Returns ([(arrival, departure)] per stop, arrival back at the end depot).
+    """
+    speed = settings.ROUTING_AVERAGE_SPEED_MPH
+    service = timedelta(minutes=settings.ROUTING_SERVICE_MINUTES)
+    clock = start_time
+    times = []
+    for leg in legs[:-1]:
+        clock += timedelta(hours=leg / speed)
+        times.append((clock, clock + service))
+        clock += service
+    return times, clock + timedelta(hours=legs[-1] / speed)
+
+
+def fuel_cost(distance, vehicle):
+    if not vehicle.fuel_efficiency:
+        return Decimal('0')
+    gallons = Decimal(str(distance)) / vehicle.fuel_efficiency
+    return (gallons * Decimal(str(settings.FUEL_PRICE_PER_GALLON))).quantize(TWO_PLACES)
+
+
+def generate_route_number():
+    return f"RT-{timezone.now():%Y%m%d}-{uuid.uuid4().hex[:6].upper()}"
+
+
+def save_route(route, orders, legs, vehicle, driver, start_warehouse, end_warehouse, planned_start_time,
+               created_by=None):
+    """
+    Write a Route visiting orders in sequence, with ETAs from the leg
+    distances. An existing route has its stops replaced.
+    """
+    times, finish = schedule(legs, planned_start_time)
+    distance = Decimal(str(sum(legs))).quantize(TWO_PLACES)
+    with transaction.atomic():
+        if route is None:
+            route = Route(route_number=generate_route_number(), created_by=created_by)
+        else:
+            route.stops.all().delete()
+        route.vehicle = vehicle
+        route.driver = driver
+        route.start_warehouse = start_warehouse
+        route.end_warehouse = end_warehouse
+        route.planned_start_time = planned_start_time
+        route.planned_end_time = finish
+        route.total_distance = distance
+        route.estimated_fuel_cost = fuel_cost(distance, vehicle)
+        route.save()
+        RouteStop.objects.bulk_create([
+            RouteStop(
+                route=route, order=order, sequence=sequence, planned_arrival=arrival,
+                estimated_arrival=arrival, estimated_departure=departure,
+            )
+            for sequence, (order, (arrival, departure)) in enumerate(zip(orders, times), 1)
+        ])
+    return route
+
+
+def plan_route(orders, vehicle, driver, start_warehouse, end_warehouse=None, planned_start_time=None,
+               created_by=None, time_budget=2.0, route=None):
+    """
+    Sequence orders for one vehicle and write the Route and its RouteStops.
+
+    Orders are loaded greedily up to the vehicle's capacity (cubic feet);
+    those that do not fit are reported as unassigned rather than planned.
+    Passing an existing route replaces its stops, which must all still fit:
+    a route is never saved with fewer stops than it had.
+
+    Returns (route, report).
+    """
+    end_warehouse = end_warehouse or start_warehouse
+    planned_start_time = planned_start_time or timezone.now()
+    orders = list(orders)
+    if not orders:
+        raise RoutePlanningError('No orders to plan')
+
+    geocoding.geocode_warehouses({start_warehouse.id: start_warehouse, end_warehouse.id: end_warehouse}.values())
+    geocoding.geocode_orders(orders)
+    locations = [
+        (f'warehouse:{warehouse.id}', *warehouse_point(warehouse)) for warehouse in (start_warehouse, end_warehouse)
+    ] + [(f'order:{order.id}', *point) for order, point in zip(orders, order_points(orders))]
+    volumes = order_volumes([order.id for order in orders])
+    demands = [0.0, 0.0] + [volumes[order.id] for order in orders]
+    matrix = distances.matrix_for(locations)
+
+    tour, unassigned, stats = routing.solve(
+        matrix, list(range(2, len(locations))), time_budget=min(time_budget, MAX_TIME_BUDGET),
+        demands=demands, capacity=vehicle.capacity,
+    )
+    if route is not None and unassigned:
+        dropped = ', '.join(orders[node - 2].order_number for node in unassigned)
+        raise RoutePlanningError(
+            f'{len(unassigned)} stop(s) no longer fit vehicle {vehicle.vehicle_number}: {dropped}; '
+            f'the route was left unchanged'
+        )
+    legs = [matrix[a][b] for a, b in zip(tour, tour[1:])]
+    route = save_route(
+        route, [orders[node - 2] for node in tour[1:-1]], legs, vehicle, driver,
+        start_warehouse, end_warehouse, planned_start_time, created_by,
+    )
+
+    report = {
+        'stops': len(tour) - 2,
+        'unassigned_orders': [orders[node - 2].id for node in unassigned],
+        'load': round(sum(demands[node] for node in tour[1:-1]), 2),
+        'capacity': vehicle.capacity,
+        'initial_distance': round(stats['initial_distance'], 2),
+        'total_distance': float(route.total_distance),
+        'rounds': stats['rounds'],
+        'two_opt_moves': stats['two_opt_moves'],
+        'or_opt_moves': stats['or_opt_moves'],
+        'solve_time_ms': round(stats['elapsed_ms'], 1),
+        'timed_out': stats['timed_out'],
+    }
+    return route, report
+
+
+def dispatch_candidates(date=None):
+    """
+    CONFIRMED orders not yet on an active route (optionally only those
+    created on date), and AVAILABLE vehicles paired with AVAILABLE drivers.
+    Vehicles are taken per home warehouse; drivers have no home base, so
+    they are paired in username order.
+    """
+    orders = Order.objects.filter(status='CONFIRMED').exclude(
+        routestop__route__status__in=ACTIVE_ROUTE_STATUSES
+    ).order_by('id')
+    if date:
+        orders = orders.filter(created_at__date=date)
+    vehicles = Vehicle.objects.filter(current_status='AVAILABLE', is_active=True).exclude(
+        route__status__in=ACTIVE_ROUTE_STATUSES
+    ).select_related('home_warehouse').order_by('home_warehouse_id', 'vehicle_number')
+    drivers = Driver.objects.filter(status='AVAILABLE', is_active=True).exclude(
+        route__status__in=ACTIVE_ROUTE_STATUSES
+    ).select_related('user')
+    return list(orders.distinct()), list(zip(vehicles, drivers))
+
+
+def dispatch_user():
+    """The user dispatched routes are created by when no one asked for them"""
+    user, _ = User.objects.get_or_create(username=settings.DISPATCH_USERNAME, defaults={'is_active': False})
+    return user
+
+
+def dispatch_fleet(date=None, time_limit=10, workers=None, planned_start_time=None, created_by=None,
+                   save=True):
+    """
+    Split the day's confirmed orders across every available vehicle/driver
+    pair, one Route per vehicle from and back to its home warehouse.
+
+    A generator of progress events, ending with {'event': 'result', ...}.
+    Orders or warehouses that cannot be geocoded are skipped and reported.
+    Saved routes are created by created_by, or by dispatch_user().
+    """
+    planned_start_time = planned_start_time or timezone.now()
+    if save and created_by is None:
+        created_by = dispatch_user()
+    orders, pairs = dispatch_candidates(date)
+    geocoding.geocode_orders(orders)
+    geocoding.geocode_warehouses({vehicle.home_warehouse_id: vehicle.home_warehouse for vehicle, _ in pairs}.values())
+    skipped_orders = [order.id for order in orders if order.shipping_latitude is None
+                      or order.shipping_longitude is None]
+    orders = [order for order in orders if order.shipping_latitude is not None
+              and order.shipping_longitude is not None]
+    skipped_vehicles = [vehicle.id for vehicle, _ in pairs if vehicle.home_warehouse.latitude is None
+                        or vehicle.home_warehouse.longitude is None]
+    pairs = [(vehicle, driver) for vehicle, driver in pairs if vehicle.id not in skipped_vehicles]
+    if not orders or not pairs:
+        raise RoutePlanningError('Nothing to dispatch: no routable orders or no available vehicle/driver pairs')
+    yield {
+        'event': 'started', 'orders': len(orders), 'vehicles': len(pairs),
+        'skipped_orders': skipped_orders, 'skipped_vehicles': skipped_vehicles,
+    }
+
+    warehouses = list({vehicle.home_warehouse_id: vehicle.home_warehouse for vehicle, _ in pairs}.values())
+    depot_index = {warehouse.id: index for index, warehouse in enumerate(warehouses)}
+    volumes = order_volumes([order.id for order in orders])
+    problem = fleet.FleetProblem(
+        depots=[warehouse_point(warehouse) for warehouse in warehouses],
+        vehicles=[(depot_index[vehicle.home_warehouse_id], vehicle.capacity) for vehicle, _ in pairs],
+        orders=order_points(orders),
+        demands=[volumes[order.id] for order in orders],
+    )
+
+    result = None
+    for event in fleet.search(problem, min(time_limit, MAX_DISPATCH_SECONDS), workers=workers):
+        if event['event'] == 'result':
+            result = event
+        else:
+            yield event
+
+    routes = []
+    with transaction.atomic():
+        for index, stops in enumerate(result['routes']):
+            if not stops:
+                continue
+            vehicle, driver = pairs[index]
+            depot = problem.depot_nodes[index]
+            path = [depot] + stops + [depot]
+            legs = [problem.distance(a, b) for a, b in zip(path, path[1:])]
+            summary = {
+                'vehicle': vehicle.id, 'driver': driver.id, 'stops': len(stops),
+                'load': round(sum(problem.demands[node] for node in stops), 2),
+                'capacity': vehicle.capacity, 'distance': round(sum(legs), 2),
+            }
+            if save:
+                route = save_route(
+                    None, [orders[node] for node in stops], legs, vehicle, driver,
+                    vehicle.home_warehouse, vehicle.home_warehouse, planned_start_time, created_by,
+                )
+                summary.update({'route': route.id, 'route_number': route.route_number})
+            routes.append(summary)
+
+    yield {
+        'event': 'result',
+        'saved': save,
+        'routes': routes,
+        'unassigned_orders': [orders[node].id for node in result['unassigned']],
+        'skipped_orders': skipped_orders,
+        'total_distance': round(result['distance'], 2),
+        'workers': result['workers'],
+        'candidate_costs': [round(cost, 2) for cost in result['candidates']],
+        'rounds': result['rounds'],
+        'solve_seconds': round(result['elapsed'], 2),
+    }
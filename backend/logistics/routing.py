@@ -0,0 +1,216 @@
+"""
+Route sequencing heuristics.
+
+Kept free of Django so the solver can run in worker processes. A problem is
+a square distance matrix where node 0 is the start depot and node 1 the end
+depot (they may be the same place); a tour is [0, stop, ..., stop, 1].
+"""
+import math
+import time
+from collections import deque
+
+
+EARTH_RADIUS_MILES = 3958.8
+# Straight-line miles are stretched by this factor to approximate road miles
+ROAD_FACTOR = 1.3
+NEIGHBOUR_COUNT = 10
+OR_OPT_SEGMENTS = (1, 2, 3)
+START, END = 0, 1
+
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_matrix(points, road_factor=ROAD_FACTOR):
+    """Symmetric matrix of road-factor miles between (latitude, longitude) points"""
+    size = len(points)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        lat1, lng1 = points[i]
+        row = matrix[i]
+        for j in range(i + 1, size):
+            distance = haversine_miles(lat1, lng1, *points[j]) * road_factor
+            row[j] = matrix[j][i] = distance
+    return matrix
+
+
+def tour_length(tour, matrix):
+    return sum(matrix[a][b] for a, b in zip(tour, tour[1:]))
+
+
+def nearest_neighbour(matrix, stops, demands=None, capacity=None):
+    """
+    Greedy construction from the start depot.
+
+    With demands and capacity, stops that no longer fit are skipped and
+    returned as unassigned. Returns (tour, unassigned).
+    """
+    remaining = set(stops)
+    tour, load, current = [START], 0, START
+    while remaining:
+        row = matrix[current]
+        candidates = remaining
+        if capacity is not None:
+            candidates = [stop for stop in remaining if load + demands[stop] <= capacity]
+            if not candidates:
+                break
+        current = min(candidates, key=row.__getitem__)
+        remaining.discard(current)
+        tour.append(current)
+        if capacity is not None:
+            load += demands[current]
+    tour.append(END)
+    return tour, sorted(remaining)
+
+
+def neighbour_lists(matrix, nodes, count=NEIGHBOUR_COUNT):
+    """The count nearest other nodes of each node, nearest first"""
+    neighbours = {}
+    for node in nodes:
+        row = matrix[node]
+        ranked = sorted((other for other in nodes if other != node), key=row.__getitem__)
+        neighbours[node] = ranked[:count]
+    return neighbours
+
+
+def two_opt(tour, matrix, neighbours, deadline):
+    """
+    2-opt with neighbour lists and a work queue of nodes whose edges changed.
+
+    A move removes edges (p, p+1) and (q, q+1) and reconnects them by
+    reversing tour[p+1..q]. The depots at both ends never move. Returns the
+    number of improving moves applied (tour is modified in place).
+    """
+    last = len(tour) - 2
+    position = {node: index for index, node in enumerate(tour)}
+    queue = deque(tour[1:-1])
+    queued = set(queue)
+    moves = checks = 0
+    while queue:
+        checks += 1
+        if checks & 255 == 0 and time.perf_counter() > deadline:
+            break
+        a = queue.popleft()
+        queued.discard(a)
+        i = position[a]
+        row = matrix[a]
+        longest = max(row[tour[i - 1]], row[tour[i + 1]])
+        for c in neighbours[a]:
+            if row[c] >= longest:
+                break
+            j = position[c]
+            low, high = min(i, j), max(i, j)
+            # New edge (a, c) either as (p, q) or as (p+1, q+1)
+            for p, q in ((low, high), (low - 1, high - 1)):
+                if p < 0 or q > last or q - p < 2:
+                    continue
+                tp, tp1, tq, tq1 = tour[p], tour[p + 1], tour[q], tour[q + 1]
+                delta = matrix[tp][tq] + matrix[tp1][tq1] - matrix[tp][tp1] - matrix[tq][tq1]
+                if delta < -1e-9:
+                    tour[p + 1:q + 1] = tour[q:p:-1]
+                    for index in range(p + 1, q + 1):
+                        position[tour[index]] = index
+                    for node in (tp, tp1, tq, tq1):
+                        if node not in (START, END) and node not in queued:
+                            queue.append(node)
+                            queued.add(node)
+                    moves += 1
+                    break
+            else:
+                continue
+            break
+    return moves
+
+
+def _best_relocation(tour, position, matrix, neighbours, start, length):
+    """Cheapest improving move of tour[start:start+length] next to a neighbour"""
+    segment = tour[start:start + length]
+    first, tail = segment[0], segment[-1]
+    before, after = tour[start - 1], tour[start + length]
+    gain = matrix[before][first] + matrix[tail][after] - matrix[before][after]
+    if gain <= 1e-9:
+        return None
+    last = len(tour) - 1
+    best = None
+    for end_node in {first, tail}:
+        for c in neighbours[end_node]:
+            j = position[c]
+            # Insert on either edge touching c, in either orientation
+            for index in (j - 1, j):
+                if index < 0 or index >= last or start - 1 <= index <= start + length - 1:
+                    continue
+                u, v = tour[index], tour[index + 1]
+                base = matrix[u][v]
+                for x, y, reverse in ((first, tail, False), (tail, first, True)):
+                    delta = matrix[u][x] + matrix[y][v] - base - gain
+                    if delta < -1e-9 and (best is None or delta < best[0]):
+                        best = (delta, u, reverse)
+    return best
+
+
+def or_opt(tour, matrix, neighbours, deadline):
+    """
+    Or-opt: relocate runs of 1-3 consecutive stops, possibly reversed, next
+    to one of their nearest neighbours. Returns the number of moves applied
+    (tour is modified in place).
+    """
+    moves = 0
+    position = {node: index for index, node in enumerate(tour)}
+    start = 1
+    while start < len(tour) - 1:
+        if time.perf_counter() > deadline:
+            break
+        move = None
+        for length in OR_OPT_SEGMENTS:
+            if start + length > len(tour) - 1:
+                break
+            move = _best_relocation(tour, position, matrix, neighbours, start, length)
+            if move is not None:
+                break
+        if move is None:
+            start += 1
+            continue
+        _, insert_after, reverse = move
+        segment = tour[start:start + length]
+        if reverse:
+            segment.reverse()
+        del tour[start:start + length]
+        index = tour.index(insert_after) + 1
+        tour[index:index] = segment
+        position = {node: index for index, node in enumerate(tour)}
+        moves += 1
+    return moves
+
+
+def solve(matrix, stops, time_budget=2.0, demands=None, capacity=None):
+    """
+    Sequence stops with nearest-neighbour construction followed by
+    alternating 2-opt and Or-opt until neither improves or the time budget
+    runs out. Returns (tour, unassigned, stats).
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+    tour, unassigned = nearest_neighbour(matrix, stops, demands, capacity)
+    initial = tour_length(tour, matrix)
+    neighbours = neighbour_lists(matrix, tour)
+    stats = {'rounds': 0, 'two_opt_moves': 0, 'or_opt_moves': 0}
+    while time.perf_counter() < deadline:
+        stats['rounds'] += 1
+        stats['two_opt_moves'] += two_opt(tour, matrix, neighbours, deadline)
+        relocated = or_opt(tour, matrix, neighbours, deadline)
+        stats['or_opt_moves'] += relocated
+        if not relocated:
+            # 2-opt had just converged, so the tour is a local optimum for both
+            break
+    stats.update({
+        'initial_distance': initial,
+        'distance': tour_length(tour, matrix),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'timed_out': time.perf_counter() >= deadline,
+    })
+    return tour, unassigned, stats
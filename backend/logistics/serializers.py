@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from inventory.models import Warehouse
+from orders.models import Order
 from .models import Vehicle, Driver, Route, RouteStop
 
 
@@ -40,3 +42,23 @@ class RouteStopSerializer(serializers.ModelSerializer):
     class Meta:
         model = RouteStop
         fields = '__all__'
+
+
+class RoutePlanSerializer(serializers.Serializer):
+    """Input for planning a new optimized route"""
+    orders = serializers.PrimaryKeyRelatedField(queryset=Order.objects.all(), many=True, allow_empty=False)
+    vehicle = serializers.PrimaryKeyRelatedField(queryset=Vehicle.objects.all())
+    driver = serializers.PrimaryKeyRelatedField(queryset=Driver.objects.select_related('user'))
+    start_warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
+    end_warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all(), required=False)
+    planned_start_time = serializers.DateTimeField(required=False)
+    time_budget = serializers.FloatField(required=False, default=2.0, min_value=0.1, max_value=30)
+
+
+class FleetDispatchSerializer(serializers.Serializer):
+    """Input for dispatching the day's confirmed orders across the available fleet"""
+    date = serializers.DateField(required=False)
+    time_limit = serializers.FloatField(required=False, default=10, min_value=1, max_value=300)
+    workers = serializers.IntegerField(required=False, min_value=1, max_value=32)
+    planned_start_time = serializers.DateTimeField(required=False)
+    stream = serializers.BooleanField(required=False, default=False)
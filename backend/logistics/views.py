@@ -1,9 +1,20 @@
-from rest_framework import viewsets
+import json
+from itertools import chain
+
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from orders.models import Order
 from .models import Vehicle, Driver, Route, RouteStop
-from .serializers import VehicleSerializer, DriverSerializer, RouteSerializer, RouteStopSerializer
+from .planning import RoutePlanningError, dispatch_fleet, plan_route
+from .serializers import (
+    VehicleSerializer, DriverSerializer, RouteSerializer, RouteStopSerializer, RoutePlanSerializer,
+    FleetDispatchSerializer
+)
 
 
 class VehicleViewSet(viewsets.ModelViewSet):
@@ -27,7 +38,7 @@ class DriverViewSet(viewsets.ModelViewSet):
 
 
 class RouteViewSet(viewsets.ModelViewSet):
-    queryset = Route.objects.select_related('vehicle', 'driver', 'start_warehouse', 'end_warehouse')
+    queryset = Route.objects.select_related('vehicle', 'driver__user', 'start_warehouse', 'end_warehouse')
     serializer_class = RouteSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -35,6 +46,71 @@ class RouteViewSet(viewsets.ModelViewSet):
     search_fields = ['route_number', 'vehicle__vehicle_number', 'driver__user__username']
     ordering_fields = ['created_at', 'planned_start_time', 'total_distance']
 
+    @action(detail=False, methods=['post'])
+    def optimize(self, request):
+        """Create a route whose stop sequence, ETAs, distance and fuel cost are optimized"""
+        serializer = RoutePlanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        orders = list(dict.fromkeys(data['orders']))
+        try:
+            route, report = plan_route(
+                orders, data['vehicle'], data['driver'], data['start_warehouse'],
+                end_warehouse=data.get('end_warehouse'),
+                planned_start_time=data.get('planned_start_time'),
+                created_by=request.user, time_budget=data['time_budget'],
+            )
+        except RoutePlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'route': RouteSerializer(route).data, 'optimization': report},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], url_path='dispatch')
+    def dispatch_fleet(self, request):
+        """Split confirmed orders across all available vehicles, one optimized route each"""
+        serializer = FleetDispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        events = dispatch_fleet(
+            date=data.get('date'), time_limit=data['time_limit'], workers=data.get('workers'),
+            planned_start_time=data.get('planned_start_time'), created_by=request.user,
+        )
+        try:
+            started = next(events)
+        except RoutePlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if data['stream']:
+            # One JSON object per line: started, progress..., result
+            lines = (json.dumps(event, default=str) + '\n' for event in chain([started], events))
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        result = None
+        for event in events:
+            result = event
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def reoptimize(self, request, pk=None):
+        """Re-sequence the stops of a planned route in place"""
+        route = self.get_object()
+        if route.status != 'PLANNED':
+            return Response({'error': 'Only planned routes can be re-optimized'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            time_budget = min(float(request.data.get('time_budget', 2.0)), 30)
+        except (TypeError, ValueError):
+            return Response({'error': 'time_budget must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        orders = Order.objects.filter(routestop__route=route).order_by('routestop__sequence')
+        try:
+            route, report = plan_route(
+                orders, route.vehicle, route.driver, route.start_warehouse, route.end_warehouse,
+                planned_start_time=route.planned_start_time, time_budget=time_budget, route=route,
+            )
+        except RoutePlanningError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'route': RouteSerializer(route).data, 'optimization': report})
+
 
 class RouteStopViewSet(viewsets.ModelViewSet):
     queryset = RouteStop.objects.select_related('route', 'order')
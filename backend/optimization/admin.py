@@ -34,7 +34,7 @@ class CachePerformanceAdmin(admin.ModelAdmin):
 
 @admin.register(DatabasePerformance)
 class DatabasePerformanceAdmin(admin.ModelAdmin):
-    list_display = ['query_type', 'execution_time', 'rows_affected', 'table_name', 'slow_query', 'timestamp']
+    list_display = ['query_type', 'execution_time', 'calls', 'rows_affected', 'table_name', 'slow_query', 'timestamp']
     list_filter = ['query_type', 'slow_query', 'table_name', 'timestamp']
     search_fields = ['table_name', 'query_hash']
     readonly_fields = ['timestamp']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OptimizationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'optimization'
+
+    def ready(self):
+        from . import instrumentation  # noqa: F401
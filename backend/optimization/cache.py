@@ -0,0 +1,318 @@
+"""
+Instrumented cache backends.
+
+Drop-in subclasses of Django's Redis and local-memory backends that count
+hits, misses, sets and deletes and time every call, grouped by key
+namespace (the first two ':'-separated parts of the key, e.g.
+'analytics:dashboard-summary'). Aggregates are kept per process and written
+to CachePerformance every CACHE_STATS_FLUSH_SECONDS: one row per namespace
+plus a total row (namespace '') that also carries evictions.
+"""
+import functools
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+
+from .flushing import buffer_flusher
+
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+OTHER_NAMESPACE = '(other)'
+
+
+def key_namespace(key):
+    parts = str(key).split(':', 2)
+    if len(parts) == 1:
+        return OTHER_NAMESPACE
+    return ':'.join(parts[:2])[:100]
+
+
+class NamespaceStats:
+    __slots__ = ('calls', 'hits', 'misses', 'sets', 'deletes', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.calls = self.hits = self.misses = self.sets = self.deletes = 0
+        self.total_ms = self.max_ms = 0.0
+
+    def add(self, other):
+        for name in ('calls', 'hits', 'misses', 'sets', 'deletes', 'total_ms'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def as_dict(self):
+        reads = self.hits + self.misses
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'misses': self.misses,
+            'sets': self.sets,
+            'deletes': self.deletes,
+            'hit_rate': round(self.hits * 100 / reads, 2) if reads else None,
+            'average_response_time': round(self.total_ms / self.calls, 4) if self.calls else 0,
+            'max_response_time': round(self.max_ms, 4),
+        }
+
+
+class CacheStats:
+    """Per-namespace aggregates shared by every instance of one backend type in this process"""
+
+    def __init__(self, cache_type):
+        self.cache_type = cache_type
+        self.lock = threading.Lock()
+        self.namespaces = {}
+        self.evictions = 0
+        self.started_at = time.monotonic()
+        self.flushing = False
+        # Evictions are read from the backend that last recorded a call
+        self.backend = None
+
+    def record(self, backend, namespace, elapsed_ms, hits=0, misses=0, sets=0, deletes=0):
+        buffer_flusher.ensure_started()
+        self.backend = backend
+        with self.lock:
+            stats = self.namespaces.get(namespace)
+            if stats is None:
+                stats = self.namespaces[namespace] = NamespaceStats()
+            stats.calls += 1
+            stats.hits += hits
+            stats.misses += misses
+            stats.sets += sets
+            stats.deletes += deletes
+            stats.total_ms += elapsed_ms
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            due = not self.flushing and time.monotonic() - self.started_at >= settings.CACHE_STATS_FLUSH_SECONDS
+            if due:
+                self.flushing = True
+        if due:
+            threading.Thread(target=self.flush, args=(backend,), name='cache-stats-flush', daemon=True).start()
+
+    def flush_if_due(self):
+        """Flush an interval that ended without a cache call to notice it"""
+        with self.lock:
+            due = not self.flushing and (self.namespaces or self.evictions) and (
+                time.monotonic() - self.started_at >= settings.CACHE_STATS_FLUSH_SECONDS
+            )
+            if due:
+                self.flushing = True
+        if due:
+            self.flush()
+
+    def add_evictions(self, count):
+        with self.lock:
+            self.evictions += count
+
+    def live(self):
+        """Current interval's aggregates, without resetting them"""
+        with self.lock:
+            namespaces = {name: stats.as_dict() for name, stats in self.namespaces.items()}
+            total = NamespaceStats()
+            for stats in self.namespaces.values():
+                total.add(stats)
+            evictions = self.evictions
+            seconds = time.monotonic() - self.started_at
+        return {
+            'cache_type': self.cache_type,
+            'interval_seconds': round(seconds, 1),
+            'totals': dict(total.as_dict(), evictions=evictions),
+            'namespaces': dict(sorted(namespaces.items(), key=lambda item: -item[1]['calls'])),
+        }
+
+    def take(self):
+        with self.lock:
+            namespaces, self.namespaces = self.namespaces, {}
+            evictions, self.evictions = self.evictions, 0
+            self.started_at = time.monotonic()
+        return namespaces, evictions
+
+    def flush(self, backend=None):
+        """Write the interval's per-namespace rows and a total row to CachePerformance"""
+        from .models import CachePerformance
+
+        backend = backend or self.backend
+        try:
+            if backend is not None:
+                try:
+                    self.add_evictions(backend.collect_evictions())
+                except Exception:
+                    logger.warning('Could not read cache evictions', exc_info=True)
+            namespaces, evictions = self.take()
+            if not namespaces and not evictions:
+                return 0
+            total = NamespaceStats()
+            rows = []
+            for namespace, stats in sorted(namespaces.items()):
+                total.add(stats)
+                rows.append(self.row(namespace, stats))
+            rows.append(self.row('', total, evictions))
+            CachePerformance.objects.bulk_create(rows)
+            return len(rows)
+        except Exception:
+            logger.exception('Failed to write cache statistics')
+            return 0
+        finally:
+            self.flushing = False
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+    def row(self, namespace, stats, evictions=0):
+        from .models import CachePerformance
+
+        reads = stats.hits + stats.misses
+        return CachePerformance(
+            cache_type=self.cache_type,
+            namespace=namespace,
+            hit_count=stats.hits,
+            miss_count=stats.misses,
+            total_requests=reads,
+            set_count=stats.sets,
+            delete_count=stats.deletes,
+            eviction_count=evictions,
+            hit_rate=Decimal(f'{stats.hits * 100 / reads:.2f}') if reads else Decimal('0'),
+            average_response_time=Decimal(f'{min(stats.total_ms / stats.calls if stats.calls else 0, 9999.9999):.4f}'),
+        )
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def stats_for(cache_type):
+    stats = _stats.get(cache_type)
+    if stats is None:
+        with _stats_lock:
+            stats = _stats.get(cache_type)
+            if stats is None:
+                stats = _stats[cache_type] = buffer_flusher.register(CacheStats(cache_type))
+    return stats
+
+
+def _timed(kind):
+    """
+    Wrap a cache method. kind says how to count the call: 'get', 'get_many',
+    'has_key', 'set', 'set_many', 'add', 'delete' or 'delete_many'.
+    Calls made from inside another instrumented call are not counted twice.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, keys, *args, **kwargs):
+            if getattr(_local, 'active', False):
+                return method(self, keys, *args, **kwargs)
+            _local.active = True
+            started = time.perf_counter()
+            try:
+                result = method(self, keys, *args, **kwargs)
+            finally:
+                _local.active = False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                self._record(kind, keys, args, kwargs, result, elapsed_ms)
+            except Exception:
+                logger.exception('Failed to record cache call')
+            return result
+        return wrapper
+    return decorate
+
+
+class InstrumentedCacheMixin:
+    cache_type = 'MEMORY'
+
+    @property
+    def stats(self):
+        return stats_for(self.cache_type)
+
+    def collect_evictions(self):
+        """Evictions since the previous call that record() has not already counted"""
+        return 0
+
+    def _record(self, kind, keys, args, kwargs, result, elapsed_ms):
+        if kind in ('get_many', 'set_many', 'delete_many'):
+            keys = list(keys)
+            if not keys:
+                return
+            namespace = key_namespace(keys[0])
+        else:
+            namespace = key_namespace(keys)
+        counts = {}
+        if kind == 'get':
+            default = args[0] if args else kwargs.get('default')
+            counts['misses' if result is default else 'hits'] = 1
+        elif kind == 'get_many':
+            counts['hits'] = len(result)
+            counts['misses'] = len(keys) - len(result)
+        elif kind == 'has_key':
+            counts['hits' if result else 'misses'] = 1
+        elif kind == 'set' or (kind == 'add' and result):
+            counts['sets'] = 1
+        elif kind == 'set_many':
+            counts['sets'] = len(keys)
+        elif kind == 'delete':
+            counts['deletes'] = 1
+        elif kind == 'delete_many':
+            counts['deletes'] = len(keys)
+        self.stats.record(self, namespace, elapsed_ms, **counts)
+
+    @_timed('get')
+    def get(self, key, *args, **kwargs):
+        return super().get(key, *args, **kwargs)
+
+    @_timed('get_many')
+    def get_many(self, keys, *args, **kwargs):
+        return super().get_many(keys, *args, **kwargs)
+
+    @_timed('has_key')
+    def has_key(self, key, *args, **kwargs):
+        return super().has_key(key, *args, **kwargs)
+
+    @_timed('set')
+    def set(self, key, *args, **kwargs):
+        return super().set(key, *args, **kwargs)
+
+    @_timed('set_many')
+    def set_many(self, data, *args, **kwargs):
+        return super().set_many(data, *args, **kwargs)
+
+    @_timed('add')
+    def add(self, key, *args, **kwargs):
+        return super().add(key, *args, **kwargs)
+
+    @_timed('set')
+    def incr(self, key, *args, **kwargs):
+        return super().incr(key, *args, **kwargs)
+
+    @_timed('delete')
+    def delete(self, key, *args, **kwargs):
+        return super().delete(key, *args, **kwargs)
+
+    @_timed('delete_many')
+    def delete_many(self, keys, *args, **kwargs):
+        return super().delete_many(keys, *args, **kwargs)
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    cache_type = 'REDIS'
+    _evicted_keys = None
+
+    def collect_evictions(self):
+        # Redis only reports evictions server-wide, so they go on the total row
+        info = self._cache.get_client().info('stats')
+        current = int(info.get('evicted_keys', 0))
+        previous, InstrumentedRedisCache._evicted_keys = InstrumentedRedisCache._evicted_keys, current
+        return max(current - previous, 0) if previous is not None else 0
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    cache_type = 'MEMORY'
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        self.stats.add_evictions(before - len(self._cache))
@@ -0,0 +1,70 @@
+"""
+Background flushing for the in-process metric buffers.
+
+The request, query, cache and rate-limit buffers flush when activity finds
+their interval has passed, which leaves the last interval before a quiet
+spell, or before the process exits, unwritten. Each buffer registers here:
+a daemon thread offers it a flush every FLUSH_TICK_SECONDS, which it takes
+once its own interval has passed, and an exit hook flushes every buffer
+when the interpreter shuts down.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_TICK_SECONDS = 1
+
+
+class BufferFlusher:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = []
+        self.thread = None
+
+    def register(self, buffer):
+        """Flush buffer on a timer and at exit; it must provide flush() and flush_if_due()"""
+        self.buffers.append(buffer)
+        return buffer
+
+    def run(self):
+        while True:
+            time.sleep(FLUSH_TICK_SECONDS)
+            close_old_connections()
+            for buffer in list(self.buffers):
+                try:
+                    buffer.flush_if_due()
+                except Exception:
+                    logger.exception('Failed to flush %s', type(buffer).__name__)
+
+    def ensure_started(self):
+        # Called on every buffered event, so the started case is a single attribute check
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='metric-buffer-flush', daemon=True)
+                self.thread.start()
+
+    def forget_thread(self):
+        # A forked worker inherits the thread object but not the thread
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def flush_all(self):
+        for buffer in list(self.buffers):
+            try:
+                buffer.flush()
+            except Exception:
+                logger.exception('Failed to flush %s at exit', type(buffer).__name__)
+
+
+buffer_flusher = BufferFlusher()
+atexit.register(buffer_flusher.flush_all)
+os.register_at_fork(after_in_child=buffer_flusher.forget_thread)
@@ -0,0 +1,182 @@
+"""
+Background health prober.
+
+The first health check in a process starts a daemon thread that probes the
+database, Redis and the host every HEALTH_PROBE_SECONDS and keeps the latest
+snapshot in memory, so the endpoint answers without doing any I/O. Each
+round is also recorded as SystemHealth rows by one process per interval.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+    # Start the CPU measurement window so the first probe has a real reading
+    psutil.cpu_percent(interval=None)
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+RECORD_LOCK_KEY = 'optimization:health-probe'
+# Round trips slower than this mark the component as WARNING
+SLOW_PROBE_MS = 250
+# A snapshot older than this many probe intervals means the prober is stuck
+STALE_INTERVALS = 3
+# How long the first health check in a process waits for the first probe
+FIRST_PROBE_TIMEOUT = 5
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 4)
+
+
+def probe_database():
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        return {'status': 'CRITICAL', 'response_time': None, 'error': str(e)}
+    elapsed = _elapsed_ms(started)
+    return {'status': 'WARNING' if elapsed > SLOW_PROBE_MS else 'HEALTHY', 'response_time': elapsed}
+
+
+def probe_redis():
+    started = time.perf_counter()
+    try:
+        cache.set('health_check', 'ok', 10)
+        result = cache.get('health_check')
+    except Exception as e:
+        return {'status': 'CRITICAL', 'response_time': None, 'error': str(e)}
+    elapsed = _elapsed_ms(started)
+    if result != 'ok':
+        return {'status': 'WARNING', 'response_time': elapsed, 'error': 'Cache read did not return the value written'}
+    return {'status': 'WARNING' if elapsed > SLOW_PROBE_MS else 'HEALTHY', 'response_time': elapsed}
+
+
+def probe_system():
+    if not PSUTIL_AVAILABLE:
+        return {'status': 'WARNING', 'message': 'psutil not available for system monitoring'}
+    try:
+        # Without an interval this is the usage since the previous call, i.e. over the last probe interval
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+    except Exception as e:
+        return {'status': 'WARNING', 'error': str(e)}
+    system_status = 'HEALTHY'
+    if cpu_percent > 80 or memory.percent > 80 or disk.percent > 90:
+        system_status = 'WARNING'
+    if cpu_percent > 95 or memory.percent > 95 or disk.percent > 95:
+        system_status = 'CRITICAL'
+    return {
+        'status': system_status,
+        'cpu_usage': cpu_percent,
+        'memory_usage': memory.percent,
+        'disk_usage': disk.percent,
+    }
+
+
+# SystemHealth component recorded for each snapshot entry
+COMPONENTS = {'database': 'DATABASE', 'redis': 'REDIS', 'system': 'API'}
+
+
+class HealthProber:
+    def __init__(self):
+        self.snapshot = None
+        self.probed_at = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def probe(self):
+        checked = timezone.now().isoformat()
+        components = {
+            'database': probe_database(),
+            'redis': probe_redis(),
+            'system': probe_system(),
+        }
+        overall = 'HEALTHY'
+        for component in components.values():
+            component['last_check'] = checked
+            if component['status'] == 'CRITICAL':
+                overall = 'CRITICAL'
+        self.snapshot = {'timestamp': checked, 'overall_status': overall, 'components': components}
+        self.probed_at = time.monotonic()
+        self.ready.set()
+        return self.snapshot
+
+    def record(self, snapshot):
+        """Store a snapshot as SystemHealth rows unless another process already did this interval"""
+        from .models import SystemHealth
+
+        interval = settings.HEALTH_PROBE_SECONDS
+        try:
+            if not cache.add(RECORD_LOCK_KEY, f'{socket.gethostname()}:{os.getpid()}', interval):
+                return 0
+        except Exception:
+            # Without the cache every process records its own probes
+            pass
+        next_check = timezone.now() + timedelta(seconds=interval)
+        rows = []
+        for name, component in snapshot['components'].items():
+            response_time = component.get('response_time')
+            rows.append(SystemHealth(
+                component=COMPONENTS[name],
+                status=component['status'],
+                response_time=Decimal(f'{min(response_time, 9999.9999):.4f}') if response_time is not None else None,
+                error_message=component.get('error', ''),
+                next_check=next_check,
+                metadata={
+                    key: value for key, value in component.items()
+                    if key not in ('status', 'response_time', 'error', 'last_check')
+                },
+            ))
+        SystemHealth.objects.bulk_create(rows)
+        return len(rows)
+
+    def run(self):
+        while True:
+            close_old_connections()
+            try:
+                self.record(self.probe())
+            except Exception:
+                logger.exception('Health probe failed')
+            time.sleep(settings.HEALTH_PROBE_SECONDS)
+
+    def ensure_started(self):
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run, name='health-prober', daemon=True)
+                    self.thread.start()
+
+    def latest(self):
+        """The most recent snapshot, or None if the first probe has not finished"""
+        self.ensure_started()
+        if not self.ready.wait(FIRST_PROBE_TIMEOUT):
+            return None
+        snapshot = dict(self.snapshot)
+        age = time.monotonic() - self.probed_at
+        snapshot['age_seconds'] = round(age, 3)
+        if age > STALE_INTERVALS * settings.HEALTH_PROBE_SECONDS:
+            snapshot['overall_status'] = 'CRITICAL'
+            snapshot['message'] = 'Health probes have stopped updating'
+        return snapshot
+
+
+health_prober = HealthProber()
@@ -0,0 +1,195 @@
+"""
+Database execute wrapper installed on every connection.
+
+Times each query and charges it to the request being measured on the
+current thread (see RequestTimingMiddleware). Queries are also aggregated
+per fingerprint (SQL with literals stripped) for the whole process and
+flushed to DatabasePerformance once per interval: one summary row per
+fingerprint, plus a few sampled rows for queries over SLOW_QUERY_MS.
+"""
+import re
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .flushing import buffer_flusher
+from .sql import fingerprint
+
+
+_local = threading.local()
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+["`]?([\w.]+)', re.IGNORECASE)
+_COMPLEX = re.compile(r'\b(?:JOIN|UNION)\b|\(\s*SELECT\b', re.IGNORECASE)
+# Transaction control and session statements are not worth tracking
+IGNORED_STATEMENTS = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'SET', 'SHOW')
+QUERY_TYPES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+# Distinct raw statements whose fingerprint is remembered; Django passes
+# parameters separately, so the same ORM query repeats the same string
+SHAPE_CACHE_SIZE = 4096
+# execution_time is DecimalField(max_digits=8, decimal_places=4)
+MAX_EXECUTION_MS = 9999.9999
+
+
+def start_request():
+    """Begin counting queries for the current thread; returns the [count, seconds] tally"""
+    tally = _local.tally = [0, 0.0]
+    return tally
+
+
+def end_request():
+    _local.tally = None
+
+
+class QueryShape:
+    __slots__ = ('sql', 'query_hash', 'query_type', 'table_name')
+
+    def __init__(self, sql):
+        self.sql, self.query_hash = fingerprint(sql)
+        keyword = self.sql.split(None, 1)[0].upper() if self.sql else ''
+        if keyword in IGNORED_STATEMENTS:
+            self.query_type = None
+        elif keyword in QUERY_TYPES and not _COMPLEX.search(self.sql):
+            self.query_type = keyword
+        else:
+            self.query_type = 'COMPLEX'
+        table = _TABLE.search(self.sql)
+        self.table_name = table.group(1)[:100] if table else ''
+
+
+class FingerprintStats:
+    __slots__ = ('shape', 'calls', 'slow_calls', 'total_ms', 'samples')
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.calls = self.slow_calls = 0
+        self.total_ms = 0.0
+        self.samples = []
+
+
+def _execution_time(ms):
+    return Decimal(f'{min(ms, MAX_EXECUTION_MS):.4f}')
+
+
+class QueryStats:
+    """Per-fingerprint query aggregates for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shapes = {}
+        self.fingerprints = {}
+        self.started_at = time.monotonic()
+        self.flushing = False
+
+    def shape(self, sql):
+        shape = self.shapes.get(sql)
+        if shape is None:
+            if len(self.shapes) >= SHAPE_CACHE_SIZE:
+                self.shapes.clear()
+            shape = self.shapes[sql] = QueryShape(sql)
+        return shape
+
+    def record(self, sql, elapsed_ms, cursor):
+        shape = self.shape(sql)
+        if shape.query_type is None:
+            return
+        slow = elapsed_ms >= settings.SLOW_QUERY_MS
+        buffer_flusher.ensure_started()
+        with self.lock:
+            stats = self.fingerprints.get(shape.query_hash)
+            if stats is None:
+                stats = self.fingerprints[shape.query_hash] = FingerprintStats(shape)
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            if slow:
+                stats.slow_calls += 1
+                if len(stats.samples) < settings.SLOW_QUERY_SAMPLES:
+                    stats.samples.append((elapsed_ms, max(getattr(cursor, 'rowcount', 0) or 0, 0)))
+            due = not self.flushing and time.monotonic() - self.started_at >= settings.QUERY_STATS_FLUSH_SECONDS
+            if due:
+                self.flushing = True
+        if due:
+            threading.Thread(target=self.flush, name='query-stats-flush', daemon=True).start()
+
+    def flush_if_due(self):
+        """Flush an interval that ended without a query to notice it"""
+        with self.lock:
+            due = not self.flushing and self.fingerprints and (
+                time.monotonic() - self.started_at >= settings.QUERY_STATS_FLUSH_SECONDS
+            )
+            if due:
+                self.flushing = True
+        if due:
+            self.flush()
+
+    def take(self):
+        with self.lock:
+            fingerprints, self.fingerprints = self.fingerprints, {}
+            self.started_at = time.monotonic()
+        return fingerprints
+
+    def rows(self, fingerprints):
+        from .models import DatabasePerformance
+
+        rows = []
+        for query_hash, stats in fingerprints.items():
+            shape = stats.shape
+            common = dict(
+                query_type=shape.query_type, table_name=shape.table_name, query_hash=query_hash, sql=shape.sql,
+            )
+            rows.append(DatabasePerformance(
+                execution_time=_execution_time(stats.total_ms / stats.calls), calls=stats.calls,
+                slow_calls=stats.slow_calls, **common
+            ))
+            rows.extend(
+                DatabasePerformance(
+                    execution_time=_execution_time(elapsed_ms), rows_affected=min(rows_affected, 2 ** 31 - 1),
+                    slow_query=True, slow_calls=1, **common
+                )
+                for elapsed_ms, rows_affected in stats.samples
+            )
+        return rows
+
+    def flush(self):
+        """Write the interval's fingerprint summaries and slow query samples"""
+        from .models import DatabasePerformance
+
+        # The flush's own INSERTs are not counted
+        _local.paused = True
+        try:
+            rows = self.rows(self.take())
+            if rows:
+                DatabasePerformance.objects.bulk_create(rows, batch_size=500)
+            return len(rows)
+        finally:
+            _local.paused = False
+            self.flushing = False
+            if threading.current_thread() is not threading.main_thread():
+                default_connection.close()
+
+
+query_stats = buffer_flusher.register(QueryStats())
+
+
+def time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        tally = getattr(_local, 'tally', None)
+        if tally is not None:
+            tally[0] += 1
+            tally[1] += elapsed
+        if settings.QUERY_STATS_ENABLED and not getattr(_local, 'paused', False):
+            query_stats.record(sql, elapsed * 1000, context.get('cursor'))
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from analytics.counters import reconcile_counters
+from optimization.query_budgets import discover_endpoints, check_endpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every list and analytics endpoint and fail if any exceeds its '
+        'query budget or repeats a query per row. Run against seeded data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help='Only check these endpoint paths')
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            user = User.objects.create_superuser('query-budget-check', password=None)
+            client = APIClient()
+            client.force_authenticate(user)
+            # Counters are seeded outside the request path; measure the steady state
+            reconcile_counters()
+
+            for path, budget in discover_endpoints():
+                if options['path'] and path not in options['path']:
+                    continue
+                result = check_endpoint(client, path, budget)
+                line = f"{path}: {result['queries']}/{result['budget']} queries (HTTP {result['status']})"
+                if result['ok']:
+                    self.stdout.write(line)
+                    continue
+                failures.append(path)
+                self.stdout.write(self.style.ERROR(line))
+                for sql, count in result['repeated'].items():
+                    self.stdout.write(f'    repeated {count}x: {sql[:200]}')
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{len(failures)} endpoint(s) over query budget: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All endpoints within query budget'))
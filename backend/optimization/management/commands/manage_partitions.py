@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from supplychain.partitioning import get_policies, maintain
+
+
+class Command(BaseCommand):
+    help = 'Roll time partitions forward and apply retention/downsampling policies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int,
+            help='Number of future partitions to keep ready (defaults to each policy)',
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Downsample the whole retained history instead of the recent catch-up window',
+        )
+        parser.add_argument(
+            '--table', action='append', dest='tables', metavar='APP.MODEL',
+            help='Limit to the given table(s)',
+        )
+
+    def handle(self, *args, **options):
+        policies = get_policies()
+        for label in options['tables'] or policies:
+            if label not in policies:
+                self.stdout.write(self.style.ERROR(f'{label}: no partition policy configured'))
+                continue
+            report = maintain(label, policies[label], ahead=options['ahead'], full_downsample=options['full'])
+            mode = 'partitioned' if report['partitioned'] else 'plain table'
+            self.stdout.write(f'{label} ({mode})')
+            if report['partitioned']:
+                self.stdout.write(
+                    f"  created {len(report['created'])} partition(s), "
+                    f"moved {report['moved']} row(s) out of the default partition"
+                )
+                for name in report['dropped']:
+                    self.stdout.write(f'  dropped {name}')
+            self.stdout.write(f"  downsampled away {report['downsampled']} row(s)")
+            self.stdout.write(f"  deleted {report['deleted']} expired row(s)")
+        self.stdout.write(self.style.SUCCESS('Partition maintenance complete'))
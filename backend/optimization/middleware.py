@@ -0,0 +1,191 @@
+import threading
+import time
+from bisect import bisect_left
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .flushing import buffer_flusher
+from .instrumentation import end_request, start_request
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+UNMATCHED_ENDPOINT = '(unmatched)'
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'client_errors', 'server_errors', 'total_ms', 'max_ms', 'queries', 'query_ms',
+                 'histogram')
+
+    def __init__(self):
+        self.requests = self.client_errors = self.server_errors = self.queries = 0
+        self.total_ms = self.max_ms = self.query_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, share):
+        """Upper bound of the histogram bucket holding the given share of requests"""
+        target = share * self.requests
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                bound = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+
+def _metric_value(value):
+    # PerformanceMetric.value holds at most 6 integer digits
+    return Decimal(f'{min(value, 999999):.4f}')
+
+
+class RequestStats:
+    """
+    Per-endpoint request aggregates for this process, flushed to
+    PerformanceMetric once per interval as a handful of rows per endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.started_at = time.monotonic()
+        self.flushing = False
+
+    def record(self, endpoint, status_code, elapsed_ms, queries, query_ms):
+        buffer_flusher.ensure_started()
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.requests += 1
+            if status_code >= 500:
+                stats.server_errors += 1
+            elif status_code >= 400:
+                stats.client_errors += 1
+            stats.total_ms += elapsed_ms
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            stats.queries += queries
+            stats.query_ms += query_ms
+            stats.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            due = not self.flushing and time.monotonic() - self.started_at >= settings.REQUEST_METRICS_FLUSH_SECONDS
+            if due:
+                self.flushing = True
+        if due:
+            threading.Thread(target=self.flush, name='request-metrics-flush', daemon=True).start()
+
+    def flush_if_due(self):
+        """Flush an interval that ended without a request to notice it"""
+        with self.lock:
+            due = not self.flushing and self.endpoints and (
+                time.monotonic() - self.started_at >= settings.REQUEST_METRICS_FLUSH_SECONDS
+            )
+            if due:
+                self.flushing = True
+        if due:
+            self.flush()
+
+    def take(self):
+        """Swap out the current interval's aggregates"""
+        with self.lock:
+            endpoints, self.endpoints = self.endpoints, {}
+            seconds = time.monotonic() - self.started_at
+            self.started_at = time.monotonic()
+        return endpoints, seconds
+
+    def rows(self, endpoints, seconds):
+        from .models import PerformanceMetric
+
+        rows = []
+        for endpoint, stats in endpoints.items():
+            requests = stats.requests
+            summary = {
+                'requests': requests,
+                'interval_seconds': round(seconds, 1),
+                'client_errors': stats.client_errors,
+                'server_errors': stats.server_errors,
+            }
+            rows.append(PerformanceMetric(
+                metric_type='RESPONSE_TIME', value=_metric_value(stats.total_ms / requests), unit='ms',
+                endpoint=endpoint, metadata=dict(
+                    summary,
+                    p50=stats.percentile(0.5), p95=stats.percentile(0.95), p99=stats.percentile(0.99),
+                    max=round(stats.max_ms, 3),
+                    histogram={
+                        str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS + ('inf',), stats.histogram)
+                        if count
+                    },
+                ),
+            ))
+            rows.append(PerformanceMetric(
+                metric_type='THROUGHPUT', value=_metric_value(requests / max(seconds, 1)), unit='req/s',
+                endpoint=endpoint, metadata=summary,
+            ))
+            rows.append(PerformanceMetric(
+                metric_type='ERROR_RATE', value=_metric_value(stats.server_errors * 100 / requests), unit='%',
+                endpoint=endpoint, metadata=summary,
+            ))
+            rows.append(PerformanceMetric(
+                metric_type='DATABASE_QUERIES', value=_metric_value(stats.queries / requests), unit='queries',
+                endpoint=endpoint, metadata=dict(
+                    summary, total_queries=stats.queries,
+                    query_ms_per_request=round(stats.query_ms / requests, 3),
+                ),
+            ))
+        return rows
+
+    def flush(self):
+        """Write one summary row per endpoint and metric type for the interval just ended"""
+        from .models import PerformanceMetric
+
+        try:
+            endpoints, seconds = self.take()
+            rows = self.rows(endpoints, seconds)
+            if rows:
+                PerformanceMetric.objects.bulk_create(rows)
+            return len(rows)
+        finally:
+            self.flushing = False
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+
+request_stats = buffer_flusher.register(RequestStats())
+
+
+def endpoint_for(request, templates={}):
+    """'GET /api/orders/{pk}/' for /api/orders/12/; the URL pattern, not the raw path, names the endpoint"""
+    match = request.resolver_match
+    if match is None:
+        return f'{request.method} {UNMATCHED_ENDPOINT}'
+    key = (request.method, match.route)
+    template = templates.get(key)
+    if template is None:
+        path = request.path_info
+        for name, value in match.kwargs.items():
+            path = path.replace(f'/{value}/', f'/{{{name}}}/', 1)
+        template = templates[key] = f'{request.method} {path}'[:200]
+    return template
+
+
+class RequestTimingMiddleware:
+    """Measures latency, status and database work per request into request_stats"""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tally = start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        request_stats.record(endpoint_for(request), response.status_code, elapsed_ms, tally[0], tally[1] * 1000)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='performancemetric',
+            index=models.Index(fields=['timestamp', 'id'], name='optimizatio_timesta_a17a90_idx'),
+        ),
+    ]
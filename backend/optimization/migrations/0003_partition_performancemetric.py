@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from supplychain.partitioning import convert_to_partitioned
+
+
+def partition_performance_metrics(apps, schema_editor):
+    # The policy as it stood for this migration; later PARTITION_POLICIES changes do not apply
+    convert_to_partitioned(
+        schema_editor, apps.get_model('optimization', 'PerformanceMetric'), interval='month', premake=2
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        # The partitioned table matches the model's schema, so there is nothing to undo
+        migrations.RunPython(partition_performance_metrics, migrations.RunPython.noop),
+    ]
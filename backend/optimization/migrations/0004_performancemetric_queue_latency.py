@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0003_partition_performancemetric'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='performancemetric',
+            name='metric_type',
+            field=models.CharField(choices=[('RESPONSE_TIME', 'Response Time'), ('THROUGHPUT', 'Throughput'), ('ERROR_RATE', 'Error Rate'), ('MEMORY_USAGE', 'Memory Usage'), ('CPU_USAGE', 'CPU Usage'), ('DATABASE_QUERIES', 'Database Queries'), ('CACHE_HIT_RATE', 'Cache Hit Rate'), ('QUEUE_LATENCY', 'Queue Latency')], max_length=20),
+        ),
+    ]
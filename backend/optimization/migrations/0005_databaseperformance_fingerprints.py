@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0004_performancemetric_queue_latency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='databaseperformance',
+            name='calls',
+            field=models.PositiveIntegerField(default=1, help_text='Executions summarised by this row; execution_time is their average'),
+        ),
+        migrations.AddField(
+            model_name='databaseperformance',
+            name='slow_calls',
+            field=models.PositiveIntegerField(default=0, help_text='Executions over the slow query threshold'),
+        ),
+        migrations.AddField(
+            model_name='databaseperformance',
+            name='sql',
+            field=models.TextField(blank=True, help_text='Query text with literals stripped'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0005_databaseperformance_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cacheperformance',
+            name='delete_count',
+            field=models.BigIntegerField(default=0, help_text='Number of explicit deletes'),
+        ),
+        migrations.AddField(
+            model_name='cacheperformance',
+            name='eviction_count',
+            field=models.BigIntegerField(default=0, help_text='Keys evicted by the cache itself'),
+        ),
+        migrations.AddField(
+            model_name='cacheperformance',
+            name='namespace',
+            field=models.CharField(blank=True, help_text='Key namespace; blank for the whole cache', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='cacheperformance',
+            name='set_count',
+            field=models.BigIntegerField(default=0, help_text='Number of cache writes'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('optimization', '0006_cacheperformance_namespaces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('rolled_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonitoringRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('MINUTE', 'Minute'), ('HOUR', 'Hourly')], max_length=10)),
+                ('source', models.CharField(choices=[('RESPONSE_TIME', 'Response Time Metrics'), ('ERROR_RATE', 'Error Rate Metrics'), ('CACHE', 'Cache Performance'), ('DATABASE', 'Database Performance'), ('SECURITY', 'Security Events')], max_length=20)),
+                ('dimension', models.CharField(blank=True, help_text="Grouping values, ':'-separated", max_length=100)),
+                ('period_start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('value_sum', models.DecimalField(decimal_places=4, default=0, max_digits=24)),
+                ('secondary_sum', models.DecimalField(decimal_places=4, default=0, max_digits=24)),
+            ],
+            options={
+                'ordering': ['bucket', 'period_start'],
+                'unique_together': {('bucket', 'period_start', 'source', 'dimension')},
+            },
+        ),
+    ]
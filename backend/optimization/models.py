@@ -15,6 +15,7 @@ class PerformanceMetric(models.Model):
         ('CPU_USAGE', 'CPU Usage'),
         ('DATABASE_QUERIES', 'Database Queries'),
         ('CACHE_HIT_RATE', 'Cache Hit Rate'),
+        ('QUEUE_LATENCY', 'Queue Latency'),
     ]
     
     metric_type = models.CharField(max_length=20, choices=METRIC_TYPES)
@@ -27,6 +28,7 @@ class PerformanceMetric(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['metric_type', 'timestamp']),
             models.Index(fields=['endpoint', 'timestamp']),
         ]
@@ -87,9 +89,15 @@ class CachePerformance(models.Model):
     ]
     
     cache_type = models.CharField(max_length=20, choices=CACHE_TYPES)
+    namespace = models.CharField(
+        max_length=100, blank=True, help_text="Key namespace; blank for the whole cache"
+    )
     hit_count = models.BigIntegerField(default=0, help_text="Number of cache hits")
     miss_count = models.BigIntegerField(default=0, help_text="Number of cache misses")
     total_requests = models.BigIntegerField(default=0, help_text="Total cache requests")
+    set_count = models.BigIntegerField(default=0, help_text="Number of cache writes")
+    delete_count = models.BigIntegerField(default=0, help_text="Number of explicit deletes")
+    eviction_count = models.BigIntegerField(default=0, help_text="Keys evicted by the cache itself")
     hit_rate = models.DecimalField(
         max_digits=5, decimal_places=2, 
         validators=[MinValueValidator(0), MaxValueValidator(100)],
@@ -136,6 +144,11 @@ class DatabasePerformance(models.Model):
     table_name = models.CharField(max_length=100, blank=True, help_text="Main table involved")
     query_hash = models.CharField(max_length=64, blank=True, help_text="Hash of the query for identification")
     slow_query = models.BooleanField(default=False, help_text="Whether this is a slow query")
+    sql = models.TextField(blank=True, help_text="Query text with literals stripped")
+    calls = models.PositiveIntegerField(
+        default=1, help_text="Executions summarised by this row; execution_time is their average"
+    )
+    slow_calls = models.PositiveIntegerField(default=0, help_text="Executions over the slow query threshold")
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -259,3 +272,44 @@ class OptimizationRecommendation(models.Model):
 
     def __str__(self):
         return f"{self.title} ({self.priority})"
+
+
+class MonitoringRollup(models.Model):
+    """Pre-aggregated monitoring rows behind the performance and security summaries"""
+    BUCKET_CHOICES = [
+        ('MINUTE', 'Minute'),
+        ('HOUR', 'Hourly'),
+    ]
+
+    SOURCE_CHOICES = [
+        ('RESPONSE_TIME', 'Response Time Metrics'),
+        ('ERROR_RATE', 'Error Rate Metrics'),
+        ('CACHE', 'Cache Performance'),
+        ('DATABASE', 'Database Performance'),
+        ('SECURITY', 'Security Events'),
+    ]
+
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    dimension = models.CharField(max_length=100, blank=True, help_text="Grouping values, ':'-separated")
+    period_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    value_sum = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+    secondary_sum = models.DecimalField(max_digits=24, decimal_places=4, default=0)
+
+    class Meta:
+        ordering = ['bucket', 'period_start']
+        unique_together = ['bucket', 'period_start', 'source', 'dimension']
+
+    def __str__(self):
+        return f"{self.source} {self.bucket} {self.period_start}"
+
+
+class RollupCheckpoint(models.Model):
+    """How far a rollup job has aggregated its source tables"""
+    name = models.CharField(max_length=50, unique=True)
+    rolled_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} rolled until {self.rolled_until}"
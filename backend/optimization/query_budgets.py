@@ -0,0 +1,84 @@
+from collections import Counter
+from importlib import import_module
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .sql import normalize_sql
+
+
+# Apps whose urls.py exposes a DefaultRouter named ``router`` under /api/
+ROUTED_APPS = [
+    'inventory', 'orders', 'warehouses', 'logistics', 'tracking',
+    'partners', 'finance', 'analytics', 'optimization',
+]
+
+# A paginated list is a COUNT plus the page itself, plus one query per
+# prefetch_related lookup.
+DEFAULT_LIST_BUDGET = 2
+DEFAULT_ACTION_BUDGET = 4
+
+QUERY_BUDGETS = {
+    '/api/invoices/': 4,
+    '/api/purchase-orders/': 4,
+    '/api/customers/': 5,
+    '/api/suppliers/': 5,
+    '/api/delivery-alerts/': 4,
+    '/api/analytics/dashboard-summary/': 8,
+    '/api/analytics/inventory-analytics/': 4,
+    '/api/analytics/financial-analytics/': 3,
+    # Served from the background prober's snapshot
+    '/api/system-monitoring/health-check/': 0,
+    # Checkpoint, one rollup query and the raw tail since the last rollup
+    '/api/system-monitoring/performance-summary/': 6,
+    '/api/system-monitoring/security-summary/': 4,
+    # Loads the spatial index on first use, then answers from memory
+    '/api/driver-locations/nearest/': 2,
+    # A single server-side cursor, however many rows are streamed
+    '/api/data-exports/stream/': 1,
+}
+
+# Query parameters for endpoints that reject a bare GET
+QUERY_PARAMS = {
+    '/api/driver-locations/nearest/': {'lat': 33.749, 'lng': -84.388, 'k': 10},
+    '/api/data-exports/stream/': {'data_source': 'inventory_transactions', 'export_format': 'CSV'},
+}
+
+
+def discover_endpoints():
+    """Yield (path, budget) for every list endpoint and GET collection action"""
+    for app in ROUTED_APPS:
+        router = import_module(f'{app}.urls').router
+        for prefix, viewset, basename in router.registry:
+            if hasattr(viewset, 'list'):
+                path = f'/api/{prefix}/'
+                yield path, QUERY_BUDGETS.get(path, DEFAULT_LIST_BUDGET)
+            for extra in viewset.get_extra_actions():
+                if extra.detail or 'get' not in extra.mapping:
+                    continue
+                path = f'/api/{prefix}/{extra.url_path}/'
+                yield path, QUERY_BUDGETS.get(path, DEFAULT_ACTION_BUDGET)
+
+
+def check_endpoint(client, path, budget):
+    """
+    Request an endpoint and return a result dict.
+
+    Besides the absolute budget, any statement that repeats with only its
+    literals changed is reported as a likely N+1 pattern.
+    """
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(path, QUERY_PARAMS.get(path))
+        if response.streaming:
+            # A streamed body runs its queries as it is consumed
+            b''.join(response.streaming_content)
+    statements = Counter(normalize_sql(query['sql']) for query in captured.captured_queries)
+    repeated = {sql: count for sql, count in statements.items() if count > 1}
+    return {
+        'path': path,
+        'status': response.status_code,
+        'queries': len(captured),
+        'budget': budget,
+        'repeated': repeated,
+        'ok': response.status_code < 400 and len(captured) <= budget and not repeated,
+    }
@@ -0,0 +1,295 @@
+"""
+Sliding-window rate limiting.
+
+Each limit keeps a counter per fixed window. A request is allowed while
+previous_window_count * (share of the previous window still in view) +
+current_window_count stays under the limit, which approximates a true
+sliding window with two integers per key. On Redis the check and the
+increment are one Lua script, i.e. one atomic round trip per decision; when
+the default cache is not Redis (tests, local development) the same
+arithmetic runs in process memory.
+
+RateLimitMiddleware applies the per-IP limit to every request. The DRF
+throttles UserRateLimit and ScopedRateLimit apply the per-user limit and
+per-endpoint limits (views set ``throttle_scope``), with rates taken from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. Blocked and near-limit decisions
+are buffered and written to RateLimitLog in batches.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from .flushing import buffer_flusher
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+# KEYS: current window, previous window
+# ARGV: limit, window seconds, share of the previous window still counted
+# Returns {allowed, current count, previous count}
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+if previous * tonumber(ARGV[3]) + current + 1 > limit then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], 2 * tonumber(ARGV[2]))
+end
+return {1, current, previous}
+"""
+
+
+class Decision:
+    __slots__ = ('allowed', 'count', 'limit', 'period', 'retry_after')
+
+    def __init__(self, allowed, current, previous, weight, elapsed, limit, period):
+        self.allowed = allowed
+        self.count = math.ceil(previous * weight + current)
+        self.limit = limit
+        self.period = period
+        self.retry_after = None if allowed else self._retry_after(current, previous, elapsed)
+
+    def _retry_after(self, current, previous, elapsed):
+        """Seconds until the weighted count drops far enough to admit one more request"""
+        if current + 1 > self.limit or not previous:
+            return self.period - elapsed
+        # previous * (1 - (elapsed + wait) / period) + current + 1 <= limit
+        wait = self.period * (1 - (self.limit - current - 1) / previous) - elapsed
+        return max(wait, 0.001)
+
+
+class RedisWindowStore:
+    def __init__(self, backend):
+        self.backend = backend
+        self.script = None
+
+    def hit(self, key, limit, period, window, weight):
+        if self.script is None:
+            self.script = self.backend._cache.get_client(write=True).register_script(SLIDING_WINDOW_SCRIPT)
+        allowed, current, previous = self.script(
+            keys=[f'{key}:{window}', f'{key}:{window - 1}'], args=[limit, period, weight]
+        )
+        return bool(allowed), int(current), int(previous)
+
+
+class LocalWindowStore:
+    """Process-local counters with the same semantics, for tests and non-Redis caches"""
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def hit(self, key, limit, period, window, weight):
+        with self.lock:
+            if len(self.counts) >= self.MAX_KEYS:
+                self.prune()
+            current = self.counts.get((key, period, window), 0)
+            previous = self.counts.get((key, period, window - 1), 0)
+            if previous * weight + current + 1 > limit:
+                return False, current, previous
+            current = self.counts[(key, period, window)] = current + 1
+            return True, current, previous
+
+    def prune(self):
+        now = time.time()
+        self.counts = {
+            (key, period, window): count for (key, period, window), count in self.counts.items()
+            if window >= now // period - 1
+        }
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = None
+
+    def get_store(self):
+        if self.store is None:
+            backend = caches['default']
+            self.store = RedisWindowStore(backend) if isinstance(backend, RedisCache) else LocalWindowStore()
+        return self.store
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window, elapsed = divmod(now, period)
+        weight = 1 - elapsed / period
+        try:
+            allowed, current, previous = self.get_store().hit(key, limit, period, int(window), weight)
+        except Exception:
+            # An unreachable limiter must not take the API down with it
+            logger.warning('Rate limiter unavailable; allowing request', exc_info=True)
+            return Decision(True, 0, 0, weight, elapsed, limit, period)
+        return Decision(allowed, current, previous, weight, elapsed, limit, period)
+
+
+rate_limiter = RateLimiter()
+
+
+class RateLimitAudit:
+    """Buffers blocked and near-limit decisions and writes them to RateLimitLog in batches"""
+    MAX_BUFFERED = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushed_at = time.monotonic()
+        self.flushing = False
+
+    def note(self, decision, limit_type, ip_address, endpoint, user=None):
+        if not ip_address or decision.allowed and decision.count < decision.limit * settings.RATE_LIMIT_LOG_RATIO:
+            return
+        # Repeated events for the same client and endpoint collapse into one row per batch
+        key = (limit_type, ip_address, user.pk if user is not None else None, endpoint[:200], not decision.allowed)
+        buffer_flusher.ensure_started()
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                if len(self.pending) >= self.MAX_BUFFERED:
+                    return
+                self.pending[key] = entry = {'user': user, 'decision': decision, 'request_count': 0}
+            entry['request_count'] = max(entry['request_count'], decision.count)
+            due = not self.flushing and (
+                len(self.pending) >= self.MAX_BUFFERED
+                or time.monotonic() - self.flushed_at >= settings.RATE_LIMIT_LOG_FLUSH_SECONDS
+            )
+            if due:
+                self.flushing = True
+        if due:
+            threading.Thread(target=self.flush, name='rate-limit-log-flush', daemon=True).start()
+
+    def flush_if_due(self):
+        """Flush decisions buffered before traffic stopped"""
+        with self.lock:
+            due = not self.flushing and self.pending and (
+                time.monotonic() - self.flushed_at >= settings.RATE_LIMIT_LOG_FLUSH_SECONDS
+            )
+            if due:
+                self.flushing = True
+        if due:
+            self.flush()
+
+    def flush(self):
+        from .models import RateLimitLog
+
+        try:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                self.flushed_at = time.monotonic()
+            rows = [
+                RateLimitLog(
+                    limit_type=limit_type, user=entry['user'], ip_address=ip_address, endpoint=endpoint,
+                    request_count=entry['request_count'], limit_threshold=entry['decision'].limit,
+                    period_seconds=entry['decision'].period, blocked=blocked,
+                )
+                for (limit_type, ip_address, _, endpoint, blocked), entry in pending.items()
+            ]
+            if rows:
+                RateLimitLog.objects.bulk_create(rows)
+            return len(rows)
+        except Exception:
+            logger.exception('Failed to write rate limit logs')
+            return 0
+        finally:
+            self.flushing = False
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+
+rate_limit_audit = buffer_flusher.register(RateLimitAudit())
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with the shared sliding-window limiter in place of a cached request history"""
+    limit_type = 'API_RATE_LIMIT'
+    decision = None
+
+    def allow_request(self, request, view):
+        if not settings.RATE_LIMIT_ENABLED or self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.decision = rate_limiter.hit(self.key, self.num_requests, self.duration)
+        user = request.user if request.user and request.user.is_authenticated else None
+        rate_limit_audit.note(self.decision, self.limit_type, self.get_ident(request), request.path, user)
+        return self.decision.allowed
+
+    def wait(self):
+        return self.decision.retry_after if self.decision else None
+
+
+class UserRateLimit(SlidingWindowThrottle):
+    """Per-user limit; anonymous requests are limited per client IP"""
+    scope = 'user'
+    limit_type = 'USER_RATE_LIMIT'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'{KEY_PREFIX}:user:{request.user.pk}'
+        return f'{KEY_PREFIX}:anon:{self.get_ident(request)}'
+
+
+class ScopedRateLimit(SlidingWindowThrottle):
+    """Per-user limit for views that set ``throttle_scope`` to a key of DEFAULT_THROTTLE_RATES"""
+    scope_attr = 'throttle_scope'
+    limit_type = 'ENDPOINT_LIMIT'
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'{KEY_PREFIX}:{self.scope}:{ident}'
+
+
+class RateLimitMiddleware:
+    """Per-IP limit (RATE_LIMIT_IP) applied before any view or authentication work"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit, self.period = SimpleRateThrottle.parse_rate(self, settings.RATE_LIMIT_IP)
+        # Resolves the client address the same way the DRF throttles do (honouring NUM_PROXIES)
+        self.ident = BaseThrottle()
+
+    def __call__(self, request):
+        if not settings.RATE_LIMIT_ENABLED or self.limit is None:
+            return self.get_response(request)
+        ip_address = self.ident.get_ident(request)
+        decision = rate_limiter.hit(f'{KEY_PREFIX}:ip:{ip_address}', self.limit, self.period)
+        rate_limit_audit.note(decision, 'IP_RATE_LIMIT', ip_address, request.path)
+        if not decision.allowed:
+            response = JsonResponse(
+                {'error': 'Rate limit exceeded', 'retry_after': math.ceil(decision.retry_after)}, status=429
+            )
+            response['Retry-After'] = str(math.ceil(decision.retry_after))
+            return response
+        return self.get_response(request)
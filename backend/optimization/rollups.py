@@ -0,0 +1,275 @@
+"""
+Minute and hour rollups behind the performance and security summaries.
+
+roll_up() aggregates complete minutes of PerformanceMetric, CachePerformance,
+DatabasePerformance and SecurityEvent rows into MonitoringRollup MINUTE rows
+and re-derives the HOUR rows those minutes fall in, then advances a
+checkpoint. A summary reads HOUR rows for whole hours, MINUTE rows for the
+partial hours at either end, and raw rows only for the tail after the
+checkpoint, so its cost does not grow with the raw tables.
+
+Every source row keeps the semantics of the original summaries: averages
+are over rows (sum / count), counts are of rows.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+
+from .models import MonitoringRollup, RollupCheckpoint
+
+
+UTC = dt_timezone.utc
+CHECKPOINT = 'monitoring-summary'
+# Rows are rolled up once they are this old, so in-flight flushes are not missed
+ROLLUP_LAG = timedelta(minutes=1)
+# A backfill advances at most this far per run; later runs continue from the checkpoint
+MAX_MINUTES_PER_RUN = 24 * 60
+
+
+class RollupSource:
+    def __init__(self, model, dimensions=(), value=None, secondary=None, filters=None):
+        self.model = model
+        self.dimensions = dimensions
+        self.value = value
+        self.secondary = secondary
+        self.filters = filters or {}
+
+    def queryset(self, start, end, filters=None):
+        # order_by() drops the models' default ordering so grouping stays intact
+        return apps.get_model(self.model).objects.filter(
+            timestamp__gte=start, timestamp__lt=end, **(self.filters if filters is None else filters)
+        ).order_by()
+
+    def aggregates(self):
+        aggregates = {'count': Count('id')}
+        if self.value:
+            aggregates['value_sum'] = Sum(self.value)
+        if self.secondary:
+            aggregates['secondary_sum'] = Sum(self.secondary)
+        return aggregates
+
+    def dimension(self, row):
+        return ':'.join(str(row[field]) for field in self.dimensions)
+
+    def totals(self, start, end, by_minute=False, filters=None, group=()):
+        queryset = self.queryset(start, end, filters)
+        fields = list(group) + list(self.dimensions)
+        if by_minute:
+            queryset = queryset.annotate(minute=TruncMinute('timestamp', tzinfo=UTC))
+            fields.insert(0, 'minute')
+        return queryset.values(*fields).annotate(**self.aggregates())
+
+
+SOURCES = {
+    'RESPONSE_TIME': RollupSource(
+        'optimization.PerformanceMetric', value='value', filters={'metric_type': 'RESPONSE_TIME'}
+    ),
+    'ERROR_RATE': RollupSource(
+        'optimization.PerformanceMetric', value='value', filters={'metric_type': 'ERROR_RATE'}
+    ),
+    # Only whole-cache rows; per-namespace rows would count every call twice
+    'CACHE': RollupSource(
+        'optimization.CachePerformance', value='hit_rate', secondary='average_response_time',
+        filters={'namespace': ''},
+    ),
+    'DATABASE': RollupSource('optimization.DatabasePerformance', dimensions=('slow_query',), value='execution_time'),
+    'SECURITY': RollupSource('optimization.SecurityEvent', dimensions=('event_type', 'severity')),
+}
+
+
+def source_totals(names, start, end, by_minute=False):
+    """
+    Yield (source name, totals row) for the named sources. Sources that read
+    the same model and differ only in the value of one filter share a query,
+    grouped by that filter's field.
+    """
+    groups = {}
+    for name in names:
+        source = SOURCES[name]
+        if len(source.filters) == 1:
+            (field, value), = source.filters.items()
+            key = (source.model, source.dimensions, source.value, source.secondary, field)
+        else:
+            key, field, value = name, None, None
+        groups.setdefault(key, []).append((name, field, value))
+
+    for members in groups.values():
+        name, field, _ = members[0]
+        source = SOURCES[name]
+        if len(members) == 1:
+            for row in source.totals(start, end, by_minute):
+                yield name, row
+            continue
+        by_value = {value: member for member, _, value in members}
+        for row in source.totals(start, end, by_minute, filters={f'{field}__in': list(by_value)}, group=(field,)):
+            yield by_value[row[field]], row
+
+
+def _minute_floor(moment):
+    return moment.astimezone(UTC).replace(second=0, microsecond=0)
+
+
+def _hour_floor(moment):
+    return moment.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_ceil(moment):
+    floor = _hour_floor(moment)
+    return floor if floor == moment else floor + timedelta(hours=1)
+
+
+def _earliest_raw(default):
+    earliest = [
+        apps.get_model(source.model).objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        for source in SOURCES.values()
+    ]
+    earliest = [moment for moment in earliest if moment is not None]
+    return _minute_floor(min(earliest)) if earliest else default
+
+
+def roll_up(now=None):
+    """Aggregate complete minutes since the checkpoint. Returns a report dict."""
+    end = _minute_floor((now or timezone.now()) - ROLLUP_LAG)
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT).first()
+    if checkpoint is None:
+        RollupCheckpoint.objects.get_or_create(name=CHECKPOINT, defaults={'rolled_until': _earliest_raw(end)})
+
+    with transaction.atomic():
+        # Serialises overlapping runs
+        checkpoint = RollupCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+        start = checkpoint.rolled_until
+        if start >= end:
+            return {'from': start.isoformat(), 'to': start.isoformat(), 'minute_rows': 0, 'hour_rows': 0}
+        end = min(end, start + timedelta(minutes=MAX_MINUTES_PER_RUN))
+
+        minutes = []
+        for name, row in source_totals(SOURCES, start, end, by_minute=True):
+            minutes.append(MonitoringRollup(
+                bucket='MINUTE', source=name, dimension=SOURCES[name].dimension(row), period_start=row['minute'],
+                count=row['count'], value_sum=row.get('value_sum') or 0,
+                secondary_sum=row.get('secondary_sum') or 0,
+            ))
+        MonitoringRollup.objects.filter(bucket='MINUTE', period_start__gte=start, period_start__lt=end).delete()
+        MonitoringRollup.objects.bulk_create(minutes, batch_size=1000)
+
+        # Re-derive every hour the new minutes fall in from its minute rows
+        hour_start, hour_end = _hour_floor(start), _hour_ceil(end)
+        hour_totals = MonitoringRollup.objects.filter(
+            bucket='MINUTE', period_start__gte=hour_start, period_start__lt=hour_end
+        ).order_by().annotate(period=TruncHour('period_start', tzinfo=UTC)).values(
+            'source', 'dimension', 'period'
+        ).annotate(total=Sum('count'), value_total=Sum('value_sum'), secondary_total=Sum('secondary_sum'))
+        hours = [
+            MonitoringRollup(
+                bucket='HOUR', source=row['source'], dimension=row['dimension'], period_start=row['period'],
+                count=row['total'], value_sum=row['value_total'], secondary_sum=row['secondary_total'],
+            )
+            for row in hour_totals
+        ]
+        MonitoringRollup.objects.filter(
+            bucket='HOUR', period_start__gte=hour_start, period_start__lt=hour_end
+        ).delete()
+        MonitoringRollup.objects.bulk_create(hours, batch_size=1000)
+
+        checkpoint.rolled_until = end
+        checkpoint.save(update_fields=['rolled_until', 'updated_at'])
+
+    # Minute rows are only needed for the partial hours at the ends of recent windows
+    pruned, _ = MonitoringRollup.objects.filter(
+        bucket='MINUTE', period_start__lt=_hour_floor(end) - timedelta(days=settings.MONITORING_MINUTE_ROLLUP_DAYS)
+    ).delete()
+    return {
+        'from': start.isoformat(), 'to': end.isoformat(),
+        'minute_rows': len(minutes), 'hour_rows': len(hours), 'pruned_minute_rows': pruned,
+    }
+
+
+def combined_totals(sources, start, end):
+    """
+    {source: {dimension: [count, value_sum, secondary_sum]}} over [start, end),
+    plus the window start actually used. Starts older than the minute rollup
+    retention are widened to the hour.
+    """
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT).values_list('rolled_until', flat=True).first()
+    start = _minute_floor(start)
+    minute_cutoff = _hour_floor(end) - timedelta(days=settings.MONITORING_MINUTE_ROLLUP_DAYS)
+    if start < minute_cutoff:
+        start = _hour_floor(start)
+    totals = {name: {} for name in sources}
+
+    def add(name, dimension, count, value_sum, secondary_sum):
+        entry = totals[name].setdefault(dimension, [0, Decimal('0'), Decimal('0')])
+        entry[0] += count
+        entry[1] += value_sum or 0
+        entry[2] += secondary_sum or 0
+
+    raw_from = start
+    if checkpoint is not None and checkpoint > start:
+        rolled_end = min(checkpoint, end)
+        first_hour, last_hour = _hour_ceil(start), _hour_floor(rolled_end)
+        if first_hour < last_hour:
+            segments = (
+                Q(bucket='HOUR', period_start__gte=first_hour, period_start__lt=last_hour)
+                | Q(bucket='MINUTE', period_start__gte=start, period_start__lt=first_hour)
+                | Q(bucket='MINUTE', period_start__gte=last_hour, period_start__lt=rolled_end)
+            )
+        else:
+            segments = Q(bucket='MINUTE', period_start__gte=start, period_start__lt=rolled_end)
+        rows = MonitoringRollup.objects.filter(segments, source__in=list(sources)).order_by().values(
+            'source', 'dimension'
+        ).annotate(total=Sum('count'), value_total=Sum('value_sum'), secondary_total=Sum('secondary_sum'))
+        for row in rows:
+            add(row['source'], row['dimension'], row['total'], row['value_total'], row['secondary_total'])
+        raw_from = rolled_end
+
+    if raw_from < end:
+        for name, row in source_totals(sources, raw_from, end):
+            add(name, SOURCES[name].dimension(row), row['count'], row.get('value_sum'), row.get('secondary_sum'))
+    return totals, start
+
+
+def _average(entries, index=1):
+    count = sum(entry[0] for entry in entries)
+    return float(sum(entry[index] for entry in entries) / count) if count else 0
+
+
+def performance_summary(start, end):
+    totals, start = combined_totals(['RESPONSE_TIME', 'ERROR_RATE', 'CACHE', 'DATABASE'], start, end)
+    database = totals['DATABASE']
+    return start, {
+        'performance': {
+            'average_response_time': _average(totals['RESPONSE_TIME'].values()),
+            'error_rate': _average(totals['ERROR_RATE'].values()),
+        },
+        'cache': {
+            'average_hit_rate': _average(totals['CACHE'].values()),
+            'average_response_time': _average(totals['CACHE'].values(), index=2),
+        },
+        'database': {
+            'average_execution_time': _average(database.values()),
+            'slow_query_count': database.get('True', [0])[0],
+        },
+    }
+
+
+def security_summary(start, end):
+    totals, start = combined_totals(['SECURITY'], start, end)
+    by_type, by_severity = {}, {}
+    for dimension, (count, _, _) in totals['SECURITY'].items():
+        event_type, severity = dimension.split(':', 1)
+        by_type[event_type] = by_type.get(event_type, 0) + count
+        by_severity[severity] = by_severity.get(severity, 0) + count
+    return start, {
+        'events_by_type': [
+            {'event_type': key, 'count': count} for key, count in sorted(by_type.items(), key=lambda item: -item[1])
+        ],
+        'events_by_severity': [
+            {'severity': key, 'count': count} for key, count in sorted(by_severity.items(), key=lambda item: -item[1])
+        ],
+    }
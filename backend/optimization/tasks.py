@@ -0,0 +1,21 @@
+from celery import shared_task
+
+from supplychain.partitioning import maintain_all
+
+from .rollups import roll_up
+
+
+@shared_task
+def maintain_partitions():
+    """Roll time partitions forward and apply retention to append-only tables"""
+    reports = maintain_all()
+    return {
+        label: {key: value for key, value in report.items() if value}
+        for label, report in reports.items()
+    }
+
+
+@shared_task
+def roll_up_monitoring():
+    """Fold complete minutes of monitoring rows into the summary rollups"""
+    return roll_up()
@@ -13,6 +13,7 @@ router.register(r'rate-limit-logs', views.RateLimitLogViewSet)
 router.register(r'system-health', views.SystemHealthViewSet)
 router.register(r'optimization-recommendations', views.OptimizationRecommendationViewSet)
 router.register(r'system-monitoring', views.SystemMonitoringViewSet, basename='system-monitoring')
+router.register(r'monitoring', views.MonitoringViewSet, basename='monitoring')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -4,16 +4,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Avg, Count, Sum, Q
+from django.db.models import ExpressionWrapper, F, FloatField, Max, Sum
 from django.utils import timezone
-from django.core.cache import cache
-from django.db import connection
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
-import time
+from django.core.cache import caches
+from supplychain.pagination import OptionalKeysetPagination
+from . import rollups
+from .cache import InstrumentedCacheMixin
+from .health import health_prober
 from .models import (
     PerformanceMetric, SecurityEvent, CachePerformance, DatabasePerformance,
     RateLimitLog, SystemHealth, OptimizationRecommendation
@@ -25,12 +22,22 @@ from .serializers import (
 )
 
 
+# Longest window the top-queries ranking looks back over
+MAX_TOP_QUERY_HOURS = 24 * 365
+
+
 class PerformanceMetricViewSet(viewsets.ModelViewSet):
     queryset = PerformanceMetric.objects.all()
     serializer_class = PerformanceMetricSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['metric_type', 'endpoint']
+    filterset_fields = {
+        'metric_type': ['exact'],
+        'endpoint': ['exact'],
+        # Bounding by timestamp lets PostgreSQL prune to the matching partitions
+        'timestamp': ['gte', 'lt'],
+    }
     search_fields = ['endpoint', 'metadata']
     ordering_fields = ['timestamp', 'value', 'metric_type']
 
@@ -64,6 +71,71 @@ class DatabasePerformanceViewSet(viewsets.ModelViewSet):
     search_fields = ['table_name', 'query_hash']
     ordering_fields = ['timestamp', 'execution_time', 'rows_affected']
 
+    @action(detail=False, methods=['get'], url_path='top-queries')
+    def top_queries(self, request):
+        """Query fingerprints ranked by total execution time over the last ?hours= (default 24)"""
+        try:
+            hours = float(request.query_params.get('hours', 24))
+            limit = max(min(int(request.query_params.get('limit', 20)), 100), 1)
+        except (ValueError, OverflowError):
+            return Response({'error': 'hours and limit must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        # Also rejects nan
+        if not hours > 0:
+            return Response({'error': 'hours must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
+        hours = min(hours, MAX_TOP_QUERY_HOURS)
+        end_date = timezone.now()
+        start_date = end_date - timezone.timedelta(hours=hours)
+
+        window = DatabasePerformance.objects.filter(timestamp__gte=start_date).exclude(query_hash='')
+        # Summary rows carry each fingerprint's calls and average time; slow
+        # query samples are individual executions already counted in them
+        fingerprints = list(
+            window.filter(slow_query=False).values('query_hash').annotate(
+                call_count=Sum('calls'),
+                slow_call_count=Sum('slow_calls'),
+                total_time=Sum(ExpressionWrapper(F('execution_time') * F('calls'), output_field=FloatField())),
+                max_time=Max('execution_time'),
+            ).order_by('-total_time')[:limit]
+        )
+        hashes = [row['query_hash'] for row in fingerprints]
+        slowest = dict(
+            window.filter(slow_query=True, query_hash__in=hashes).values('query_hash').annotate(
+                slowest=Max('execution_time')
+            ).values_list('query_hash', 'slowest')
+        )
+        # Every row of a fingerprint has the same text, type and table
+        shapes = {
+            row['query_hash']: row
+            for row in window.filter(slow_query=False, query_hash__in=hashes).order_by().values(
+                'query_hash', 'sql', 'query_type', 'table_name'
+            ).distinct()
+        }
+
+        results = []
+        for row in fingerprints:
+            shape = shapes.get(row['query_hash'], {})
+            max_time = max(row['max_time'], slowest.get(row['query_hash']) or 0)
+            results.append({
+                'query_hash': row['query_hash'],
+                'sql': shape.get('sql', ''),
+                'query_type': shape.get('query_type', ''),
+                'table_name': shape.get('table_name', ''),
+                'calls': row['call_count'],
+                'slow_calls': row['slow_call_count'],
+                'total_time': round(row['total_time'] or 0, 4),
+                'average_time': round((row['total_time'] or 0) / row['call_count'], 4) if row['call_count'] else 0,
+                'max_time': float(max_time),
+            })
+
+        return Response({
+            'period': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'hours': hours
+            },
+            'queries': results
+        })
+
 
 class RateLimitLogViewSet(viewsets.ModelViewSet):
     queryset = RateLimitLog.objects.select_related('user')
@@ -101,85 +173,14 @@ class SystemMonitoringViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'], url_path='health-check')
     def health_check(self, request):
-        """Comprehensive system health check"""
-        try:
-            health_status = {
-                'timestamp': timezone.now().isoformat(),
-                'overall_status': 'HEALTHY',
-                'components': {}
-            }
-            
-            # Database health check
-            try:
-                with connection.cursor() as cursor:
-                    cursor.execute("SELECT 1")
-                    db_status = 'HEALTHY'
-                    db_response_time = 0
-            except Exception as e:
-                db_status = 'CRITICAL'
-                db_response_time = None
-                health_status['overall_status'] = 'CRITICAL'
-            
-            health_status['components']['database'] = {
-                'status': db_status,
-                'response_time': db_response_time,
-                'last_check': timezone.now().isoformat()
-            }
-            
-            # Redis health check
-            try:
-                cache.set('health_check', 'ok', 10)
-                cache_result = cache.get('health_check')
-                redis_status = 'HEALTHY' if cache_result == 'ok' else 'WARNING'
-            except Exception:
-                redis_status = 'CRITICAL'
-                health_status['overall_status'] = 'CRITICAL'
-            
-            health_status['components']['redis'] = {
-                'status': redis_status,
-                'last_check': timezone.now().isoformat()
-            }
-            
-            # System resources
-            if PSUTIL_AVAILABLE:
-                try:
-                    cpu_percent = psutil.cpu_percent(interval=1)
-                    memory = psutil.virtual_memory()
-                    disk = psutil.disk_usage('/')
-                    
-                    system_status = 'HEALTHY'
-                    if cpu_percent > 80 or memory.percent > 80 or disk.percent > 90:
-                        system_status = 'WARNING'
-                    if cpu_percent > 95 or memory.percent > 95 or disk.percent > 95:
-                        system_status = 'CRITICAL'
-                        health_status['overall_status'] = 'CRITICAL'
-                    
-                    health_status['components']['system'] = {
-                        'status': system_status,
-                        'cpu_usage': cpu_percent,
-                        'memory_usage': memory.percent,
-                        'disk_usage': disk.percent,
-                        'last_check': timezone.now().isoformat()
-                    }
-                except Exception:
-                    health_status['components']['system'] = {
-                        'status': 'WARNING',
-                        'last_check': timezone.now().isoformat()
-                    }
-            else:
-                health_status['components']['system'] = {
-                    'status': 'WARNING',
-                    'message': 'psutil not available for system monitoring',
-                    'last_check': timezone.now().isoformat()
-                }
-            
-            return Response(health_status)
-            
-        except Exception as e:
+        """Latest snapshot from the background health prober"""
+        snapshot = health_prober.latest()
+        if snapshot is None:
             return Response(
-                {'error': f'Health check failed: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Health probe has not completed yet'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+        return Response(snapshot)
 
     @action(detail=False, methods=['get'], url_path='performance-summary')
     def performance_summary(self, request):
@@ -189,54 +190,19 @@ class SystemMonitoringViewSet(viewsets.ViewSet):
             days = int(request.query_params.get('days', 7))
             end_date = timezone.now()
             start_date = end_date - timezone.timedelta(days=days)
-            
-            # Performance metrics summary
-            response_time_avg = PerformanceMetric.objects.filter(
-                metric_type='RESPONSE_TIME',
-                timestamp__gte=start_date
-            ).aggregate(avg_time=Avg('value'))['avg_time'] or 0
-            
-            error_rate = PerformanceMetric.objects.filter(
-                metric_type='ERROR_RATE',
-                timestamp__gte=start_date
-            ).aggregate(avg_rate=Avg('value'))['avg_rate'] or 0
-            
-            # Cache performance summary
-            cache_performance = CachePerformance.objects.filter(
-                timestamp__gte=start_date
-            ).aggregate(
-                avg_hit_rate=Avg('hit_rate'),
-                avg_response_time=Avg('average_response_time')
-            )
-            
-            # Database performance summary
-            db_performance = DatabasePerformance.objects.filter(
-                timestamp__gte=start_date
-            ).aggregate(
-                avg_execution_time=Avg('execution_time'),
-                slow_query_count=Count('id', filter=Q(slow_query=True))
-            )
-            
+
+            # Rolled-up minutes and hours plus the raw rows not rolled up yet
+            start_date, totals = rollups.performance_summary(start_date, end_date)
+
             summary = {
                 'period': {
                     'start_date': start_date.isoformat(),
                     'end_date': end_date.isoformat(),
                     'days': days
                 },
-                'performance': {
-                    'average_response_time': float(response_time_avg),
-                    'error_rate': float(error_rate)
-                },
-                'cache': {
-                    'average_hit_rate': float(cache_performance['avg_hit_rate'] or 0),
-                    'average_response_time': float(cache_performance['avg_response_time'] or 0)
-                },
-                'database': {
-                    'average_execution_time': float(db_performance['avg_execution_time'] or 0),
-                    'slow_query_count': db_performance['slow_query_count']
-                }
+                **totals
             }
-            
+
             return Response(summary)
             
         except Exception as e:
@@ -253,25 +219,15 @@ class SystemMonitoringViewSet(viewsets.ViewSet):
             days = int(request.query_params.get('days', 7))
             end_date = timezone.now()
             start_date = end_date - timezone.timedelta(days=days)
-            
-            # Security events summary
-            events_by_type = SecurityEvent.objects.filter(
-                timestamp__gte=start_date
-            ).values('event_type').annotate(
-                count=Count('id')
-            ).order_by('-count')
-            
-            events_by_severity = SecurityEvent.objects.filter(
-                timestamp__gte=start_date
-            ).values('severity').annotate(
-                count=Count('id')
-            ).order_by('-count')
-            
+
+            # Event counts come from rollups; only the latest events are read raw
+            start_date, totals = rollups.security_summary(start_date, end_date)
+
             # Recent critical events
             recent_critical = SecurityEvent.objects.filter(
                 severity='CRITICAL',
                 timestamp__gte=start_date
-            ).order_by('-timestamp')[:5]
+            ).select_related('user').order_by('-timestamp')[:5]
             
             summary = {
                 'period': {
@@ -279,8 +235,7 @@ class SystemMonitoringViewSet(viewsets.ViewSet):
                     'end_date': end_date.isoformat(),
                     'days': days
                 },
-                'events_by_type': list(events_by_type),
-                'events_by_severity': list(events_by_severity),
+                **totals,
                 'recent_critical_events': SecurityEventSerializer(recent_critical, many=True).data
             }
             
@@ -291,3 +246,23 @@ class SystemMonitoringViewSet(viewsets.ViewSet):
                 {'error': f'Security summary failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class MonitoringViewSet(viewsets.ViewSet):
+    """Live in-process statistics that have not been flushed to the database yet"""
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """Hits, misses, sets and timings per key namespace for the current interval"""
+        backend = caches['default']
+        if not isinstance(backend, InstrumentedCacheMixin):
+            return Response(
+                {'error': 'The default cache backend is not instrumented'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        stats = backend.stats.live()
+        stats['recent'] = CachePerformanceSerializer(
+            CachePerformance.objects.filter(cache_type=backend.cache_type, namespace='')[:10], many=True
+        ).data
+        return Response(stats)
@@ -39,6 +39,8 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=ORDER_STATUS, default='PENDING')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = models.TextField()
+    shipping_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    shipping_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     notes = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -10,7 +10,7 @@ from .serializers import (
 
 
 class CustomerViewSet(viewsets.ModelViewSet):
-    queryset = Customer.objects.select_related('created_by').prefetch_related('contacts', 'ratings')
+    queryset = Customer.objects.select_related('created_by').prefetch_related('contacts', 'ratings__created_by')
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -20,7 +20,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
-    queryset = Supplier.objects.select_related('created_by').prefetch_related('contacts', 'ratings')
+    queryset = Supplier.objects.select_related('created_by').prefetch_related('contacts', 'ratings__created_by')
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -1 +1,4 @@
 # Supply Chain & Logistics Platform
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
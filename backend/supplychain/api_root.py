@@ -30,10 +30,15 @@ def api_root(request, format=None):
         'vehicles': 'http://localhost:8000/api/vehicles/',
         'drivers': 'http://localhost:8000/api/drivers/',
         'routes': 'http://localhost:8000/api/routes/',
+        'routes-optimize': 'http://localhost:8000/api/routes/optimize/',
+        'routes-dispatch': 'http://localhost:8000/api/routes/dispatch/',
         
         # Tracking & Monitoring
         'delivery-updates': 'http://localhost:8000/api/delivery-updates/',
         'driver-locations': 'http://localhost:8000/api/driver-locations/',
+        'driver-locations-batch': 'http://localhost:8000/api/driver-locations/batch/',
+        'driver-locations-nearest': 'http://localhost:8000/api/driver-locations/nearest/',
+        'latest-driver-locations': 'http://localhost:8000/api/latest-driver-locations/',
         'delivery-alerts': 'http://localhost:8000/api/delivery-alerts/',
         
         # Partner Management
@@ -59,6 +64,7 @@ def api_root(request, format=None):
         'report-templates': 'http://localhost:8000/api/report-templates/',
         'scheduled-reports': 'http://localhost:8000/api/scheduled-reports/',
         'data-exports': 'http://localhost:8000/api/data-exports/',
+        'data-exports-stream': 'http://localhost:8000/api/data-exports/stream/',
         
         # Analytics Endpoints
         'analytics': {
@@ -82,6 +88,9 @@ def api_root(request, format=None):
             'performance-summary': 'http://localhost:8000/api/system-monitoring/performance-summary/',
             'security-summary': 'http://localhost:8000/api/system-monitoring/security-summary/',
         },
+        'monitoring': {
+            'cache-stats': 'http://localhost:8000/api/monitoring/cache-stats/',
+        },
         
         # Authentication
         'auth': {
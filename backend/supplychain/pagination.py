@@ -0,0 +1,114 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on the model's default ordering plus an id tiebreaker.
+
+    Each page is a range scan starting after the last row of the previous page,
+    so page 10,000 costs the same as page 1 and no COUNT(*) is issued. Views can
+    set ``keyset_ordering`` (e.g. '-timestamp'); otherwise the first field of
+    the model's Meta.ordering is used.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view, queryset):
+        ordering = getattr(view, 'keyset_ordering', None) or queryset.model._meta.ordering[0]
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, value, pk):
+        payload = json.dumps([value, pk], default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return field.to_python(value), int(pk)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        name, descending = self.get_ordering(view, queryset)
+        field = queryset.model._meta.get_field(name)
+        page_size = self.get_page_size(request)
+
+        if descending:
+            queryset = queryset.order_by(f'-{name}', '-pk')
+        else:
+            queryset = queryset.order_by(name, 'pk')
+
+        cursor = self.decode_cursor(request, field)
+        if cursor is not None:
+            value, pk = cursor
+            after = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{name}__{after}': value}) | Q(**{name: value, f'pk__{after}': pk})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_cursor = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(field.value_from_object(last), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination that switches to keyset mode when ``?cursor=`` is sent.
+
+    Pass an empty ``cursor`` to start from the first page; follow ``next`` from
+    there. Keyset responses omit ``count`` and ``previous``.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            self.display_page_controls = False
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,363 @@
+"""
+Time-range partitioning and retention for append-only tables.
+
+On PostgreSQL the tables listed in settings.PARTITION_POLICIES are converted
+(by migration) into tables partitioned by RANGE on ``timestamp``, with one
+partition per day or month and a DEFAULT partition catching anything outside
+the pre-created range. Queries bounded by timestamp are pruned to the
+matching partitions and expired data is removed by dropping whole partitions.
+
+On other databases the tables stay plain; the same retention policy is applied
+with batched DELETEs and rolling partitions forward is a no-op.
+
+The database primary key of a partitioned table is (id, timestamp), as
+PostgreSQL requires; Django keeps treating ``id`` alone as the primary key.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min, Subquery
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+
+
+PARTITION_COLUMN = 'timestamp'
+DELETE_BATCH_SIZE = 5000
+# Windows already downsampled are revisited this many days back on each run,
+# so a missed daily run is caught up without rescanning all history.
+DOWNSAMPLE_LOOKBACK_DAYS = 3
+
+TRUNCATE = {
+    'minute': TruncMinute,
+    'hour': TruncHour,
+}
+
+
+def get_policies():
+    return getattr(settings, 'PARTITION_POLICIES', {})
+
+
+def period_start(moment, interval):
+    moment = moment.astimezone(dt_timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'month':
+        start = start.replace(day=1)
+    return start
+
+
+def next_period(start, interval):
+    if interval == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(table, start, interval):
+    suffix = start.strftime('%Y%m' if interval == 'month' else '%Y%m%d')
+    return f'{table}_p{suffix}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _parse_partition(table, name, interval):
+    """Return the start of a partition from its name, or None for the default"""
+    match = re.fullmatch(re.escape(table) + r'_p(\d{6}|\d{8})', name)
+    if not match:
+        return None
+    fmt = '%Y%m' if interval == 'month' else '%Y%m%d'
+    return datetime.strptime(match.group(1), fmt).replace(tzinfo=dt_timezone.utc)
+
+
+def is_partitioned(model, db=connection):
+    if db.vendor != 'postgresql':
+        return False
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid '
+            'WHERE c.oid = to_regclass(%s)',
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(model, db=connection):
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [model._meta.db_table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(cursor, model, start, end, interval, db=connection):
+    """
+    Create and attach the partition for [start, end).
+
+    The table is built standalone and then attached, so rows that landed in
+    the DEFAULT partition for that range can be moved into it first. A CHECK
+    constraint matching the bounds lets ATTACH skip its validation scan.
+    """
+    quote = db.ops.quote_name
+    table = model._meta.db_table
+    name = partition_name(table, start, interval)
+    column = quote(PARTITION_COLUMN)
+    cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'ALTER TABLE {quote(name)} ADD CONSTRAINT {quote(name + "_bounds")} '
+        f'CHECK ({column} >= %s AND {column} < %s)',
+        [start, end],
+    )
+    moved = 0
+    default = default_partition_name(table)
+    if default in list_partitions(model, db):
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(default)} WHERE {column} >= %s AND {column} < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end],
+        )
+        moved = cursor.rowcount
+    cursor.execute(
+        f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)',
+        [start, end],
+    )
+    cursor.execute(f'ALTER TABLE {quote(name)} DROP CONSTRAINT {quote(name + "_bounds")}')
+    return name, moved
+
+
+def ensure_partitions(model, interval, ahead, since=None, db=connection):
+    """
+    Roll partitions forward: make sure every period from ``since`` (default:
+    now) through ``ahead`` periods in the future has a partition.
+
+    Returns a list of (partition name, rows moved out of the default partition).
+    """
+    table = model._meta.db_table
+    existing = set(list_partitions(model, db))
+    start = period_start(since or timezone.now(), interval)
+    last = period_start(timezone.now(), interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+
+    created = []
+    with transaction.atomic(using=db.alias), db.cursor() as cursor:
+        while start <= last:
+            end = next_period(start, interval)
+            if partition_name(table, start, interval) not in existing:
+                created.append(_create_partition(cursor, model, start, end, interval, db))
+            start = end
+        default = default_partition_name(table)
+        if default not in existing:
+            quote = db.ops.quote_name
+            cursor.execute(f'CREATE TABLE {quote(default)} PARTITION OF {quote(table)} DEFAULT')
+    return created
+
+
+def drop_partitions(model, interval, cutoff):
+    """Drop partitions that end at or before cutoff; returns the dropped names"""
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    dropped = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name in sorted(list_partitions(model)):
+            start = _parse_partition(table, name, interval)
+            if start is None or next_period(start, interval) > cutoff:
+                continue
+            cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+            cursor.execute(f'DROP TABLE {quote(name)}')
+            dropped.append(name)
+    return dropped
+
+
+def delete_before(model, cutoff):
+    """Batched delete of rows older than cutoff, for plain tables"""
+    deleted = 0
+    old = model.objects.filter(**{f'{PARTITION_COLUMN}__lt': cutoff})
+    while True:
+        ids = list(old.order_by().values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(id__in=ids).delete()[0]
+
+
+def thin_window(model, start, end, resolution, group_by):
+    """Keep only the first row per group_by per resolution bucket in [start, end)"""
+    window = model.objects.filter(**{f'{PARTITION_COLUMN}__gte': start, f'{PARTITION_COLUMN}__lt': end})
+    keep = window.annotate(bucket=TRUNCATE[resolution](PARTITION_COLUMN)).values(
+        *group_by, 'bucket'
+    ).annotate(keep_id=Min('id')).values('keep_id')
+    return window.exclude(id__in=Subquery(keep)).delete()[0]
+
+
+def aggregate_window(model, start, end, resolution, group_by):
+    """
+    Replace raw rows in [start, end) with one averaged row per group_by per
+    resolution bucket. Aggregated rows carry ``metadata['downsampled']`` with
+    the row count, min and max, and are never aggregated again.
+    """
+    window = model.objects.filter(
+        **{f'{PARTITION_COLUMN}__gte': start, f'{PARTITION_COLUMN}__lt': end}
+    ).exclude(metadata__has_key='downsampled')
+    groups = list(window.annotate(bucket=TRUNCATE[resolution](PARTITION_COLUMN)).values(
+        *group_by, 'bucket'
+    ).annotate(count=Count('id'), average=Avg('value'), low=Min('value'), high=Max('value')).order_by())
+    if not groups:
+        return 0
+
+    places = Decimal(1).scaleb(-model._meta.get_field('value').decimal_places)
+    with transaction.atomic():
+        removed = window.delete()[0]
+        by_bucket = {}
+        rows = []
+        for group in groups:
+            row = model(
+                value=Decimal(group['average']).quantize(places),
+                metadata={'downsampled': {
+                    'resolution': resolution,
+                    'count': group['count'],
+                    'min': str(group['low']),
+                    'max': str(group['high']),
+                }},
+                **{field: group[field] for field in group_by},
+            )
+            rows.append(row)
+            by_bucket.setdefault(group['bucket'], []).append(row)
+        model.objects.bulk_create(rows, batch_size=1000)
+        # The timestamp column is auto_now_add, so stamp each bucket afterwards
+        for bucket, bucket_rows in by_bucket.items():
+            model.objects.filter(id__in=[row.id for row in bucket_rows]).update(**{PARTITION_COLUMN: bucket})
+    return removed - len(rows)
+
+
+DOWNSAMPLERS = {
+    'thin': thin_window,
+    'aggregate': aggregate_window,
+}
+
+
+def downsample(model, policy, since, until):
+    """Downsample [since, until) one day at a time; returns rows removed"""
+    removed = 0
+    start = period_start(since, 'day')
+    while start < until:
+        end = min(start + timedelta(days=1), until)
+        removed += DOWNSAMPLERS[policy['downsample']](
+            model, max(start, since), end, policy['downsample_to'], policy['group_by']
+        )
+        start = end
+    return removed
+
+
+def delete_from_default(model, cutoff):
+    """Delete expired rows that landed outside the pre-created partitions"""
+    quote = connection.ops.quote_name
+    name = default_partition_name(model._meta.db_table)
+    if name not in list_partitions(model):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(name)} WHERE {quote(PARTITION_COLUMN)} < %s', [cutoff]
+        )
+        return cursor.rowcount
+
+
+def maintain(label, policy, ahead=None, full_downsample=False):
+    """Roll partitions forward and apply the retention policy for one table"""
+    model = apps.get_model(label)
+    now = timezone.now()
+    report = {'partitioned': is_partitioned(model), 'created': [], 'moved': 0,
+              'downsampled': 0, 'dropped': [], 'deleted': 0}
+    interval = policy['interval']
+
+    if report['partitioned']:
+        created = ensure_partitions(model, interval, policy['premake'] if ahead is None else ahead)
+        report['created'] = [name for name, _ in created]
+        report['moved'] = sum(moved for _, moved in created)
+
+    drop_cutoff = now - timedelta(days=policy['drop_after_days'])
+    downsample_cutoff = now - timedelta(days=policy['downsample_after_days'])
+    if policy.get('downsample'):
+        since = drop_cutoff
+        if not full_downsample:
+            since = max(since, downsample_cutoff - timedelta(days=DOWNSAMPLE_LOOKBACK_DAYS))
+        report['downsampled'] = downsample(model, policy, since, downsample_cutoff)
+
+    if report['partitioned']:
+        report['dropped'] = drop_partitions(model, interval, drop_cutoff)
+        report['deleted'] = delete_from_default(model, drop_cutoff)
+    else:
+        report['deleted'] = delete_before(model, drop_cutoff)
+    return report
+
+
+def maintain_all(ahead=None, full_downsample=False):
+    return {
+        label: maintain(label, policy, ahead=ahead, full_downsample=full_downsample)
+        for label, policy in get_policies().items()
+    }
+
+
+def convert_to_partitioned(schema_editor, model, interval, premake):
+    """
+    Rebuild a plain table as a RANGE-partitioned one, keeping data, indexes,
+    constraints and the id sequence, with partitions of interval and premake
+    future ones. Used from migrations, which pass the policy as it stood when
+    they were written; does nothing on databases without declarative
+    partitioning or if already converted.
+    """
+    db = schema_editor.connection
+    if db.vendor != 'postgresql' or is_partitioned(model, db):
+        return
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    column = quote(PARTITION_COLUMN)
+
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes WHERE tablename = %s '
+            'AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))',
+            [table, table],
+        )
+        index_sql = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT pg_get_serial_sequence(%s, %s), MIN({column}) FROM {quote(table)}', [table, 'id'])
+        legacy_sequence, oldest = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} '
+            f'(LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ({column})'
+        )
+        ensure_partitions(model, interval, premake, since=oldest, db=db)
+        cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}')
+
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+        sequence = cursor.fetchone()[0]
+        if sequence is None:
+            # Serial column: the default still points at the legacy sequence
+            cursor.execute(f'ALTER SEQUENCE {legacy_sequence} OWNED BY {quote(table)}.id')
+        else:
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {quote(table)}), 0) + 1, false)",
+                [sequence],
+            )
+
+        cursor.execute(f'DROP TABLE {quote(legacy)}')
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {column})')
+        # Definitions were read before the rename, so they name the new parent
+        for sql in index_sql:
+            cursor.execute(sql)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
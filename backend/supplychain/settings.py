@@ -42,12 +42,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'optimization.ratelimit.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'optimization.middleware.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'supplychain.urls'
@@ -88,11 +90,43 @@ REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
 # Cache Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'BACKEND': 'optimization.cache.InstrumentedRedisCache',
         'LOCATION': REDIS_URL,
     }
 }
 
+# Cache call statistics (optimization/cache.py) are written to
+# CachePerformance once every CACHE_STATS_FLUSH_SECONDS
+CACHE_STATS_FLUSH_SECONDS = config('CACHE_STATS_FLUSH_SECONDS', default=60, cast=float)
+
+# Dashboard summary caching (seconds)
+DASHBOARD_SUMMARY_TTL = config('DASHBOARD_SUMMARY_TTL', default=15, cast=int)
+DASHBOARD_SUMMARY_STALE_TTL = config('DASHBOARD_SUMMARY_STALE_TTL', default=300, cast=int)
+DASHBOARD_SUMMARY_LOCK_TIMEOUT = 30
+
+# Route planning
+ROUTING_AVERAGE_SPEED_MPH = config('ROUTING_AVERAGE_SPEED_MPH', default=30, cast=float)
+ROUTING_SERVICE_MINUTES = config('ROUTING_SERVICE_MINUTES', default=10, cast=float)
+FUEL_PRICE_PER_GALLON = config('FUEL_PRICE_PER_GALLON', default=3.50, cast=float)
+DISTANCE_MATRIX_TTL = config('DISTANCE_MATRIX_TTL', default=7 * 24 * 3600, cast=int)
+# Routes dispatched without a requesting user (e.g. manage.py dispatch_fleet) are created by this user
+DISPATCH_USERNAME = config('DISPATCH_USERNAME', default='dispatch')
+
+# Live ETAs (tracking/eta.py): changes smaller than ETA_CHANGE_SECONDS are not
+# written; writes are batched every ETA_FLUSH_SECONDS or ETA_FLUSH_SIZE stops
+ETA_ENGINE_BACKGROUND = config('ETA_ENGINE_BACKGROUND', default=True, cast=bool)
+ETA_CHANGE_SECONDS = config('ETA_CHANGE_SECONDS', default=60, cast=int)
+ETA_FLUSH_SECONDS = config('ETA_FLUSH_SECONDS', default=5, cast=float)
+ETA_FLUSH_SIZE = config('ETA_FLUSH_SIZE', default=500, cast=int)
+ETA_DELAY_ALERT_MINUTES = config('ETA_DELAY_ALERT_MINUTES', default=15, cast=int)
+ETA_MODEL_IDLE_SECONDS = config('ETA_MODEL_IDLE_SECONDS', default=15 * 60, cast=int)
+
+# Geocoding; the default backend reads addresses from a local CSV/JSON file
+GEOCODER_BACKEND = config('GEOCODER_BACKEND', default='logistics.geocoding.FileGeocoder')
+GEOCODER_OPTIONS = {
+    'path': config('GEOCODER_FILE', default=str(BASE_DIR / 'geocodes.csv')),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,6 +157,54 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Files written by analytics.DataExport jobs
+EXPORT_ROOT = config('EXPORT_ROOT', default=os.path.join(MEDIA_ROOT, 'exports'))
+
+# Scheduled reports (analytics/reports.py): rendered files, and how long a
+# section query result is shared between reports with the same parameters
+REPORT_ROOT = config('REPORT_ROOT', default=os.path.join(MEDIA_ROOT, 'reports'))
+REPORT_SHARED_QUERY_SECONDS = config('REPORT_SHARED_QUERY_SECONDS', default=300, cast=int)
+REPORT_EMAIL_ENABLED = config('REPORT_EMAIL_ENABLED', default=False, cast=bool)
+
+# Request timing (optimization/middleware.py): per-endpoint aggregates are
+# written to PerformanceMetric once every REQUEST_METRICS_FLUSH_SECONDS
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=True, cast=bool)
+REQUEST_METRICS_FLUSH_SECONDS = config('REQUEST_METRICS_FLUSH_SECONDS', default=60, cast=float)
+
+# Query fingerprinting (optimization/instrumentation.py): per-fingerprint totals
+# go to DatabasePerformance every QUERY_STATS_FLUSH_SECONDS, with up to
+# SLOW_QUERY_SAMPLES individual queries slower than SLOW_QUERY_MS each
+QUERY_STATS_ENABLED = config('QUERY_STATS_ENABLED', default=True, cast=bool)
+QUERY_STATS_FLUSH_SECONDS = config('QUERY_STATS_FLUSH_SECONDS', default=60, cast=float)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=100, cast=float)
+SLOW_QUERY_SAMPLES = config('SLOW_QUERY_SAMPLES', default=5, cast=int)
+
+# Minute rollups behind the monitoring summaries are kept this long; hour
+# rollups are kept indefinitely (optimization/rollups.py)
+MONITORING_MINUTE_ROLLUP_DAYS = config('MONITORING_MINUTE_ROLLUP_DAYS', default=2, cast=int)
+
+# Inventory snapshot checkpoints fall every this many hours; as-of queries
+# replay at most one period of ledger (inventory/snapshots.py)
+INVENTORY_SNAPSHOT_HOURS = config('INVENTORY_SNAPSHOT_HOURS', default=24, cast=int)
+
+# Replenishment engine (inventory/replenishment.py): days of demand history,
+# safety factor z on demand deviation (1.65 is about a 95% service level),
+# days of demand a suggested purchase order covers beyond the reorder point,
+# and the user suggested purchase orders are created by
+REPLENISHMENT_DEMAND_DAYS = config('REPLENISHMENT_DEMAND_DAYS', default=90, cast=int)
+REPLENISHMENT_SERVICE_Z = config('REPLENISHMENT_SERVICE_Z', default=1.65, cast=float)
+REPLENISHMENT_REVIEW_DAYS = config('REPLENISHMENT_REVIEW_DAYS', default=14, cast=int)
+REPLENISHMENT_USERNAME = config('REPLENISHMENT_USERNAME', default='replenishment')
+
+# Demand forecasts (analytics/forecasts.py): days of order history fitted, days forecast
+# ahead, and fitting processes (0 = one per CPU)
+FORECAST_HISTORY_DAYS = config('FORECAST_HISTORY_DAYS', default=182, cast=int)
+FORECAST_HORIZON_DAYS = config('FORECAST_HORIZON_DAYS', default=28, cast=int)
+FORECAST_WORKERS = config('FORECAST_WORKERS', default=0, cast=int)
+
+# Health checks (optimization/health.py) report the latest background probe
+HEALTH_PROBE_SECONDS = config('HEALTH_PROBE_SECONDS', default=15, cast=float)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -141,8 +223,24 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'optimization.ratelimit.UserRateLimit',
+        'optimization.ratelimit.ScopedRateLimit',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': config('RATE_LIMIT_USER', default='600/min'),
+        'analytics': config('RATE_LIMIT_ANALYTICS', default='60/min'),
+    },
 }
 
+# Rate limiting (optimization/ratelimit.py): sliding windows kept in Redis.
+# Decisions at or above RATE_LIMIT_LOG_RATIO of a limit are logged to
+# RateLimitLog in batches every RATE_LIMIT_LOG_FLUSH_SECONDS
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_IP = config('RATE_LIMIT_IP', default='1200/min')
+RATE_LIMIT_LOG_RATIO = config('RATE_LIMIT_LOG_RATIO', default=0.9, cast=float)
+RATE_LIMIT_LOG_FLUSH_SECONDS = config('RATE_LIMIT_LOG_FLUSH_SECONDS', default=5, cast=float)
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Configure properly for production
 CORS_ALLOWED_ORIGINS = [
@@ -157,3 +255,65 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-kpi-counters': {
+        'task': 'analytics.tasks.reconcile_kpi_counters',
+        'schedule': 15 * 60,
+    },
+    'maintain-partitions': {
+        'task': 'optimization.tasks.maintain_partitions',
+        'schedule': 60 * 60,
+    },
+    'run-scheduled-reports': {
+        'task': 'analytics.tasks.run_scheduled_reports',
+        'schedule': 60,
+    },
+    'take-inventory-snapshots': {
+        'task': 'inventory.tasks.take_inventory_snapshots',
+        'schedule': 3600,
+    },
+    'roll-up-monitoring': {
+        'task': 'optimization.tasks.roll_up_monitoring',
+        'schedule': 60,
+    },
+    'plan-replenishment': {
+        'task': 'inventory.tasks.plan_replenishment',
+        'schedule': 3600,
+    },
+    # Demand windows roll forward even for products that did not move
+    'plan-replenishment-full': {
+        'task': 'inventory.tasks.plan_replenishment',
+        'schedule': 86400,
+        'kwargs': {'full': True},
+    },
+    'forecast-demand': {
+        'task': 'analytics.tasks.forecast_demand',
+        'schedule': 86400,
+    },
+}
+
+# Time partitioning and retention for append-only tables (see supplychain/partitioning.py).
+# interval: partition size on PostgreSQL; premake: future partitions kept ready.
+# Rows older than downsample_after_days are thinned ('thin': first row per
+# group per bucket) or averaged ('aggregate'); rows older than drop_after_days
+# are removed.
+PARTITION_POLICIES = {
+    'tracking.DriverLocation': {
+        'interval': 'day',
+        'premake': 7,
+        'downsample': 'thin',
+        'downsample_to': 'minute',
+        'group_by': ['driver_id'],
+        'downsample_after_days': config('DRIVER_LOCATION_RAW_DAYS', default=7, cast=int),
+        'drop_after_days': config('DRIVER_LOCATION_RETENTION_DAYS', default=90, cast=int),
+    },
+    'optimization.PerformanceMetric': {
+        'interval': 'month',
+        'premake': 2,
+        'downsample': 'aggregate',
+        'downsample_to': 'hour',
+        'group_by': ['metric_type', 'endpoint', 'unit'],
+        'downsample_after_days': config('PERFORMANCE_METRIC_RAW_DAYS', default=30, cast=int),
+        'drop_after_days': config('PERFORMANCE_METRIC_RETENTION_DAYS', default=365, cast=int),
+    },
+}
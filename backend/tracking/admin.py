@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DeliveryUpdate, DriverLocation, DeliveryAlert, DeliveryPerformance
+from .models import DeliveryUpdate, DriverLocation, DriverLatestLocation, DeliveryAlert, DeliveryPerformance
 
 
 @admin.register(DeliveryUpdate)
@@ -18,6 +18,12 @@ class DriverLocationAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
 
 
+@admin.register(DriverLatestLocation)
+class DriverLatestLocationAdmin(admin.ModelAdmin):
+    list_display = ['driver', 'route', 'latitude', 'longitude', 'speed', 'timestamp']
+    search_fields = ['driver__user__username']
+
+
 @admin.register(DeliveryAlert)
 class DeliveryAlertAdmin(admin.ModelAdmin):
     list_display = ['alert_type', 'priority', 'title', 'is_resolved', 'created_at']
@@ -0,0 +1,276 @@
+"""
+Live ETA engine for route stops.
+
+Each process keeps a RouteModel per active route: the remaining stops in
+sequence with the road miles between consecutive stops precomputed. A ping
+advances the model past stops the driver has reached and re-times the
+remaining stops in one pass, so the cost per ping is O(remaining stops) and
+no route is reloaded. Changed ETAs are collected and written back in
+batches; stops that slip too far behind plan raise a DELAY alert.
+
+Pings are handed to a background thread so ingestion never waits on ETA
+work. Set ETA_ENGINE_BACKGROUND = False to process them inline instead.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from logistics.models import Route, RouteStop
+from logistics.routing import ROAD_FACTOR, haversine_miles
+from orders.models import Shipment
+from .ingest import pings_ingested
+from .models import DeliveryAlert
+
+
+logger = logging.getLogger(__name__)
+
+OPEN_STOP_STATUSES = ['PENDING', 'IN_PROGRESS']
+ACTIVE_ROUTE_STATUSES = ['PLANNED', 'IN_PROGRESS']
+# A stop counts as reached once the driver is this close to it
+ARRIVAL_RADIUS_MILES = 0.1
+# Weight of the newest speed reading in the smoothed speed
+SPEED_SMOOTHING = 0.3
+# Below this the driver is treated as stopped in traffic rather than parked forever
+MIN_SPEED_MPH = 5
+
+
+class StopState:
+    __slots__ = ('stop_id', 'order_id', 'latitude', 'longitude', 'planned', 'arrival', 'alerted')
+
+    def __init__(self, stop_id, order_id, latitude, longitude, planned, arrival):
+        self.stop_id = stop_id
+        self.order_id = order_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.planned = planned
+        self.arrival = arrival
+        self.alerted = False
+
+
+class RouteModel:
+    """Remaining stops of one route and the driver's progress along them"""
+
+    def __init__(self, route_id, created_by_id, stops):
+        self.route_id = route_id
+        self.created_by_id = created_by_id
+        self.stops = stops
+        self.next = 0
+        self.speed = None
+        self.seen_at = time.monotonic()
+        # legs[i]: road miles from stop i - 1 to stop i (legs[0] is measured live)
+        self.legs = [0.0] + [
+            haversine_miles(a.latitude, a.longitude, b.latitude, b.longitude) * ROAD_FACTOR
+            for a, b in zip(stops, stops[1:])
+        ]
+
+    def observe(self, latitude, longitude, speed):
+        """Fold in one ping: smooth the speed and step past stops the driver has reached"""
+        self.seen_at = time.monotonic()
+        if speed is not None:
+            speed = float(speed)
+            self.speed = speed if self.speed is None else \
+                SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * self.speed
+        while self.next < len(self.stops) and \
+                self.distance_to(self.next, latitude, longitude) <= ARRIVAL_RADIUS_MILES:
+            self.next += 1
+
+    def distance_to(self, index, latitude, longitude):
+        stop = self.stops[index]
+        return haversine_miles(latitude, longitude, stop.latitude, stop.longitude) * ROAD_FACTOR
+
+    def update(self, latitude, longitude, timestamp):
+        """Re-time the remaining stops from a position. Returns the stops whose ETA moved."""
+        stops = self.stops
+        if self.next >= len(stops):
+            return []
+        distance = self.distance_to(self.next, latitude, longitude)
+        planning_speed = settings.ROUTING_AVERAGE_SPEED_MPH
+        live_speed = max(self.speed if self.speed is not None else planning_speed, MIN_SPEED_MPH)
+        service_hours = settings.ROUTING_SERVICE_MINUTES / 60
+        threshold = settings.ETA_CHANGE_SECONDS
+        hours = distance / live_speed
+        changed = []
+        for index in range(self.next, len(stops)):
+            if index > self.next:
+                hours += service_hours + self.legs[index] / planning_speed
+            stop = stops[index]
+            arrival = timestamp + timedelta(hours=hours)
+            if abs((arrival - stop.arrival).total_seconds()) >= threshold:
+                stop.arrival = arrival
+                changed.append(stop)
+        return changed
+
+    def slipped(self):
+        """Remaining stops now later than plan by more than the alert threshold, not yet alerted"""
+        limit = timedelta(minutes=settings.ETA_DELAY_ALERT_MINUTES)
+        return [
+            stop for stop in self.stops[self.next:]
+            if not stop.alerted and stop.arrival - stop.planned > limit
+        ]
+
+
+def load_models(route_ids):
+    """RouteModels for routes, with two queries however many routes there are"""
+    routes = dict(Route.objects.filter(
+        id__in=route_ids, status__in=ACTIVE_ROUTE_STATUSES
+    ).values_list('id', 'created_by_id'))
+    stops = {route_id: [] for route_id in routes}
+    rows = RouteStop.objects.filter(route_id__in=routes, status__in=OPEN_STOP_STATUSES).order_by(
+        'route_id', 'sequence'
+    ).values_list(
+        'id', 'route_id', 'order_id', 'order__shipping_latitude', 'order__shipping_longitude',
+        'planned_arrival', 'estimated_arrival',
+    )
+    for stop_id, route_id, order_id, latitude, longitude, planned, arrival in rows:
+        previous = stops[route_id][-1] if stops[route_id] else None
+        if latitude is None or longitude is None:
+            if previous is None:
+                continue
+            # Without coordinates a stop is timed as if at the previous one
+            latitude, longitude = previous.latitude, previous.longitude
+        stops[route_id].append(StopState(
+            stop_id, order_id, float(latitude), float(longitude), planned or arrival, arrival,
+        ))
+    models = {route_id: RouteModel(route_id, routes[route_id], stops[route_id]) for route_id in routes}
+    # Remember routes that are not active so their pings are ignored cheaply
+    for route_id in set(route_ids) - set(routes):
+        models[route_id] = None
+    return models
+
+
+class ETAEngine:
+    def __init__(self):
+        self.models = {}
+        self.pending = {}
+        self.slipped = {}
+        self.lock = threading.RLock()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.flushed_at = time.monotonic()
+
+    def submit(self, pings, timestamp):
+        if not settings.ETA_ENGINE_BACKGROUND:
+            self.process(pings, timestamp)
+            self.flush()
+            return
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self.run, name='eta-engine', daemon=True)
+                    self.thread.start()
+        self.queue.put((pings, timestamp))
+
+    def run(self):
+        while True:
+            try:
+                pings, timestamp = self.queue.get(timeout=settings.ETA_FLUSH_SECONDS)
+            except queue.Empty:
+                pings = None
+            close_old_connections()
+            try:
+                if pings is not None:
+                    self.process(pings, timestamp)
+                if len(self.pending) >= settings.ETA_FLUSH_SIZE or \
+                        time.monotonic() - self.flushed_at >= settings.ETA_FLUSH_SECONDS:
+                    self.flush()
+                    self.evict()
+            except Exception:
+                logger.exception('ETA engine failed to process pings')
+
+    def process(self, pings, timestamp):
+        latest = {}
+        with self.lock:
+            for ping in pings:
+                if ping['route_id'] and (
+                    ping['route_id'] not in latest or ping['timestamp'] >= latest[ping['route_id']]['timestamp']
+                ):
+                    latest[ping['route_id']] = ping
+            missing = [route_id for route_id in latest if route_id not in self.models]
+            if missing:
+                self.models.update(load_models(missing))
+            for ping in pings:
+                model = self.models.get(ping['route_id'])
+                if model is not None:
+                    model.observe(float(ping['latitude']), float(ping['longitude']), ping['speed'])
+            for route_id, ping in latest.items():
+                model = self.models[route_id]
+                if model is None:
+                    continue
+                for stop in model.update(float(ping['latitude']), float(ping['longitude']), ping['timestamp']):
+                    self.pending[stop.stop_id] = stop.arrival
+                for stop in model.slipped():
+                    stop.alerted = True
+                    self.slipped.setdefault(route_id, []).append(stop)
+
+    def flush(self):
+        """Write collected ETA changes and raise alerts for slipped stops"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            slipped, self.slipped = self.slipped, {}
+            self.flushed_at = time.monotonic()
+        if pending:
+            service = timedelta(minutes=settings.ROUTING_SERVICE_MINUTES)
+            RouteStop.objects.bulk_update([
+                RouteStop(id=stop_id, estimated_arrival=arrival, estimated_departure=arrival + service)
+                for stop_id, arrival in pending.items()
+            ], ['estimated_arrival', 'estimated_departure'], batch_size=500)
+        for route_id, stops in slipped.items():
+            raise_delay_alert(self.models.get(route_id), stops)
+        return len(pending)
+
+    def evict(self):
+        cutoff = time.monotonic() - settings.ETA_MODEL_IDLE_SECONDS
+        with self.lock:
+            for route_id, model in list(self.models.items()):
+                if model is None or model.seen_at < cutoff:
+                    del self.models[route_id]
+
+    def invalidate(self, route_id):
+        with self.lock:
+            self.models.pop(route_id, None)
+
+
+def raise_delay_alert(model, stops):
+    """One open DELAY alert per route; later slips on the same route do not add more"""
+    if model is None:
+        return None
+    existing = DeliveryAlert.objects.filter(
+        alert_type='DELAY', is_resolved=False, affected_routes=model.route_id
+    ).exists()
+    if existing:
+        return None
+    limit = settings.ETA_DELAY_ALERT_MINUTES
+    worst = max((stop.arrival - stop.planned).total_seconds() / 60 for stop in stops)
+    priority = 'CRITICAL' if worst > 4 * limit else 'HIGH' if worst > 2 * limit else 'MEDIUM'
+    route_number = Route.objects.filter(id=model.route_id).values_list('route_number', flat=True).first()
+    with transaction.atomic():
+        alert = DeliveryAlert.objects.create(
+            alert_type='DELAY', priority=priority, created_by_id=model.created_by_id,
+            title=f'Route {route_number} running {worst:.0f} minutes late',
+            message=f'{len(stops)} stop(s) are expected more than {limit} minutes after their planned arrival.',
+        )
+        alert.affected_routes.add(model.route_id)
+        alert.affected_shipments.add(*Shipment.objects.filter(order_id__in=[stop.order_id for stop in stops]))
+    return alert
+
+
+eta_engine = ETAEngine()
+
+
+@receiver(pings_ingested)
+def update_etas(sender, pings, timestamp, **kwargs):
+    eta_engine.submit(pings, timestamp)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=RouteStop)
+@receiver(post_delete, sender=RouteStop)
+def invalidate_route_model(sender, instance, **kwargs):
+    eta_engine.invalidate(instance.id if sender is Route else instance.route_id)
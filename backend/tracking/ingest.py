@@ -0,0 +1,256 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from logistics.models import Driver, Route
+from .models import DriverLocation, DriverLatestLocation
+
+
+# Positional layout of a compact ping: [driver, latitude, longitude, speed, heading, route, timestamp]
+COMPACT_FIELDS = ('driver', 'latitude', 'longitude', 'speed', 'heading', 'route', 'timestamp')
+MAX_BATCH_SIZE = 10000
+BULK_BATCH_SIZE = 1000
+# Batches at least this large are streamed with COPY on PostgreSQL
+COPY_THRESHOLD = 500
+
+SIX_PLACES = Decimal('0.000001')
+TWO_PLACES = Decimal('0.01')
+# Client timestamps further ahead of the server clock than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Sent after a batch of pings is committed, with ``pings`` (list of row dicts
+# with their own ``timestamp``, oldest first) and ``timestamp``, the time the
+# batch was received.
+pings_ingested = Signal()
+
+
+class NDJSONParser(BaseParser):
+    """Newline-delimited JSON; each line is a ping object or compact array"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        pings = []
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                pings.append(json.loads(line))
+            except ValueError as e:
+                raise ParseError(f'Line {line_number}: {e}')
+        return pings
+
+
+def _decimal(value, places, low, high, name, required=True):
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'{name} is required')
+        return None
+    try:
+        number = Decimal(str(value))
+        if not number.is_finite():
+            raise ValueError(f'{name} must be a finite number')
+        number = number.quantize(places)
+    except InvalidOperation:
+        raise ValueError(f'{name} must be a number')
+    if not low <= number <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return number
+
+
+def _moment(value, received):
+    """A ping's client timestamp: ISO 8601 or Unix seconds; the receive time if absent"""
+    if value is None or value == '':
+        return received
+    if isinstance(value, bool):
+        raise ValueError('timestamp must be ISO 8601 or Unix seconds')
+    if isinstance(value, (int, float)):
+        try:
+            moment = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError('timestamp is out of range')
+    else:
+        try:
+            moment = parse_datetime(str(value))
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValueError('timestamp must be ISO 8601 or Unix seconds')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+    if moment > received + MAX_CLOCK_SKEW:
+        raise ValueError('timestamp is in the future')
+    return moment
+
+
+def _reference(value, name, required=True):
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'{name} is required')
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an id')
+
+
+def normalize_ping(raw, received=None):
+    """Convert a ping object or compact array into a row dict"""
+    if isinstance(raw, (list, tuple)):
+        if not 3 <= len(raw) <= len(COMPACT_FIELDS):
+            raise ValueError(f'Compact pings need 3 to {len(COMPACT_FIELDS)} fields')
+        raw = dict(zip(COMPACT_FIELDS, raw))
+    elif not isinstance(raw, dict):
+        raise ValueError('Ping must be an object or an array')
+
+    return {
+        'driver_id': _reference(raw.get('driver'), 'driver'),
+        'route_id': _reference(raw.get('route'), 'route', required=False),
+        'latitude': _decimal(raw.get('latitude'), SIX_PLACES, -90, 90, 'latitude'),
+        'longitude': _decimal(raw.get('longitude'), SIX_PLACES, -180, 180, 'longitude'),
+        'speed': _decimal(raw.get('speed'), TWO_PLACES, 0, 999, 'speed', required=False),
+        'heading': _decimal(raw.get('heading'), TWO_PLACES, 0, 360, 'heading', required=False),
+        'timestamp': _moment(raw.get('timestamp'), received or timezone.now()),
+    }
+
+
+def validate_pings(raw_pings):
+    """
+    Validate a batch in one pass.
+
+    Returns (rows, rejected) where rejected is a list of {'index', 'error'}.
+    Driver and route ids are checked with one query each. Pings without a
+    timestamp of their own are stamped with the time the batch arrived.
+    """
+    rows, rejected = [], []
+    received = timezone.now()
+    for index, raw in enumerate(raw_pings):
+        try:
+            row = normalize_ping(raw, received)
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+            continue
+        row['index'] = index
+        rows.append(row)
+
+    driver_ids = set(Driver.objects.filter(
+        id__in={row['driver_id'] for row in rows}
+    ).values_list('id', flat=True))
+    route_ids = set(Route.objects.filter(
+        id__in={row['route_id'] for row in rows if row['route_id']}
+    ).values_list('id', flat=True))
+
+    valid = []
+    for row in rows:
+        if row['driver_id'] not in driver_ids:
+            rejected.append({'index': row['index'], 'error': f"Unknown driver {row['driver_id']}"})
+        elif row['route_id'] and row['route_id'] not in route_ids:
+            rejected.append({'index': row['index'], 'error': f"Unknown route {row['route_id']}"})
+        else:
+            valid.append(row)
+    rejected.sort(key=lambda item: item['index'])
+    return valid, rejected
+
+
+def _copy_rows(rows):
+    columns = ['driver_id', 'route_id', 'latitude', 'longitude', 'speed', 'heading', 'timestamp']
+    sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        connection.ops.quote_name(DriverLocation._meta.db_table),
+        ', '.join(connection.ops.quote_name(column) for column in columns),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BULK_BATCH_SIZE):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows[start:start + BULK_BATCH_SIZE]:
+                writer.writerow([
+                    row['driver_id'], row['route_id'] or '', row['latitude'], row['longitude'],
+                    '' if row['speed'] is None else row['speed'],
+                    '' if row['heading'] is None else row['heading'],
+                    row['timestamp'].isoformat(),
+                ])
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+
+
+def _insert_rows(rows):
+    DriverLocation.objects.bulk_create([
+        DriverLocation(
+            driver_id=row['driver_id'], route_id=row['route_id'],
+            latitude=row['latitude'], longitude=row['longitude'],
+            speed=row['speed'], heading=row['heading'], timestamp=row['timestamp'],
+        )
+        for row in rows
+    ], batch_size=BULK_BATCH_SIZE)
+
+
+def update_latest(rows, received=None):
+    """
+    Upsert the newest ping per driver into the latest-position table. A
+    stored position is only replaced by a ping at least as recent, so late
+    or replayed pings never move a driver back. Rows written are stamped
+    with the time they were received.
+    """
+    latest = {}
+    for row in rows:
+        current = latest.get(row['driver_id'])
+        if current is None or row['timestamp'] >= current['timestamp']:
+            latest[row['driver_id']] = row
+    if not latest:
+        return
+    received = connection.ops.adapt_datetimefield_value(received or timezone.now())
+    table = connection.ops.quote_name(DriverLatestLocation._meta.db_table)
+    columns = ['driver_id', 'route_id', 'latitude', 'longitude', 'speed', 'heading', 'timestamp', 'received_at']
+    quoted = [connection.ops.quote_name(column) for column in columns]
+    stamp = connection.ops.quote_name('timestamp')
+    updates = ', '.join(f'{column} = excluded.{column}' for column in quoted[1:])
+    rows = list(latest.values())
+    batch_size = connection.ops.bulk_batch_size(columns, rows) or BULK_BATCH_SIZE
+    with connection.cursor() as cursor:
+        # The same ON CONFLICT ... WHERE upsert works on PostgreSQL and SQLite
+        for start in range(0, len(rows), min(batch_size, BULK_BATCH_SIZE)):
+            batch = rows[start:start + min(batch_size, BULK_BATCH_SIZE)]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quoted)}) VALUES '
+                f'{", ".join(["(" + ", ".join(["%s"] * len(columns)) + ")"] * len(batch))} '
+                f'ON CONFLICT ({quoted[0]}) DO UPDATE SET {updates} '
+                f'WHERE {table}.{stamp} <= excluded.{stamp}',
+                [
+                    value for row in batch for value in (
+                        row['driver_id'], row['route_id'], row['latitude'], row['longitude'], row['speed'],
+                        row['heading'], connection.ops.adapt_datetimefield_value(row['timestamp']), received,
+                    )
+                ],
+            )
+
+
+def write_pings(rows):
+    """
+    Persist validated pings in bulk and refresh the latest-position table.
+
+    Each row carries its own timestamp; rows are written and announced
+    oldest first.
+    """
+    if not rows:
+        return 0
+    rows = sorted(rows, key=lambda row: row['timestamp'])
+    received = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and len(rows) >= COPY_THRESHOLD:
+            _copy_rows(rows)
+        else:
+            _insert_rows(rows)
+        update_latest(rows, received)
+        transaction.on_commit(
+            lambda: pings_ingested.send(sender=DriverLocation, pings=rows, timestamp=received)
+        )
+    return len(rows)
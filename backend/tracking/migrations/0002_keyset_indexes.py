@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryupdate',
+            index=models.Index(fields=['created_at', 'id'], name='tracking_de_created_6a1983_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='driverlocation',
+            index=models.Index(fields=['timestamp', 'id'], name='tracking_dr_timesta_f4fd17_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0001_initial'),
+        ('tracking', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverLatestLocation',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_location', serialize=False, to='logistics.driver')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('speed', models.DecimalField(blank=True, decimal_places=2, help_text='Speed in MPH', max_digits=5, null=True)),
+                ('heading', models.DecimalField(blank=True, decimal_places=2, help_text='Direction in degrees', max_digits=5, null=True)),
+                ('timestamp', models.DateTimeField(help_text='Time of the ping this position came from')),
+                ('route', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='logistics.route')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
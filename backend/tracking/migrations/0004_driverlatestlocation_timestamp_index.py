@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_driverlatestlocation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driverlatestlocation',
+            index=models.Index(fields=['timestamp'], name='tracking_dr_timesta_953765_idx'),
+        ),
+    ]
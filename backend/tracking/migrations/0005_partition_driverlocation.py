@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from supplychain.partitioning import convert_to_partitioned
+
+
+def partition_driver_locations(apps, schema_editor):
+    # The policy as it stood for this migration; later PARTITION_POLICIES changes do not apply
+    convert_to_partitioned(schema_editor, apps.get_model('tracking', 'DriverLocation'), interval='day', premake=7)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0004_driverlatestlocation_timestamp_index'),
+    ]
+
+    operations = [
+        # The partitioned table matches the model's schema, so there is nothing to undo
+        migrations.RunPython(partition_driver_locations, migrations.RunPython.noop),
+    ]
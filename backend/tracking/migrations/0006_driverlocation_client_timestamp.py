@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0005_partition_driverlocation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='driverlocation',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Time of the ping, as reported by the device'),
+        ),
+    ]
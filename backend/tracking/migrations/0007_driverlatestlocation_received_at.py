@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0006_driverlocation_client_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driverlatestlocation',
+            name='received_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When ingestion last wrote this row'),
+        ),
+        migrations.AddIndex(
+            model_name='driverlatestlocation',
+            index=models.Index(fields=['received_at'], name='tracking_dr_receive_f301a9_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from orders.models import Order, Shipment
 from logistics.models import Route, Driver, Vehicle
@@ -27,6 +28,9 @@ class DeliveryUpdate(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.shipment.tracking_number} - {self.update_type}"
@@ -40,15 +44,40 @@ class DriverLocation(models.Model):
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
     speed = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Speed in MPH")
     heading = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Direction in degrees")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, help_text="Time of the ping, as reported by the device")
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.driver.user.username} - {self.timestamp}"
 
 
+class DriverLatestLocation(models.Model):
+    """Most recent position per driver, kept current by ingestion"""
+    driver = models.OneToOneField(Driver, on_delete=models.CASCADE, primary_key=True, related_name='latest_location')
+    route = models.ForeignKey(Route, on_delete=models.SET_NULL, null=True, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    speed = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Speed in MPH")
+    heading = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, help_text="Direction in degrees")
+    timestamp = models.DateTimeField(help_text="Time of the ping this position came from")
+    received_at = models.DateTimeField(default=timezone.now, help_text="When ingestion last wrote this row")
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.driver_id} @ {self.latitude},{self.longitude}"
+
+
 class DeliveryAlert(models.Model):
     """Delivery alerts and notifications"""
     ALERT_TYPES = [
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import DeliveryUpdate, DriverLocation, DeliveryAlert, DeliveryPerformance
+from .models import DeliveryUpdate, DriverLocation, DriverLatestLocation, DeliveryAlert, DeliveryPerformance
 
 
 class DeliveryUpdateSerializer(serializers.ModelSerializer):
@@ -22,6 +22,15 @@ class DriverLocationSerializer(serializers.ModelSerializer):
         read_only_fields = ['timestamp']
 
 
+class DriverLatestLocationSerializer(serializers.ModelSerializer):
+    driver_username = serializers.CharField(source='driver.user.username', read_only=True)
+    route_number = serializers.CharField(source='route.route_number', read_only=True)
+    
+    class Meta:
+        model = DriverLatestLocation
+        fields = '__all__'
+
+
 class DeliveryAlertSerializer(serializers.ModelSerializer):
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     resolved_by_username = serializers.CharField(source='resolved_by.username', read_only=True)
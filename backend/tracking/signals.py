@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .ingest import pings_ingested, update_latest
+from .models import DriverLocation
+
+
+@receiver(post_save, sender=DriverLocation)
+def driver_location_saved(sender, instance, created, **kwargs):
+    """Single pings created through the API go through the same hot path as batches"""
+    if not created:
+        return
+    row = {
+        'driver_id': instance.driver_id, 'route_id': instance.route_id,
+        'latitude': instance.latitude, 'longitude': instance.longitude,
+        'speed': instance.speed, 'heading': instance.heading, 'timestamp': instance.timestamp,
+    }
+    update_latest([row])
+    transaction.on_commit(
+        lambda: pings_ingested.send(sender=DriverLocation, pings=[row], timestamp=instance.timestamp)
+    )
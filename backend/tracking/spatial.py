@@ -0,0 +1,294 @@
+import heapq
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from logistics.models import Driver, Route, Vehicle
+from logistics.routing import haversine_miles
+from .ingest import pings_ingested
+from .models import DriverLatestLocation
+
+
+CELL_DEGREES = 0.1
+COARSE_FACTOR = 8
+# Clamping to a lat/lng box slightly overestimates the great-circle distance
+# to its nearest point; shrink bounds so the search never prunes too early.
+BOUND_SLACK = 0.98
+
+# Positions written by other worker processes are picked up by a delta sync
+# this often; statuses are refreshed by a full rebuild less frequently.
+SYNC_SECONDS = 2
+REBUILD_SECONDS = 60
+# Rows are stamped before their transaction commits, so a sync looks back
+# this far past the newest stamp it has seen; re-applying a row is harmless.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class DriverEntry:
+    __slots__ = (
+        'driver_id', 'latitude', 'longitude', 'cell', 'timestamp', 'username',
+        'driver_status', 'route_id', 'vehicle_id', 'vehicle_status',
+    )
+
+    def __init__(self, driver_id):
+        self.driver_id = driver_id
+        self.latitude = self.longitude = None
+        self.cell = None
+        self.timestamp = None
+        self.username = ''
+        self.driver_status = None
+        self.route_id = self.vehicle_id = self.vehicle_status = None
+
+    def as_dict(self, distance):
+        return {
+            'driver': self.driver_id,
+            'driver_username': self.username,
+            'driver_status': self.driver_status,
+            'route': self.route_id,
+            'vehicle': self.vehicle_id,
+            'vehicle_status': self.vehicle_status,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'distance_miles': round(distance, 3),
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+        }
+
+
+class DriverSpatialIndex:
+    """
+    Two-level grid index over each driver's latest position.
+
+    Fine cells are CELL_DEGREES square and hold drivers; coarse cells group
+    COARSE_FACTOR x COARSE_FACTOR fine cells. A k-nearest query is a
+    best-first search: cells are visited in order of their minimum possible
+    distance and the search stops once that bound exceeds the current k-th
+    best, so empty regions cost nothing.
+    """
+
+    def __init__(self, cell_degrees=CELL_DEGREES, coarse_factor=COARSE_FACTOR):
+        self.cell_degrees = cell_degrees
+        self.coarse_factor = coarse_factor
+        self.columns = int(round(360 / cell_degrees))
+        self.cells = {}
+        self.coarse = {}
+        self.entries = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def cell_for(self, latitude, longitude):
+        return (
+            int(math.floor((latitude + 90) / self.cell_degrees)),
+            int(math.floor((longitude + 180) / self.cell_degrees)) % self.columns,
+        )
+
+    def coarse_for(self, cell):
+        return cell[0] // self.coarse_factor, cell[1] // self.coarse_factor
+
+    def get_or_create(self, driver_id):
+        entry = self.entries.get(driver_id)
+        if entry is None:
+            entry = self.entries[driver_id] = DriverEntry(driver_id)
+        return entry
+
+    def _unlink(self, entry):
+        bucket = self.cells[entry.cell]
+        bucket.pop(entry.driver_id, None)
+        if not bucket:
+            del self.cells[entry.cell]
+            coarse_key = self.coarse_for(entry.cell)
+            siblings = self.coarse[coarse_key]
+            siblings.discard(entry.cell)
+            if not siblings:
+                del self.coarse[coarse_key]
+
+    def move(self, driver_id, latitude, longitude, timestamp=None):
+        with self.lock:
+            entry = self.get_or_create(driver_id)
+            cell = self.cell_for(latitude, longitude)
+            if entry.cell != cell:
+                if entry.cell is not None:
+                    self._unlink(entry)
+                self.cells.setdefault(cell, {})[driver_id] = entry
+                self.coarse.setdefault(self.coarse_for(cell), set()).add(cell)
+                entry.cell = cell
+            entry.latitude, entry.longitude = latitude, longitude
+            if timestamp is not None:
+                entry.timestamp = timestamp
+            return entry
+
+    def remove(self, driver_id):
+        with self.lock:
+            entry = self.entries.pop(driver_id, None)
+            if entry is not None and entry.cell is not None:
+                self._unlink(entry)
+
+    def _box_bound(self, latitude, longitude, row, column, span):
+        """Lower bound on the distance from a point to a box of span x span fine cells"""
+        size = span * self.cell_degrees
+        south = row * size - 90
+        west = column * size - 180
+        nearest_lat = min(max(latitude, south), south + size)
+        # Longitude offset from the box centre, wrapped into [-180, 180)
+        offset = (longitude - (west + size / 2) + 180) % 360 - 180
+        nearest_lng = longitude - offset + min(max(offset, -size / 2), size / 2)
+        return haversine_miles(latitude, longitude, nearest_lat, nearest_lng) * BOUND_SLACK
+
+    def nearest(self, latitude, longitude, k=10, radius=None, predicate=None):
+        """Return up to k (distance_miles, entry) pairs, nearest first"""
+        best = []  # max-heap of (-distance, driver_id, entry)
+        with self.lock:
+            frontier = [
+                (self._box_bound(latitude, longitude, row, column, self.coarse_factor), 0, (row, column))
+                for row, column in self.coarse
+            ]
+            heapq.heapify(frontier)
+            while frontier:
+                bound, is_fine, key = heapq.heappop(frontier)
+                if radius is not None and bound > radius:
+                    break
+                if len(best) == k and bound >= -best[0][0]:
+                    break
+                if not is_fine:
+                    for row, column in self.coarse[key]:
+                        heapq.heappush(frontier, (
+                            self._box_bound(latitude, longitude, row, column, 1), 1, (row, column)
+                        ))
+                    continue
+                for entry in self.cells[key].values():
+                    if predicate is not None and not predicate(entry):
+                        continue
+                    distance = haversine_miles(latitude, longitude, entry.latitude, entry.longitude)
+                    if radius is not None and distance > radius:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, entry.driver_id, entry))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, entry.driver_id, entry))
+        return [(-negated, entry) for negated, _, entry in sorted(best, reverse=True)]
+
+
+def status_filter(driver_statuses, vehicle_statuses):
+    """Predicate matching entries by driver and vehicle status, or None to match all"""
+    if not driver_statuses and not vehicle_statuses:
+        return None
+
+    def predicate(entry):
+        if driver_statuses and entry.driver_status not in driver_statuses:
+            return False
+        # Drivers without a routed vehicle have nothing to disqualify them
+        if vehicle_statuses and entry.vehicle_status is not None:
+            return entry.vehicle_status in vehicle_statuses
+        return True
+    return predicate
+
+
+class DriverIndexService:
+    """Process-wide index kept in sync with DriverLatestLocation"""
+
+    def __init__(self):
+        self.index = DriverSpatialIndex()
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.synced_at = None
+        self.high_water = None
+
+    def _apply(self, latest):
+        entry = self.index.move(
+            latest.driver_id, float(latest.latitude), float(latest.longitude), latest.timestamp
+        )
+        driver = latest.driver
+        entry.username = driver.user.username
+        entry.driver_status = driver.status if driver.is_active else 'INACTIVE'
+        entry.route_id = latest.route_id
+        vehicle = latest.route.vehicle if latest.route_id else None
+        entry.vehicle_id = vehicle.id if vehicle else None
+        entry.vehicle_status = vehicle.current_status if vehicle else None
+        # Tracked on receipt time: a late ping can advance a driver without
+        # being newer than positions already seen for other drivers
+        if self.high_water is None or latest.received_at > self.high_water:
+            self.high_water = latest.received_at
+
+    def _queryset(self):
+        return DriverLatestLocation.objects.select_related('driver__user', 'route__vehicle')
+
+    def rebuild(self):
+        index = DriverSpatialIndex()
+        current, self.index, self.high_water = self.index, index, None
+        try:
+            for latest in self._queryset().iterator(chunk_size=2000):
+                self._apply(latest)
+        except Exception:
+            self.index = current
+            raise
+        self.loaded_at = self.synced_at = time.monotonic()
+
+    def sync(self):
+        """Pick up positions written since the last sync (possibly by other processes)"""
+        queryset = self._queryset()
+        if self.high_water is not None:
+            queryset = queryset.filter(received_at__gte=self.high_water - SYNC_OVERLAP)
+        for latest in queryset:
+            self._apply(latest)
+        self.synced_at = time.monotonic()
+
+    def get_index(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.loaded_at is None or now - self.loaded_at > REBUILD_SECONDS:
+                self.rebuild()
+            elif now - self.synced_at > SYNC_SECONDS:
+                self.sync()
+        return self.index
+
+    def nearest(self, latitude, longitude, k=10, radius=None, driver_statuses=None, vehicle_statuses=None):
+        predicate = status_filter(driver_statuses, vehicle_statuses)
+        return self.get_index().nearest(latitude, longitude, k=k, radius=radius, predicate=predicate)
+
+
+driver_index = DriverIndexService()
+
+
+@receiver(pings_ingested)
+def index_pings(sender, pings, timestamp, **kwargs):
+    if driver_index.loaded_at is None:
+        return
+    index = driver_index.index
+    changed_routes = {}
+    for ping in pings:
+        current = index.entries.get(ping['driver_id'])
+        if current is not None and current.timestamp is not None and ping['timestamp'] < current.timestamp:
+            # A late ping: the driver has already been seen somewhere newer
+            continue
+        entry = index.move(ping['driver_id'], float(ping['latitude']), float(ping['longitude']), ping['timestamp'])
+        if entry.route_id != ping['route_id']:
+            entry.route_id = ping['route_id']
+            entry.vehicle_id = entry.vehicle_status = None
+            if ping['route_id']:
+                changed_routes.setdefault(ping['route_id'], []).append(entry)
+    if changed_routes:
+        routes = Route.objects.filter(id__in=changed_routes).values_list(
+            'id', 'vehicle_id', 'vehicle__current_status'
+        )
+        for route_id, vehicle_id, vehicle_status in routes:
+            for entry in changed_routes[route_id]:
+                entry.vehicle_id, entry.vehicle_status = vehicle_id, vehicle_status
+
+
+@receiver(post_save, sender=Driver)
+def index_driver_status(sender, instance, **kwargs):
+    entry = driver_index.index.entries.get(instance.id)
+    if entry is not None:
+        entry.driver_status = instance.status if instance.is_active else 'INACTIVE'
+
+
+@receiver(post_save, sender=Vehicle)
+def index_vehicle_status(sender, instance, **kwargs):
+    for entry in list(driver_index.index.entries.values()):
+        if entry.vehicle_id == instance.id:
+            entry.vehicle_status = instance.current_status
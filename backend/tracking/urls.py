@@ -7,6 +7,7 @@ app_name = 'tracking'
 router = DefaultRouter()
 router.register(r'delivery-updates', views.DeliveryUpdateViewSet)
 router.register(r'driver-locations', views.DriverLocationViewSet)
+router.register(r'latest-driver-locations', views.DriverLatestLocationViewSet)
 router.register(r'delivery-alerts', views.DeliveryAlertViewSet)
 router.register(r'delivery-performance', views.DeliveryPerformanceViewSet)
 
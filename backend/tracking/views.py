@@ -1,10 +1,16 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import DeliveryUpdate, DriverLocation, DeliveryAlert, DeliveryPerformance
+from supplychain.pagination import OptionalKeysetPagination
+from .ingest import MAX_BATCH_SIZE, NDJSONParser, validate_pings, write_pings
+from .spatial import driver_index
+from .models import DeliveryUpdate, DriverLocation, DriverLatestLocation, DeliveryAlert, DeliveryPerformance
 from .serializers import (
-    DeliveryUpdateSerializer, DriverLocationSerializer, 
+    DeliveryUpdateSerializer, DriverLocationSerializer, DriverLatestLocationSerializer,
     DeliveryAlertSerializer, DeliveryPerformanceSerializer
 )
 
@@ -12,6 +18,7 @@ from .serializers import (
 class DeliveryUpdateViewSet(viewsets.ModelViewSet):
     queryset = DeliveryUpdate.objects.select_related('shipment', 'route', 'created_by')
     serializer_class = DeliveryUpdateSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['update_type', 'shipment', 'route']
@@ -20,17 +27,90 @@ class DeliveryUpdateViewSet(viewsets.ModelViewSet):
 
 
 class DriverLocationViewSet(viewsets.ModelViewSet):
-    queryset = DriverLocation.objects.select_related('driver', 'route')
+    queryset = DriverLocation.objects.select_related('driver__user', 'route')
     serializer_class = DriverLocationSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['driver', 'route']
+    filterset_fields = {
+        'driver': ['exact'],
+        'route': ['exact'],
+        # Bounding by timestamp lets PostgreSQL prune to the matching partitions
+        'timestamp': ['gte', 'lt'],
+    }
     search_fields = ['driver__user__username']
     ordering_fields = ['timestamp', 'latitude', 'longitude']
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def batch(self, request):
+        """Ingest many GPS pings at once (JSON array or NDJSON, objects or compact arrays)"""
+        pings = request.data
+        if isinstance(pings, dict):
+            pings = pings.get('pings')
+        if not isinstance(pings, list):
+            return Response(
+                {'error': 'Expected a list of pings or {"pings": [...]}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(pings) > MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'Batches are limited to {MAX_BATCH_SIZE} pings'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows, rejected = validate_pings(pings)
+        accepted = write_pings(rows)
+        return Response(
+            {'accepted': accepted, 'rejected': rejected},
+            status=status.HTTP_201_CREATED if accepted else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """Find the k nearest drivers to a point from the in-memory spatial index"""
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lng'])
+            k = min(int(request.query_params.get('k', 10)), 500)
+            radius = request.query_params.get('radius')
+            radius = float(radius) if radius else None
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'lat and lng are required; k and radius (miles) must be numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or k < 1:
+            return Response({'error': 'Coordinates out of range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only dispatchable drivers by default; ?status=any disables the filter
+        statuses = request.query_params.get('status', 'AVAILABLE')
+        driver_statuses = None if statuses == 'any' else set(statuses.split(','))
+        vehicle_statuses = None if statuses == 'any' else {'AVAILABLE'}
+
+        results = driver_index.nearest(
+            latitude, longitude, k=k, radius=radius,
+            driver_statuses=driver_statuses, vehicle_statuses=vehicle_statuses,
+        )
+        return Response({
+            'query': {'lat': latitude, 'lng': longitude, 'k': k, 'radius': radius},
+            'results': [entry.as_dict(distance) for distance, entry in results],
+        })
+
+
+class DriverLatestLocationViewSet(viewsets.ReadOnlyModelViewSet):
+    """Current position of each driver, without scanning location history"""
+    queryset = DriverLatestLocation.objects.select_related('driver__user', 'route')
+    serializer_class = DriverLatestLocationSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['driver', 'route']
+    ordering_fields = ['timestamp']
+
 
 class DeliveryAlertViewSet(viewsets.ModelViewSet):
-    queryset = DeliveryAlert.objects.select_related('created_by', 'resolved_by')
+    queryset = DeliveryAlert.objects.select_related('created_by', 'resolved_by').prefetch_related(
+        'affected_shipments', 'affected_routes'
+    )
     serializer_class = DeliveryAlertSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -40,7 +120,7 @@ class DeliveryAlertViewSet(viewsets.ModelViewSet):
 
 
 class DeliveryPerformanceViewSet(viewsets.ModelViewSet):
-    queryset = DeliveryPerformance.objects.select_related('driver')
+    queryset = DeliveryPerformance.objects.select_related('driver__user')
     serializer_class = DeliveryPerformanceSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]